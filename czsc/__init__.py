@@ -26,6 +26,14 @@ from czsc.traders import (
     combine_dates_and_pairs,
     stock_holds_performance,
     DummyBacktest,
+    SignalsMatrix,
+    vector_dummy,
+    SignalEngine,
+    generate_signals_frame,
+    TraderSnapshot,
+    dump_snapshot,
+    load_snapshot,
+    load_trader,
     SignalsParser,
     get_signals_config,
     get_signals_freqs,
@@ -36,6 +44,7 @@ from czsc.traders import (
     long_short_equity,
 
     RedisWeightsClient,
+    RedisWeightsPublisher,
     get_strategy_mates,
     get_heartbeat_time,
     clear_strategy,
@@ -52,7 +61,10 @@ from czsc.utils import (
     KlineChart,
     WordWriter,
     BarGenerator,
+    MultiBarGenerator,
+    BarStore,
     freq_end_time,
+    freq_end_times,
     resample_bars,
     is_trading_time,
     get_intraday_times,
@@ -63,6 +75,8 @@ from czsc.utils import (
     read_json,
     save_json,
     get_sub_elements,
+    get_signal_columns,
+    compact_signals,
     get_py_namespace,
     freqs_sorted,
     x_round,
@@ -78,10 +92,13 @@ from czsc.utils import (
     CrossSectionalPerformance,
     cross_sectional_ranker,
     cross_sectional_ic,
+    cross_sectional_stats,
     SignalAnalyzer,
     SignalPerformance,
     daily_performance,
     rolling_daily_performance,
+    rolling_daily_performance_fast,
+    daily_performance_matrix,
     weekly_performance,
     holds_performance,
     net_value_stats,
@@ -113,6 +130,9 @@ from czsc.utils.calendar import (
     next_trading_date,
     prev_trading_date,
     get_trading_dates,
+    is_trading_dates,
+    next_trading_dates,
+    prev_trading_dates,
 )
 
 from czsc.utils.trade import (
@@ -177,6 +197,8 @@ from czsc.features.utils import (
     feature_sectional_corr,
 )
 
+from czsc.features.pipeline import compute_features
+
 
 from czsc.utils.kline_quality import (
     check_high_low,
@@ -8,11 +8,14 @@ describe: 缠论分型、笔的识别
 import os
 import webbrowser
 from loguru import logger
-from typing import List
+from typing import List, Union
 from collections import OrderedDict
-from czsc.enum import Mark, Direction
-from czsc.objects import BI, FX, RawBar, NewBar
+import pandas as pd
+from czsc.enum import Mark, Direction, Freq
+from czsc.objects import BI, FX, ZS, RawBar, NewBar
 from czsc.utils.echarts_plot import kline_pro
+from czsc.utils.bar_store import BarStore, BarRange, bar_fields
+from czsc.utils.sig import ZsTracker
 from czsc import envs
 
 logger.disable('czsc.analyze')
@@ -132,54 +135,295 @@ def check_fxs(bars: List[NewBar]) -> List[FX]:
     return fxs
 
 
-def check_bi(bars: List[NewBar], benchmark=None):
+class UbiTracker:
+    """无包含K线序列的增量分型识别器
+
+    按无包含K线的高低点序列增量维护分型列表，以及相对第一个分型的成笔端点（fx_b）候选；
+    K线序列只在尾部发生变化（追加、替换、弹出）时，每根K线的计算量为 O(1)。
+
+    分型识别结果与 check_fxs 一致，成笔判断结果与原始的 check_bi 一致。
+    """
+
+    def __init__(self):
+        self.highs: List[float] = []
+        self.lows: List[float] = []
+        self.fxs = []  # 分型列表，元素为 (分型中间K线的位置, Mark)
+        self.best = []  # best[i] 是 fxs[1: i + 1] 中可以作为 fx_b 的极值分型在 fxs 中的位置，-1 表示没有
+        self.checked = 1  # 下一个待检查分型的中间K线位置
+
+    def __len__(self):
+        return len(self.highs)
+
+    def reset(self, highs: List[float], lows: List[float]):
+        """使用新的K线序列重置"""
+        self.highs = list(highs)
+        self.lows = list(lows)
+        self.fxs = []
+        self.best = []
+        self.checked = 1
+
+    def push(self, high: float, low: float):
+        """在尾部追加一根无包含K线"""
+        self.highs.append(high)
+        self.lows.append(low)
+
+    def truncate(self, n: int):
+        """只保留前 n 根无包含K线，依赖被删除K线的分型同时删除"""
+        del self.highs[n:]
+        del self.lows[n:]
+        while self.fxs and self.fxs[-1][0] > n - 2:
+            self.fxs.pop()
+            self.best.pop()
+        self.checked = max(1, min(self.checked, n - 1))
+
+    def __add_fx(self, i: int, mark: Mark):
+        fxs = self.fxs
+        fxs.append((i, mark))
+        if len(fxs) == 1:
+            self.best.append(-1)
+            return
+
+        c0, m0 = fxs[0]
+        k = self.best[-1]
+        if mark != m0:
+            if m0 == Mark.D and self.highs[i] > self.lows[c0] \
+                    and (k < 0 or self.highs[i] > self.highs[fxs[k][0]]):
+                k = len(fxs) - 1
+            elif m0 == Mark.G and self.lows[i] < self.highs[c0] \
+                    and (k < 0 or self.lows[i] < self.lows[fxs[k][0]]):
+                k = len(fxs) - 1
+        self.best.append(k)
+
+    def scan(self):
+        """检查新增K线上的分型，判断逻辑与 check_fx、check_fxs 一致"""
+        highs, lows, fxs = self.highs, self.lows, self.fxs
+        for i in range(self.checked, len(highs) - 1):
+            h1, h2, h3 = highs[i - 1], highs[i], highs[i + 1]
+            l1, l2, l3 = lows[i - 1], lows[i], lows[i + 1]
+            if h1 < h2 > h3 and l1 < l2 > l3:
+                mark = Mark.G
+            elif l1 > l2 < l3 and h1 > h2 < h3:
+                mark = Mark.D
+            else:
+                continue
+
+            if len(fxs) >= 2 and mark == fxs[-1][1]:
+                logger.error(f"check_fxs错误: 第{i}根无包含K线，{mark}，{fxs[-1][1]}")
+            else:
+                self.__add_fx(i, mark)
+        self.checked = max(self.checked, len(highs) - 1)
+
+    def first_fx(self) -> int:
+        """第一笔的起点：与第一个分型同类型的分型中的极值分型，返回其中间K线的位置"""
+        self.scan()
+        c, mark = self.fxs[0]
+        for i, m in self.fxs:
+            if m == mark and ((mark == Mark.D and self.lows[i] <= self.lows[c])
+                              or (mark == Mark.G and self.highs[i] >= self.highs[c])):
+                c = i
+        return c
+
+    def find_bi(self, benchmark=None, min_bi_len: int = None, bi_change_th: float = None):
+        """查找一笔，返回 (fx_b 在 fxs 中的位置, 笔内分型数量)；没有找到返回 None"""
+        self.scan()
+        fxs = self.fxs
+        if len(fxs) < 2 or self.best[-1] < 0:
+            return None
+
+        k = self.best[-1]
+        ca, ma = fxs[0]
+        cb = fxs[k][0]
+        highs, lows = self.highs, self.lows
+
+        # 判断fx_a和fx_b价格区间是否存在包含关系
+        ab_include = (highs[ca] > highs[cb] and lows[ca] < lows[cb]) or (highs[ca] < highs[cb] and lows[ca] > lows[cb])
+
+        # 判断当前笔的涨跌幅是否超过benchmark的一定比例
+        fa, fb = (lows[ca], highs[cb]) if ma == Mark.D else (highs[ca], lows[cb])
+        if benchmark:
+            bi_change_th = bi_change_th if bi_change_th else envs.get_bi_change_th()
+            power_enough = abs(fa - fb) > benchmark * bi_change_th
+        else:
+            power_enough = False
+
+        # 成笔的条件：1）顶底分型之间没有包含关系；2）笔长度大于等于min_bi_len 或 当前笔的涨跌幅已经够大
+        min_bi_len = min_bi_len if min_bi_len else envs.get_min_bi_len()
+        if (not ab_include) and (cb - ca + 3 >= min_bi_len or power_enough):
+            n = k + 1
+            while n < len(fxs) and fxs[n][0] <= cb + 1:
+                n += 1
+            return k, n
+        return None
+
+
+def check_bi(bars: List[NewBar], benchmark=None, tracker: UbiTracker = None):
     """输入一串无包含关系K线，查找其中的一笔
 
     :param bars: 无包含关系K线列表
     :param benchmark: 当下笔能量的比较基准
+    :param tracker: 与 bars 保持同步的 UbiTracker；为空时根据 bars 重新创建
     :return:
     """
-    min_bi_len = envs.get_min_bi_len()
-    fxs = check_fxs(bars)
-    if len(fxs) < 2:
+    if tracker is None:
+        tracker = UbiTracker()
+        tracker.reset([x.high for x in bars], [x.low for x in bars])
+
+    res = tracker.find_bi(benchmark)
+    if res is None:
         return None, bars
 
-    fx_a = fxs[0]
-    if fx_a.mark == Mark.D:
-        direction = Direction.Up
-        fxs_b = (x for x in fxs if x.mark == Mark.G and x.dt > fx_a.dt and x.fx > fx_a.fx)
-        fx_b = max(fxs_b, key=lambda fx: fx.high, default=None)
+    k, n = res
+    fxs_ = [check_fx(bars[i - 1], bars[i], bars[i + 1]) for i, _ in tracker.fxs[:n]]
+    fx_a, fx_b = fxs_[0], fxs_[k]
+    ca, cb = tracker.fxs[0][0], tracker.fxs[k][0]
+    direction = Direction.Up if fx_a.mark == Mark.D else Direction.Down
+    bi = BI(symbol=fx_a.symbol, fx_a=fx_a, fx_b=fx_b, fxs=fxs_, direction=direction, bars=bars[ca - 1: cb + 2])
+    return bi, bars[cb - 1:]
 
-    elif fx_a.mark == Mark.G:
-        direction = Direction.Down
-        fxs_b = (x for x in fxs if x.mark == Mark.D and x.dt > fx_a.dt and x.fx < fx_a.fx)
-        fx_b = min(fxs_b, key=lambda fx: fx.low, default=None)
 
-    else:
-        raise ValueError
+def _merge_include(merged: dict, t: int, high: float, low: float, open_: float, close: float,
+                   vol: float, amount: float) -> bool:
+    """在浮点数列表上执行 remove_include：第 t 根原始K线与最后一根无包含K线存在包含关系时，合并到 merged 中
 
-    if fx_b is None:
-        return None, bars
-
-    bars_a = [x for x in bars if fx_a.elements[0].dt <= x.dt <= fx_b.elements[2].dt]
-    bars_b = [x for x in bars if x.dt >= fx_b.elements[0].dt]
+    :param merged: 无包含K线序列，结构同 replay_bis 返回的 merged
+    :return: 是否存在包含关系并完成合并
+    """
+    mh, ml = merged["high"], merged["low"]
+    # 前两根无包含K线的高点相等时，方向无法确定，不处理包含关系
+    if len(mh) < 2 or mh[-2] == mh[-1]:
+        return False
 
-    # 判断fx_a和fx_b价格区间是否存在包含关系
-    ab_include = (fx_a.high > fx_b.high and fx_a.low < fx_b.low) or (fx_a.high < fx_b.high and fx_a.low > fx_b.low)
+    h2, l2 = mh[-1], ml[-1]
+    if not ((h2 <= high and l2 >= low) or (h2 >= high and l2 <= low)):
+        return False
 
-    # 判断当前笔的涨跌幅是否超过benchmark的一定比例
-    if benchmark and abs(fx_a.fx - fx_b.fx) > benchmark * envs.get_bi_change_th():
-        power_enough = True
+    if mh[-2] < h2:
+        # Direction.Up：取高高，时间取较大高点所在的K线
+        new_high, new_low = max(h2, high), max(l2, low)
+        if not h2 > high:
+            merged["dt"][-1] = t
     else:
-        power_enough = False
+        # Direction.Down：取低低，时间取较小低点所在的K线
+        new_high, new_low = min(h2, high), min(l2, low)
+        if not l2 < low:
+            merged["dt"][-1] = t
+
+    mh[-1], ml[-1] = new_high, new_low
+    merged["open"][-1], merged["close"][-1] = (new_high, new_low) if open_ > close else (new_low, new_high)
+    merged["vol"][-1] += vol
+    merged["amount"][-1] += amount
+    return True
+
+
+def _replay_create_bi(merged: dict, tracker: UbiTracker, bis: List[dict], res, s: int, t: int) -> int:
+    """根据 UbiTracker.find_bi 的结果记录一笔，返回新的 bars_ubi 第一根无包含K线的位置"""
+    mh, ml = merged["high"], merged["low"]
+    k, n = res
+    fxs = [(s + c, m) for c, m in tracker.fxs[:n]]
+    (ca, mark), cb = fxs[0], fxs[k][0]
+    e = len(mh) - 1
+    fa, fb = (ml[ca], mh[cb]) if mark == Mark.D else (mh[ca], ml[cb])
+    tail = tuple(v[e] for v in merged.values()) + (t,) if cb + 1 == e else None
+    bis.append({
+        "fxs": fxs,
+        "k": k,
+        "direction": Direction.Up if mark == Mark.D else Direction.Down,
+        "high": max(mh[ca], mh[cb]),
+        "low": min(ml[ca], ml[cb]),
+        "power_price": round(abs(fb - fa), 2),
+        "tail": tail,
+    })
+    s = cb - 1
+    tracker.reset(mh[s:], ml[s:])
+    return s
+
+
+def _replay_update_bi(merged: dict, tracker: UbiTracker, bis: List[dict], s: int, t: int,
+                      min_bi_len: int, bi_change_th: float) -> int:
+    """更新笔，逻辑与 CZSC.__update_bi 一致，返回新的 bars_ubi 第一根无包含K线的位置"""
+    mh, ml = merged["high"], merged["low"]
+    e = len(mh) - 1
+    if e - s + 1 < 3:
+        return s
+
+    if not bis:
+        tracker.scan()
+        if not tracker.fxs:
+            return s
+        c0 = tracker.first_fx()
+        if c0 - 1 > 0:
+            s += c0 - 1
+            tracker.reset(mh[s:], ml[s:])
+        res = tracker.find_bi(None, min_bi_len, bi_change_th)
+        return _replay_create_bi(merged, tracker, bis, res, s, t) if res else s
+
+    res = tracker.find_bi(_bi_benchmark(bis, bi_change_th), min_bi_len, bi_change_th)
+    if res:
+        s = _replay_create_bi(merged, tracker, bis, res, s, t)
+
+    last_bi = bis[-1]
+    if (last_bi["direction"] == Direction.Up and mh[e] > last_bi["high"]) \
+            or (last_bi["direction"] == Direction.Down and ml[e] < last_bi["low"]):
+        s = last_bi["fxs"][0][0] - 1
+        tracker.reset(mh[s:], ml[s:])
+        bis.pop(-1)
+    return s
+
+
+def _bi_benchmark(bis: List[dict], bi_change_th: float):
+    """笔内价格变化的基准，逻辑与 CZSC.__update_bi 一致"""
+    if bi_change_th > 0.5 and len(bis) >= 5:
+        price_seq = [x["power_price"] for x in bis[-5:]]
+        return min(bis[-1]["power_price"], sum(price_seq) / len(price_seq))
+    return None
+
+
+def replay_bis(high: List[float], low: List[float], open_: List[float], close: List[float],
+               vol: List[float], amount: List[float], max_bi_num: int = envs.get_max_bi_num()) -> dict:
+    """按 CZSC.update 的逻辑逐根回放K线，只在浮点数列表上计算包含关系、分型和笔，不创建任何K线对象
+
+    包含关系的处理依赖上一根无包含K线的方向，只能顺序计算；这里用一次遍历完成去除包含关系和笔的识别，
+    结果用无包含K线的位置表示，由 CZSC.from_dataframe 只为最终保留的部分创建 NewBar、FX、BI 对象。
+
+    :param high: 原始K线最高价序列，其他参数同理
+    :param max_bi_num: 最大允许保留的笔数量
+    :return: 回放结果，包含以下内容
+
+        - merged: 无包含K线序列，字典的值为列表：high, low, open, close, vol, amount,
+          dt（时间所在的原始K线位置）, start（第一根原始K线位置）
+        - bis: 笔的记录列表，每个记录包含 fxs（(中间K线位置, Mark) 列表）, k（fx_b 在 fxs 中的位置）,
+          tail（成笔时最后一根无包含K线尚未完成，则记录其当时的状态）
+        - ubi_start: bars_ubi 第一根无包含K线的位置
+        - raw_start: bars_raw 第一根原始K线的位置
+    """
+    merged = {"high": [], "low": [], "open": [], "close": [], "vol": [], "amount": [], "dt": [], "start": []}
+    min_bi_len = envs.get_min_bi_len()
+    bi_change_th = envs.get_bi_change_th()
+    tracker = UbiTracker()
+    bis = []
+    s = 0  # bars_ubi 第一根无包含K线的位置
+    raw_start = 0
+
+    for t in range(len(high)):
+        # 去除包含关系，逻辑与 remove_include 一致
+        if _merge_include(merged, t, high[t], low[t], open_[t], close[t], vol[t], amount[t]):
+            tracker.truncate(len(tracker) - 1)
+            tracker.push(merged["high"][-1], merged["low"][-1])
+        else:
+            for key, v in (("high", high[t]), ("low", low[t]), ("open", open_[t]), ("close", close[t]),
+                           ("vol", vol[t]), ("amount", amount[t]), ("dt", t), ("start", t)):
+                merged[key].append(v)
+            tracker.push(high[t], low[t])
 
-    # 成笔的条件：1）顶底分型之间没有包含关系；2）笔长度大于等于min_bi_len 或 当前笔的涨跌幅已经够大
-    if (not ab_include) and (len(bars_a) >= min_bi_len or power_enough):
-        fxs_ = [x for x in fxs if fx_a.elements[0].dt <= x.dt <= fx_b.elements[2].dt]
-        bi = BI(symbol=fx_a.symbol, fx_a=fx_a, fx_b=fx_b, fxs=fxs_, direction=direction, bars=bars_a)
-        return bi, bars_b
-    else:
-        return None, bars
+        s = _replay_update_bi(merged, tracker, bis, s, t, min_bi_len, bi_change_th)
+
+        # 根据最大笔数量限制完成 bi_list, bars_raw 序列的数量控制
+        if len(bis) > max_bi_num:
+            del bis[:len(bis) - max_bi_num]
+        if bis:
+            raw_start = max(raw_start, merged["dt"][bis[0]["fxs"][0][0] - 1])
+
+    return {"merged": merged, "bis": bis, "ubi_start": s, "raw_start": raw_start}
 
 
 class CZSC:
@@ -187,52 +431,177 @@ class CZSC:
                  bars: List[RawBar],
                  get_signals = None,
                  max_bi_num=envs.get_max_bi_num(),
+                 columnar: bool = False,
                  ):
         """
 
         :param bars: K线数据
         :param max_bi_num: 最大允许保留的笔数量
         :param get_signals: 自定义的信号计算函数
+        :param columnar: 是否使用列式存储（BarStore）保存原始K线序列，默认为 False
         """
+        self.__setup(bars[0].symbol, bars[0].freq, get_signals, max_bi_num, columnar)
+        for bar in bars:
+            self.update(bar)
+
+    def __setup(self, symbol, freq, get_signals, max_bi_num, columnar):
         self.verbose = envs.get_verbose()
         self.max_bi_num = max_bi_num
-        self.bars_raw: List[RawBar] = []  # 原始K线序列
+        self.columnar = columnar
+        # 原始K线序列；columnar=True 时为 BarStore，按下标访问得到 RawBar 视图
+        self.bars_raw: Union[List[RawBar], BarStore] = BarStore(symbol, freq) if columnar else []
         self.bars_ubi: List[NewBar] = []  # 未完成笔的无包含K线序列
         self.bi_list: List[BI] = []
-        self.symbol = bars[0].symbol
-        self.freq = bars[0].freq
+        # bars_ubi 的增量分型识别器，_ubi_ref/_ubi_seen 用于判断 bars_ubi 的变化
+        self._ubi_tracker = UbiTracker()
+        self._ubi_ref = None
+        self._ubi_seen: List[NewBar] = []
+        # bi_list 的增量中枢识别器，在访问 zs_list 时同步
+        self._zs_tracker = ZsTracker()
+        self.symbol = symbol
+        self.freq = freq
         self.get_signals = get_signals
         self.signals = None
         # cache 是信号计算过程的缓存容器，需要信号计算函数自行维护
         self.cache = OrderedDict()
 
-        for bar in bars:
-            self.update(bar)
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, freq: Union[Freq, str], get_signals=None,
+                       max_bi_num=envs.get_max_bi_num(), columnar: bool = False):
+        """从完整的K线数据批量创建 CZSC 对象，结果与 CZSC(bars) 逐根K线更新一致
+
+        1. 按 dt 排序去重，直接从 DataFrame 的列中读取K线数据；
+        2. 使用 replay_bis 在浮点数列表上完成去除包含关系、分型和笔的识别；
+        3. 只为最终保留的K线、笔创建 RawBar、NewBar、FX、BI 对象，之后可以继续调用 update 增量更新。
+
+        注意：get_signals 只在最后一根K线上计算一次。
+
+        :param df: 标准K线数据，必须包含 dt, symbol, open, close, high, low, vol, amount 列
+        :param freq: K线周期
+        :param get_signals: 自定义的信号计算函数
+        :param max_bi_num: 最大允许保留的笔数量
+        :param columnar: 是否使用列式存储（BarStore）保存原始K线序列
+        :return: CZSC 对象
+        """
+        assert len(df) > 0, "df 不能为空"
+        freq = Freq(freq) if isinstance(freq, str) else freq
+        df = df.copy()
+        df["dt"] = pd.to_datetime(df["dt"])
+        df = df.sort_values("dt").drop_duplicates("dt", keep="last").reset_index(drop=True)
+        symbol = df["symbol"].iloc[0]
+        dts = df["dt"].tolist()
+        cols = {k: df[k].astype(float).tolist() for k in ["open", "close", "high", "low", "vol", "amount"]}
+        res = replay_bis(cols["high"], cols["low"], cols["open"], cols["close"], cols["vol"], cols["amount"],
+                         max_bi_num=max_bi_num)
+        merged, bis, ubi_start = res["merged"], res["bis"], res["ubi_start"]
+        ms = merged["start"] + [len(df)]
+
+        # 创建被引用到的原始K线对象
+        m_first = min(bis[0]["fxs"][0][0] - 1, ubi_start) if bis else ubi_start
+        r_first = min(ms[m_first], res["raw_start"])
+        raws = {i: RawBar(symbol=symbol, id=i, dt=dts[i], freq=freq, open=cols["open"][i], close=cols["close"][i],
+                          high=cols["high"][i], low=cols["low"][i], vol=cols["vol"][i], amount=cols["amount"][i])
+                for i in range(r_first, len(df))}
+
+        c = cls.__new__(cls)
+        c.__setup(symbol, freq, get_signals, max_bi_num, columnar)
+        for i in range(res["raw_start"], len(df)):
+            c.bars_raw.append(raws[i])
+        if columnar:
+            for i, bar in enumerate(c.bars_raw, res["raw_start"]):
+                raws[i] = bar
+
+        def __elements(a, b):
+            # 与 remove_include 中 elements 的数量限制保持一致
+            index = range(a, b + 1) if b - a <= 100 else list(range(a, a + 100)) + [b]
+            return BarRange.from_views([raws[i] for i in index]) if columnar else [raws[i] for i in index]
+
+        new_bars = {}
+
+        def __new_bar(m):
+            if m not in new_bars:
+                a = ms[m]
+                new_bars[m] = NewBar(symbol=symbol, id=a, freq=freq, dt=dts[merged["dt"][m]], open=merged["open"][m],
+                                     close=merged["close"][m], high=merged["high"][m], low=merged["low"][m],
+                                     vol=merged["vol"][m], amount=merged["amount"][m],
+                                     elements=__elements(a, ms[m + 1] - 1))
+            return new_bars[m]
+
+        for rec in bis:
+            cb = rec["fxs"][rec["k"]][0]
+            bars = {m: __new_bar(m) for m in range(rec["fxs"][0][0] - 1, cb + 2) if not (m == cb + 1 and rec["tail"])}
+            if rec["tail"]:
+                # 成笔时最后一根无包含K线尚未完成，使用当时的状态
+                h, l, o, cl, v, a, dti, a0, t = rec["tail"]
+                bars[cb + 1] = NewBar(symbol=symbol, id=a0, freq=freq, dt=dts[dti], open=o, close=cl, high=h,
+                                      low=l, vol=v, amount=a, elements=__elements(a0, t))
+            fxs = [check_fx(bars[m - 1], bars[m], bars[m + 1]) for m, _ in rec["fxs"]]
+            c.bi_list.append(BI(symbol=symbol, fx_a=fxs[0], fx_b=fxs[rec["k"]], fxs=fxs,
+                                direction=rec["direction"], bars=[bars[m] for m in sorted(bars.keys())]))
+
+        c.bars_ubi = [__new_bar(m) for m in range(ubi_start, len(merged["high"]))]
+        c.signals = c.get_signals(c=c) if c.get_signals else OrderedDict()
+        return c
 
     def __repr__(self):
         return "<CZSC~{}~{}>".format(self.symbol, self.freq.value)
 
+    def __setstate__(self, state):
+        """兼容历史序列化文件：补齐没有保存的列式存储标记、增量分型识别器和中枢识别器"""
+        self.__dict__.update(state)
+        if "columnar" not in state:
+            self.columnar = False
+        if "_ubi_tracker" not in state:
+            self._ubi_tracker = UbiTracker()
+            self._ubi_ref = None
+            self._ubi_seen = []
+            self.__sync_ubi()
+        if "_zs_tracker" not in state:
+            self._zs_tracker = ZsTracker()
+
+    def __sync_ubi(self) -> UbiTracker:
+        """将 UbiTracker 与 bars_ubi 同步
+
+        bars_ubi 被重新赋值时重建 UbiTracker；原地修改时，只同步尾部发生变化的K线
+        """
+        bars, seen = self.bars_ubi, self._ubi_seen
+        tracker = self._ubi_tracker
+        if bars is not self._ubi_ref:
+            self._ubi_ref = bars
+            self._ubi_seen = list(bars)
+            tracker.reset([x.high for x in bars], [x.low for x in bars])
+            return tracker
+
+        n = min(len(bars), len(seen))
+        while n > 0 and bars[n - 1] is not seen[n - 1]:
+            n -= 1
+        if n < len(seen):
+            del seen[n:]
+            tracker.truncate(n)
+        for x in bars[n:]:
+            seen.append(x)
+            tracker.push(x.high, x.low)
+        return tracker
+
     def __update_bi(self):
         bars_ubi = self.bars_ubi
         if len(bars_ubi) < 3:
             return
 
         # 查找笔
+        tracker = self.__sync_ubi()
         if not self.bi_list:
             # 第一笔的查找
-            fxs = check_fxs(bars_ubi)
-            if not fxs:
+            tracker.scan()
+            if not tracker.fxs:
                 return
 
-            fx_a = fxs[0]
-            fxs_a = [x for x in fxs if x.mark == fx_a.mark]
-            for fx in fxs_a:
-                if (fx_a.mark == Mark.D and fx.low <= fx_a.low) \
-                        or (fx_a.mark == Mark.G and fx.high >= fx_a.high):
-                    fx_a = fx
-            bars_ubi = [x for x in bars_ubi if x.dt >= fx_a.elements[0].dt]
+            s_index = tracker.first_fx() - 1
+            if s_index > 0:
+                self.bars_ubi = bars_ubi[s_index:]
+                tracker = self.__sync_ubi()
 
-            bi, bars_ubi_ = check_bi(bars_ubi)
+            bi, bars_ubi_ = check_bi(self.bars_ubi, tracker=tracker)
             if isinstance(bi, BI):
                 self.bi_list.append(bi)
             self.bars_ubi = bars_ubi_
@@ -247,7 +616,7 @@ class CZSC:
         else:
             benchmark = None
 
-        bi, bars_ubi_ = check_bi(bars_ubi, benchmark)
+        bi, bars_ubi_ = check_bi(bars_ubi, benchmark, tracker=tracker)
         self.bars_ubi = bars_ubi_
         if isinstance(bi, BI):
             self.bi_list.append(bi)
@@ -276,22 +645,33 @@ class CZSC:
             self.bars_raw[-1] = bar
             last_bars = self.bars_ubi.pop(-1).raw_bars
             assert bar.dt == last_bars[-1].dt, f"{bar.dt} != {last_bars[-1].dt}，时间错位"
-            last_bars[-1] = bar
+            if not self.columnar:
+                last_bars[-1] = bar
+
+        if self.columnar:
+            # 无包含K线直接使用输入K线的属性值，elements 中引用 BarStore 的视图，保证 cache 与 bars_raw 共享
+            views = list(last_bars)[:-1] + [self.bars_raw[-1]]
+            last_bars = views[:-1] + [bar]
 
         # 去除包含关系
         bars_ubi = self.bars_ubi
-        for bar in last_bars:
+        for i, bar in enumerate(last_bars):
             if len(bars_ubi) < 2:
-                bars_ubi.append(NewBar(symbol=bar.symbol, id=bar.id, freq=bar.freq, dt=bar.dt,
-                                       open=bar.open, close=bar.close, amount=bar.amount,
-                                       high=bar.high, low=bar.low, vol=bar.vol, elements=[bar]))
+                has_include = False
+                k3 = NewBar(symbol=bar.symbol, id=bar.id, freq=bar.freq, dt=bar.dt,
+                            open=bar.open, close=bar.close, amount=bar.amount,
+                            high=bar.high, low=bar.low, vol=bar.vol, elements=[bar])
             else:
                 k1, k2 = bars_ubi[-2:]
                 has_include, k3 = remove_include(k1, k2, bar)
-                if has_include:
-                    bars_ubi[-1] = k3
-                else:
-                    bars_ubi.append(k3)
+            if self.columnar:
+                # 只保存原始K线在 BarStore 中的位置，访问 elements 时才创建视图
+                k3.elements[-1] = views[i]
+                k3.elements = BarRange.from_views(k3.elements)
+            if has_include:
+                bars_ubi[-1] = k3
+            else:
+                bars_ubi.append(k3)
         self.bars_ubi = bars_ubi
 
         # 更新笔
@@ -300,17 +680,24 @@ class CZSC:
         # 根据最大笔数量限制完成 bi_list, bars_raw 序列的数量控制
         self.bi_list = self.bi_list[-self.max_bi_num:]
         if self.bi_list:
-            sdt = self.bi_list[0].fx_a.elements[0].dt
-            s_index = 0
-            for i, bar in enumerate(self.bars_raw):
-                if bar.dt >= sdt:
-                    s_index = i
-                    break
-            self.bars_raw = self.bars_raw[s_index:]
+            self.__trim_bars_raw(self.bi_list[0].fx_a.elements[0].dt)
 
         # 如果有信号计算函数，则进行信号计算
         self.signals = self.get_signals(c=self) if self.get_signals else OrderedDict()
 
+    def __trim_bars_raw(self, sdt):
+        """删除 bars_raw 中时间早于 sdt 的K线"""
+        if self.columnar:
+            self.bars_raw.drop_before(sdt)
+            return
+
+        s_index = 0
+        for i, bar in enumerate(self.bars_raw):
+            if bar.dt >= sdt:
+                s_index = i
+                break
+        self.bars_raw = self.bars_raw[s_index:]
+
     def to_echarts(self, width: str = "1400px", height: str = '580px', bs=[]):
         """绘制K线分析图
 
@@ -319,7 +706,7 @@ class CZSC:
         :param bs: 交易标记，默认为空
         :return:
         """
-        kline = [x.__dict__ for x in self.bars_raw]
+        kline = [bar_fields(x) for x in self.bars_raw]
         if len(self.bi_list) > 0:
             bi = [{'dt': x.fx_a.dt, "bi": x.fx_a.fx} for x in self.bi_list] + \
                  [{'dt': self.bi_list[-1].fx_b.dt, "bi": self.bi_list[-1].fx_b.fx}]
@@ -337,7 +724,7 @@ class CZSC:
         from czsc.utils.plotly_plot import KlineChart
 
         bi_list = self.bi_list
-        df = pd.DataFrame(self.bars_raw)
+        df = self.bars_raw.to_dataframe() if self.columnar else pd.DataFrame(self.bars_raw)
         kline = KlineChart(n_rows=3, title="{}-{}".format(self.symbol, self.freq.value))
         kline.add_kline(df, name="")
         kline.add_sma(df, ma_seq=(5, 10, 21), row=1, visible=True, line_width=1.2)
@@ -389,13 +776,39 @@ class CZSC:
             return self.bi_list[:-1]
         return self.bi_list
 
+    @property
+    def zs_list(self) -> List[ZS]:
+        """bi_list 中的中枢序列，结果与 get_zs_seq(self.bi_list) 一致
+
+        中枢序列增量维护：只有新增一笔、最后一笔被破坏时才更新尾部的中枢；
+        bi_list 因为 max_bi_num 的限制删除了最早的笔时，重新识别一次。
+
+        注意：返回的中枢对象在后续更新中会被原地修改，不要修改其中的 bis。
+        """
+        bis, tracker = self.bi_list, self._zs_tracker
+        seen = tracker.bis
+        if not bis or not seen or bis[0] is not seen[0]:
+            tracker.reset(bis)
+            return tracker.zs_list
+
+        n = min(len(bis), len(seen))
+        while n > 0 and bis[n - 1] is not seen[n - 1]:
+            n -= 1
+        tracker.truncate(n)
+        for bi in bis[n:]:
+            tracker.push(bi)
+        return tracker.zs_list
+
     @property
     def ubi_fxs(self) -> List[FX]:
         """bars_ubi 中的分型"""
-        if not self.bars_ubi:
+        bars = self.bars_ubi
+        if not bars:
             return []
-        else:
-            return check_fxs(self.bars_ubi)
+
+        tracker = self.__sync_ubi()
+        tracker.scan()
+        return [check_fx(bars[i - 1], bars[i], bars[i + 1]) for i, _ in tracker.fxs]
 
     @property
     def ubi(self):
@@ -6,7 +6,6 @@ create_dt: 2023/2/26 18:49
 describe: 掘金量化终端对接
 """
 import os
-import dill
 import inspect
 import pandas as pd
 from loguru import logger
@@ -18,6 +17,7 @@ from datetime import datetime, timedelta
 from collections import OrderedDict
 from typing import List
 from czsc import CzscTrader, CzscStrategyBase
+from czsc.traders.snapshot import dump_snapshot, load_trader
 from czsc.data import freq_cn2gm
 from czsc.utils import qywx as wx
 from czsc.utils import BarGenerator
@@ -464,7 +464,7 @@ def save_traders(context):
         trader: CzscTrader = context.symbols_info[symbol]['trader']
         if context.mode != MODE_BACKTEST:
             file_trader = os.path.join(context.data_path, f'traders/{symbol}.ct')
-            dill.dump(trader, open(file_trader, 'wb'))
+            dump_snapshot(trader, file_trader)
 
 
 indices = {
@@ -733,14 +733,14 @@ def init_context_traders(context, symbols: List[str], strategy):
             file_trader = os.path.join(data_path, f'traders/{symbol}.cat')
 
             if os.path.exists(file_trader) and context.mode != MODE_BACKTEST:
-                trader: CzscTrader = dill.load(open(file_trader, 'rb'))
+                trader: CzscTrader = load_trader(file_trader)
                 logger.info(f"{symbol} Loaded Trader from {file_trader}")
 
             else:
                 tactic = strategy(symbol=symbol)
                 bg, data = get_init_bg(symbol, context.now, base_freq, freqs, 1000, ADJUST_PREV)
                 trader = CzscTrader(bg, signals_config=tactic.signals_config, positions=tactic.positions)
-                dill.dump(trader, open(file_trader, 'wb'))
+                dump_snapshot(trader, file_trader)
 
             symbols_info[symbol]['trader'] = trader
             logger.info("{} Trader 构建成功，最新时间：{}，多仓：{}".format(symbol, trader.end_dt, trader.get_ensemble_pos('mean')))
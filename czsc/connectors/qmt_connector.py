@@ -17,6 +17,7 @@ from datetime import datetime, timedelta
 from czsc.objects import Freq, RawBar
 from czsc.fsa.im import IM
 from czsc.traders.base import CzscTrader
+from czsc.traders.snapshot import dump_snapshot, load_trader
 from czsc.utils import resample_bars
 from xtquant import xtconstant
 from xtquant import xtdata
@@ -627,7 +628,7 @@ class QmtTradeManager:
             try:
                 if os.path.exists(file_trader):
                     # 从缓存文件中恢复交易对象，并更新K线数据
-                    trader: CzscTrader = czsc.dill_load(file_trader)
+                    trader: CzscTrader = load_trader(file_trader)
                     kline_sdt = pd.to_datetime(trader.end_dt) - timedelta(days=self.delta_days)
                     bars = get_raw_bars(symbol, self.base_freq, kline_sdt, datetime.now(), fq="前复权",
                                         download_hist=True)
@@ -641,7 +642,7 @@ class QmtTradeManager:
                     # 从头创建交易对象
                     bars = get_raw_bars(symbol, self.base_freq, '20180101', datetime.now(), fq="前复权")
                     trader: CzscTrader = self.strategy(symbol=symbol).init_trader(bars, sdt=self.trade_sdt)
-                    czsc.dill_dump(trader, file_trader)
+                    dump_snapshot(trader, file_trader)
 
                 mean_pos = trader.get_ensemble_pos('mean')
                 if mean_pos == 0:
@@ -866,7 +867,7 @@ class QmtTradeManager:
 
             try:
                 bars = get_raw_bars(symbol, self.base_freq, kline_sdt, datetime.now(), fq="前复权", download_hist=True)
-                trader: CzscTrader = czsc.dill_load(file_trader)
+                trader: CzscTrader = load_trader(file_trader)
                 news = [x for x in bars if x.dt > trader.end_dt]
                 if news:
                     logger.info(f"{symbol} 需要更新的K线数量：{len(news)} | 最新的K线时间是 {news[-1].dt}")
@@ -880,7 +881,7 @@ class QmtTradeManager:
                             order_volume = min(self.symbol_max_pos * assets.total_asset, assets.cash) // news[-1].close
                             self.send_stock_order(stock_code=symbol, order_type=23, order_volume=order_volume)
 
-                    czsc.dill_dump(trader, file_trader)
+                    dump_snapshot(trader, file_trader)
 
                 mean_pos = trader.get_ensemble_pos('mean')
                 if mean_pos == 0:
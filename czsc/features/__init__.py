@@ -28,4 +28,6 @@ from .vpf import (
 
 from .tas import (
     CCF
-)
\ No newline at end of file
+)
+
+from .pipeline import compute_features, compute_group_features
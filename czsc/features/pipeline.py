@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/22 10:30
+describe: 多品种时序特征批量计算
+
+按品种分组一次，每个品种在一次遍历中计算全部特征：
+
+1. RET 系列因子使用向量化实现，共享收益率、滚动最大/最小值等中间结果；
+2. 其他特征函数（VPF、CCF、自定义函数）在品种数据的副本上直接调用；
+3. 多个品种分块提交到进程池，结果按列写入一个结果表，特征列为 float32。
+"""
+import numpy as np
+import pandas as pd
+from loguru import logger
+from collections import OrderedDict
+from typing import Callable, Dict, List, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class _FeatureFrame:
+    """单个品种的K线数据，缓存多个特征共用的中间结果"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache = {}
+
+    def __cached(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def ret(self) -> pd.Series:
+        """逐K收益率"""
+        return self.__cached("ret", lambda: self.df["close"].pct_change())
+
+    def first(self, n) -> pd.Series:
+        """长度为 n 的窗口中第一根K线的收盘价"""
+        return self.__cached(("first", n), lambda: self.df["close"].shift(n - 1))
+
+    def rolling(self, name, n, how) -> pd.Series:
+        """close 或 ret 序列长度为 n 的滚动统计量"""
+        series = self.ret() if name == "ret" else self.df[name]
+        return self.__cached((name, n, how), lambda: getattr(series.rolling(n), how)())
+
+    def rolling_count(self, n, sign) -> pd.Series:
+        """ret 序列长度为 n 的窗口中大于0（sign=1）或小于0（sign=-1）的数量"""
+        def __count():
+            ret = self.ret()
+            return ((ret * sign) > 0).astype(float).where(ret.notna()).rolling(n).sum()
+
+        return self.__cached(("count", n, sign), __count)
+
+    def rolling_part_sum(self, n, sign) -> pd.Series:
+        """ret 序列长度为 n 的窗口中正收益（sign=1）或负收益（sign=-1）之和"""
+        def __sum():
+            ret = self.ret()
+            part = ret.clip(lower=0) if sign > 0 else ret.clip(upper=0)
+            return part.rolling(n).sum()
+
+        return self.__cached(("part_sum", n, sign), __sum)
+
+
+def _ret001(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    close = ff.df["close"]
+    return f"F#RET001#{tag}", (close.shift(-n) / close - 1).fillna(0)
+
+
+def _ret002(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    open_ = ff.df["open"]
+    return f"F#RET002#{tag}", (open_.shift(-n - 1) / open_.shift(-1) - 1).fillna(0)
+
+
+def _ret003(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    return f"F#RET003#{tag}", ff.rolling("ret", n, "std").shift(-n).fillna(0)
+
+
+def _ret004(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    max_ret = ff.rolling("close", n, "max") / ff.first(n) - 1
+    min_ret = ff.rolling("close", n, "min") / ff.first(n) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        res = (max_ret / min_ret.abs()).shift(-n)
+    return f"F#RET004#{tag}", res.fillna(0).clip(0, 10)
+
+
+def _ret005(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    return f"F#RET005#{tag}", (ff.rolling_count(n, 1) / n).shift(-n).fillna(0)
+
+
+def _ret006(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_win = ff.rolling_part_sum(n, 1) / ff.rolling_count(n, 1)
+        mean_loss = ff.rolling_part_sum(n, -1) / ff.rolling_count(n, -1)
+        res = (mean_win / mean_loss.abs()).shift(-n)
+    return f"F#RET006#{tag}", res.fillna(0).clip(0, 10)
+
+
+def _ret007(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    res = ff.rolling("close", n, "min") / ff.first(n) - 1
+    return f"F#RET007#{tag}", res.shift(-n).fillna(0)
+
+
+def _ret008(ff: _FeatureFrame, **kwargs):
+    tag, n = kwargs.get("tag", "A"), kwargs.get("n", 5)
+    res = ff.rolling("close", n, "max") / ff.first(n) - 1
+    return f"F#RET008#{tag}", res.shift(-n).fillna(0)
+
+
+def _get_kernels() -> dict:
+    """特征函数 -> 向量化实现，与原函数的计算结果一致"""
+    from czsc.features import ret
+
+    return {
+        ret.RET001: _ret001,
+        ret.RET002: _ret002,
+        ret.RET003: _ret003,
+        ret.RET004: _ret004,
+        ret.RET005: _ret005,
+        ret.RET006: _ret006,
+        ret.RET007: _ret007,
+        ret.RET008: _ret008,
+    }
+
+
+def _parse_specs(specs: List[Union[str, dict]]) -> List[tuple]:
+    """解析特征配置，返回 [(特征函数, 参数), ...]
+
+    特征配置样例：["RET001", {"name": "RET004", "n": 10, "tag": "N10"}, {"name": "czsc.features.VPF004", "n": 7}]
+    """
+    import czsc.features
+    from czsc.utils import import_by_name
+
+    res = []
+    for spec in specs:
+        spec = {"name": spec} if isinstance(spec, str) or callable(spec) else dict(spec)
+        name = spec.pop("name")
+        if callable(name):
+            func = name
+        elif "." in name:
+            func = import_by_name(name)
+        else:
+            func = getattr(czsc.features, name)
+        res.append((func, spec))
+    return res
+
+
+def compute_group_features(df: pd.DataFrame, specs: List[Union[str, dict]], dtype=np.float32) -> Dict:
+    """计算单个品种的全部特征
+
+    :param df: 单个品种的K线数据，按 dt 升序排列
+    :param specs: 特征配置，参见 compute_features
+    :param dtype: 特征列的数据类型
+    :return: {特征列名: 特征值}
+    """
+    df = df.reset_index(drop=True)
+    kernels = _get_kernels()
+    ff = _FeatureFrame(df)
+    work = None
+    res = OrderedDict()
+    for func, params in _parse_specs(specs):
+        kernel = kernels.get(func)
+        if kernel is not None:
+            col, values = kernel(ff, **params)
+            res[col] = values.to_numpy(dtype=dtype)
+            continue
+
+        # 没有向量化实现的特征函数，在数据副本上直接调用，收集新增的列
+        work = df.copy() if work is None else work
+        before = set(work.columns)
+        ret = func(work, **params)
+        if isinstance(ret, pd.DataFrame):
+            work = ret.reset_index(drop=True)
+        assert len(work) == len(df), f"{getattr(func, '__name__', func)} 返回的数据行数与输入不一致"
+        for col in work.columns:
+            if col not in before:
+                res[col] = work[col].to_numpy(dtype=dtype)
+    return res
+
+
+def _compute_chunk(chunk: List[tuple], specs, dtype) -> List[tuple]:
+    return [(start, compute_group_features(dfg, specs, dtype)) for start, dfg in chunk]
+
+
+def compute_features(df: pd.DataFrame, specs: List[Union[str, dict, Callable]], n_jobs: int = 1, **kwargs):
+    """多品种批量计算时序特征
+
+    :param df: 多个品种的K线数据，必须包含 symbol、dt 列，以及特征函数需要的列
+    :param specs: 特征配置列表，每个元素可以是：
+
+        - 特征函数名，如 "RET001"，从 czsc.features 中查找
+        - 特征函数的完整路径，如 "czsc.features.vpf.VPF004"
+        - 字典，name 为函数名、完整路径或函数本身，其余键值作为参数传给特征函数，如 {"name": "RET004", "n": 10}
+
+    :param n_jobs: 进程数量，1 表示在当前进程中顺序执行
+    :param kwargs:
+
+        - chunk_size: int, 每个任务包含的品种数量，默认为 8
+        - dtype: 特征列的数据类型，默认为 np.float32
+
+    :return: pd.DataFrame，按 symbol、dt 排序的原始数据，加上全部特征列
+    """
+    chunk_size = max(1, int(kwargs.get("chunk_size", 8)))
+    dtype = kwargs.get("dtype", np.float32)
+    _parse_specs(specs)  # 提前检查特征配置
+
+    df = df.sort_values(["symbol", "dt"], kind="mergesort").reset_index(drop=True)
+    symbols = df["symbol"].values
+    starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]]) if len(df) else np.array([], dtype=int)
+    ends = np.r_[starts[1:], len(df)]
+    groups = [(s, df.iloc[s:e]) for s, e in zip(starts, ends)]
+    chunks = [groups[i: i + chunk_size] for i in range(0, len(groups), chunk_size)]
+
+    features = OrderedDict()
+
+    def __collect(results):
+        for start, res in results:
+            for col, values in res.items():
+                if col not in features:
+                    features[col] = np.full(len(df), np.nan, dtype=dtype)
+                features[col][start: start + len(values)] = values
+
+    if n_jobs <= 1:
+        for chunk in chunks:
+            __collect(_compute_chunk(chunk, specs, dtype))
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            futures = [pool.submit(_compute_chunk, chunk, specs, dtype) for chunk in chunks]
+            for future in as_completed(futures):
+                __collect(future.result())
+
+    logger.info(f"compute_features: {len(groups)} 个品种，{len(df)} 行，{len(features)} 个特征")
+    df = df.drop(columns=[x for x in features if x in df.columns])
+    return pd.concat([df, pd.DataFrame(features)], axis=1)
@@ -18,6 +18,31 @@ def is_event_feature(df, col, **kwargs):
     return all([x in [0, 1, -1] for x in unique_values])
 
 
+# sklearn 中判断方差为0的阈值，见 sklearn.preprocessing._data._handle_zeros_in_scale
+_ZERO_SCALE = 10 * np.finfo(np.float64).eps
+
+
+def _handle_zeros_in_scale(scale_):
+    """与 sklearn 一致：接近0的缩放系数替换为1"""
+    return scale_.mask(scale_ < _ZERO_SCALE, 1.0)
+
+
+def _rolling_zscore(s: pd.Series, window, min_periods, engine=None) -> pd.Series:
+    """滚动窗口内最后一个值的 scale 结果，等价于 rolling(...).apply(lambda x: scale(x)[-1])
+
+    滚动均值、标准差由 pandas 增量计算，复杂度 O(n)；engine='numba' 时使用 numba 计算
+    """
+    roll = s.rolling(window=window, min_periods=min_periods)
+    std = _handle_zeros_in_scale(roll.std(ddof=0, engine=engine))
+    return (s - roll.mean(engine=engine)) / std
+
+
+def _rolling_maxabs(s: pd.Series, window, min_periods, engine=None) -> pd.Series:
+    """滚动窗口内最后一个值的 maxabs_scale 结果"""
+    max_abs = s.abs().rolling(window=window, min_periods=min_periods).max(engine=engine)
+    return s / _handle_zeros_in_scale(max_abs)
+
+
 def rolling_corr(df, col1, col2, window=300, min_periods=100, **kwargs):
     """滚动计算两个序列的相关系数
 
@@ -67,16 +92,24 @@ def rolling_norm(df: pd.DataFrame, col, window=300, min_periods=100, new_col=Non
     :param window: int, 滚动窗口大小, 默认为300
     :param min_periods: int, 最小计算周期, 默认为100
     :param new_col: str, 新列名，默认为 None, 表示使用 f'{col}_norm' 作为新列名
+    :param kwargs:
+
+        - engine: str, 滚动计算引擎，默认为 None，使用 pandas 的 cython 实现；可选 numba
     """
     if kwargs.get("copy", False):
         df = df.copy()
 
     min_periods = kwargs.get("min_periods", 2)
+    engine = kwargs.get("engine", None)
     new_col = new_col if new_col else f"{col}_norm"
-    df[new_col] = (
-        df[col].rolling(window=window, min_periods=min_periods).apply(lambda x: (x[-1] - x.mean()) / x.std(), raw=True)
-    )
-    df[new_col] = df[new_col].fillna(0)
+
+    # (x[-1] - x.mean()) / x.std()，窗口内有空值时结果为空
+    s = df[col].astype(float)
+    roll = s.rolling(window=window, min_periods=min_periods)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        norm = (s - roll.mean(engine=engine)) / roll.std(ddof=0, engine=engine)
+    has_nan = s.isna().rolling(window=window, min_periods=1).max() > 0
+    df[new_col] = norm.mask(has_nan).replace([np.inf, -np.inf], np.nan).fillna(0)
     return df
 
 
@@ -96,11 +129,19 @@ def rolling_qcut(df: pd.DataFrame, col, window=300, min_periods=100, new_col=Non
     min_periods = kwargs.get("min_periods", q)
     new_col = new_col if new_col else f"{col}_qcut"
 
-    def __qcut_func(x):
-        return pd.qcut(x, q=q, labels=False, duplicates="drop")[-1]
-
-    df[new_col] = df[col].rolling(window=window, min_periods=min_periods).apply(__qcut_func, raw=True)
-    df[new_col] = df[new_col].fillna(-1)
+    # 等价于 pd.qcut(x, q=q, labels=False, duplicates="drop")[-1]：
+    # 分位点由 pandas 的滚动分位数（skiplist，O(n log window)）计算，再对去重后的分位点做 searchsorted
+    s = df[col].astype(float)
+    roll = s.rolling(window=window, min_periods=min_periods)
+    edges = np.column_stack([roll.quantile(x).values for x in np.linspace(0, 1, q + 1)])
+    x = s.values[:, None]
+    distinct = np.ones(edges.shape, dtype=bool)
+    distinct[:, 1:] = edges[:, 1:] != edges[:, :-1]
+    n_bins = distinct.sum(axis=1)
+    ids = ((edges < x) & distinct).sum(axis=1)
+    ids[s.values == edges[:, 0]] = 1
+    valid = ~np.isnan(edges[:, 0]) & ~np.isnan(s.values) & (ids > 0) & (ids < n_bins)
+    df[new_col] = np.where(valid, ids - 1, -1).astype(float)
     return df
 
 
@@ -169,12 +210,17 @@ def rolling_scale(df: pd.DataFrame, col: str, window=300, min_periods=100, new_c
     :param window: int, 滚动窗口大小, 默认为300
     :param min_periods: int, 最小计算周期, 默认为100
     :param new_col: str, 新列名，默认为 None, 表示使用 f'{col}_scale' 作为新列名
+    :param kwargs:
+
+        - method: str, 归一化方法，可选 scale, minmax_scale, maxabs_scale, robust_scale
+        - engine: str, 滚动计算引擎，默认为 None，使用 pandas 的 cython 实现；可选 numba
     """
     if kwargs.get("copy", False):
         df = df.copy()
 
     df = df.sort_values("dt", ascending=True).reset_index(drop=True)
     new_col = new_col if new_col else f"{col}_scale"
+    engine = kwargs.get("engine", None)
 
     method = kwargs.get("method", "scale")
     method_map = {
@@ -184,18 +230,23 @@ def rolling_scale(df: pd.DataFrame, col: str, window=300, min_periods=100, new_c
         "robust_scale": robust_scale,
     }
     assert method in method_map, f"method must be one of {list(method_map.keys())}"
-    scale_method = method_map[method]
-
-    if method == "minmax_scale":
-        df[new_col] = (
-            df[col]
-            .rolling(window=window, min_periods=min_periods)
-            .apply(lambda x: minmax_scale(x, feature_range=(-1, 1))[-1])
-        )
+
+    # 只计算每个窗口最后一个值的归一化结果，窗口统计量全部由 pandas 滚动计算得到
+    s = df[col].astype(float)
+    roll = s.rolling(window=window, min_periods=min_periods)
+    if method == "scale":
+        res = _rolling_zscore(s, window, min_periods, engine)
+    elif method == "minmax_scale":
+        data_min = roll.min(engine=engine)
+        data_range = _handle_zeros_in_scale(roll.max(engine=engine) - data_min)
+        res = (s - data_min) * (2 / data_range) - 1
+    elif method == "maxabs_scale":
+        res = _rolling_maxabs(s, window, min_periods, engine)
     else:
-        df[new_col] = df[col].rolling(window=window, min_periods=min_periods).apply(lambda x: scale_method(x)[-1])
+        iqr = _handle_zeros_in_scale(roll.quantile(0.75) - roll.quantile(0.25))
+        res = (s - roll.median()) / iqr
 
-    df[new_col] = df[new_col].fillna(0)
+    df[new_col] = res.fillna(0)
     return df
 
 
@@ -214,11 +265,37 @@ def rolling_tanh(df: pd.DataFrame, col: str, window=300, min_periods=100, new_co
         df = df.copy()
     new_col = new_col if new_col else f"{col}_tanh"
     df = df.sort_values("dt", ascending=True).reset_index(drop=True)
-    df[new_col] = df[col].rolling(window=window, min_periods=min_periods).apply(lambda x: np.tanh(scale(x))[-1])  # type: ignore
+    df[new_col] = np.tanh(_rolling_zscore(df[col].astype(float), window, min_periods, kwargs.get("engine", None)))
     df[new_col] = df[new_col].fillna(0)
     return df
 
 
+def _rolling_ols_slope(y: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """滚动窗口内 y 对序号 0, 1, ..., m-1 的最小二乘斜率，窗口内有空值时结果为空
+
+    slope = sum((i - mean(i)) * y_i) / sum((i - mean(i)) ** 2)，完整窗口的分子用 np.correlate 一次算出
+    """
+    n = len(y)
+    res = np.full(n, np.nan)
+    if n == 0:
+        return res
+
+    if n >= window:
+        weights = np.arange(window) - (window - 1) / 2
+        res[window - 1:] = np.correlate(y, weights, mode="valid") / (window * (window ** 2 - 1) / 12)
+
+    # 序列开头不足一个完整窗口的部分
+    for m in range(max(min_periods, 1), min(window, n + 1)):
+        if m == 1:
+            res[0] = 0.0 if not np.isnan(y[0]) else np.nan
+            continue
+        weights = np.arange(m) - (m - 1) / 2
+        res[m - 1] = np.dot(y[:m], weights) / (m * (m ** 2 - 1) / 12)
+
+    res[: max(min_periods, 1) - 1] = np.nan
+    return res
+
+
 def rolling_slope(df: pd.DataFrame, col: str, window=300, min_periods=100, new_col=None, **kwargs):
     """计算序列的滚动斜率
 
@@ -242,11 +319,8 @@ def rolling_slope(df: pd.DataFrame, col: str, window=300, min_periods=100, new_c
     new_col = new_col if new_col else f"{col}_slope_{method}"
 
     if method == "linear":
-        # 使用线性回归计算斜率
-        def __lr_slope(x):
-            return LinearRegression().fit(list(range(len(x))), x).coef_[0]
-
-        df[new_col] = df[col].rolling(window=window, min_periods=min_periods).apply(__lr_slope, raw=True)
+        # 使用线性回归计算斜率：以窗口内的序号为 x，最小二乘斜率的闭式解
+        df[new_col] = _rolling_ols_slope(df[col].values.astype(float), window, min_periods)
 
     elif method == "std/mean":
         # 用 window 内 std 的变化率除以 mean 的变化率，来衡量序列的斜率
@@ -412,11 +486,13 @@ def feature_to_weight(df, factor, positive, **kwargs):
         - window: int, 计算窗口长度，默认为1000
         - min_periods: int, 最小计算窗口长度，默认为100
         - q_threshold: float, 缩尾阈值，默认为0.05
+        - engine: str, 滚动计算引擎，默认为 None，使用 pandas 的 cython 实现；可选 numba
 
     """
     window = kwargs.get("window", 1000)
     min_periods = kwargs.get("min_periods", 100)
     q_threshold = kwargs.get("q_threshold", 0.05)
+    engine = kwargs.get("engine", None)
     assert df["symbol"].nunique() == 1, "必须按品种计算权重"
 
     # 缩尾处理
@@ -425,10 +501,10 @@ def feature_to_weight(df, factor, positive, **kwargs):
     df[factor] = df[factor].clip(lower=df["lower"], upper=df["upper"])
 
     # scale 缩放，均值为0
-    df["norm"] = df[factor].rolling(window, min_periods).apply(lambda x: scale(x)[-1])
+    df["norm"] = _rolling_zscore(df[factor].astype(float), window, min_periods, engine)
 
     # maxabs_scale 缩放至 [-1, 1]
-    df["weight"] = df["norm"].rolling(window, min_periods).apply(lambda x: maxabs_scale(x)[-1])
+    df["weight"] = _rolling_maxabs(df["norm"], window, min_periods, engine)
     df["weight"] = df["weight"].fillna(0)
     if not positive:
         df["weight"] = -df["weight"]
@@ -449,25 +525,14 @@ def feature_returns(df, factor, target="n1b", **kwargs):
 
     :return: pd.DataFrame, 新增 returns 列
     """
-    from sklearn.linear_model import LinearRegression
+    from czsc.utils.corr import cross_sectional_stats
 
-    df = df.copy()
     fit_intercept = kwargs.get("fit_intercept", False)
-
-    ret = []
-    for dt, dfg in df.groupby("dt"):
-        dfg = dfg.copy().dropna(subset=[factor, target])
-        if dfg.empty or len(dfg) < 5:
-            ret.append([dt, 0])
-            logger.warning(f"{dt} has no enough data, only {len(dfg)} rows")
-            continue
-
-        x = dfg[factor].values.reshape(-1, 1)
-        y = dfg[target].values.reshape(-1, 1)
-        model = LinearRegression(fit_intercept=fit_intercept).fit(x, y)
-        ret.append([dt, model.coef_[0][0]])
-
-    dft = pd.DataFrame(ret, columns=["dt", "returns"])
+    dfv, dfn = cross_sectional_stats(df, factor, target, method="slope", fit_intercept=fit_intercept, return_count=True)
+    returns, counts = dfv[factor].values, dfn[factor].values
+    for dt, n in zip(dfn.index[counts < 5], counts[counts < 5]):
+        logger.warning(f"{dt} has no enough data, only {n} rows")
+    dft = pd.DataFrame({"dt": dfv.index, "returns": np.where(counts < 5, 0, returns)})
     return dft
 
 
@@ -486,21 +551,13 @@ def feature_sectional_corr(df, factor, target="n1b", method="pearson", **kwargs)
 
     :return：df，res: 前者是每日相关系数结果，后者是每日相关系数的统计结果
     """
-    from czsc.utils import single_linear
-
-    df = df.copy()
-    corr = []
-    for dt, dfg in df.groupby("dt"):
-        dfg = dfg.copy().dropna(subset=[factor, target])
-
-        if dfg.empty or len(dfg) < 5:
-            corr.append([dt, 0])
-            logger.warning(f"{dt} has no enough data, only {len(dfg)} rows")
-        else:
-            c = dfg[factor].corr(dfg[target], method=method)
-            corr.append([dt, c])
+    from czsc.utils.corr import single_linear, _sectional_corr
 
-    dft = pd.DataFrame(corr, columns=["dt", "corr"])
+    ic, counts = _sectional_corr(df, factor, target, method, dt_col="dt")
+    counts = counts.reindex(ic.index).values
+    for dt, n in zip(ic.index[counts < 5], counts[counts < 5]):
+        logger.warning(f"{dt} has no enough data, only {n} rows")
+    dft = pd.DataFrame({"dt": ic.index, "ic": np.where(counts < 5, 0, ic.values)})
 
     res = {
         "factor": factor,
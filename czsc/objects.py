@@ -5,15 +5,15 @@ email: zeng_bin8888@163.com
 create_dt: 2021/3/10 12:21
 describe: 常用对象结构
 """
+import sys
 import math
 import hashlib
 import pandas as pd
-from copy import deepcopy
 from dataclasses import dataclass, field
 from datetime import datetime
 from loguru import logger
 from deprecated import deprecated
-from typing import List, Callable, Dict
+from typing import List, Callable, Dict, Tuple, Union
 from czsc.enum import Mark, Direction, Freq, Operate
 from czsc.utils.corr import single_linear
 
@@ -81,8 +81,80 @@ class NewBar:
         return self.elements
 
 
+class _FXSummary:
+    """分型的衍生属性，第一次访问时计算并缓存"""
+
+    __slots__ = ("power_str", "power_volume", "has_zs")
+
+    def __init__(self):
+        self.power_str = None
+        self.power_volume = None
+        self.has_zs = None
+
+
+class _BISummary:
+    """笔的衍生属性：笔完成后构成笔的分型和K线不再变化，high/low/power_price 在创建时计算，其他属性第一次访问时计算"""
+
+    __slots__ = ("high", "low", "power_price", "change", "raw_bars", "power_volume", "linear")
+
+    def __init__(self, fx_a, fx_b):
+        self.high = max(fx_a.high, fx_b.high)
+        self.low = min(fx_a.low, fx_b.low)
+        self.power_price = round(abs(fx_b.fx - fx_a.fx), 2)
+        self.change = None
+        self.raw_bars = None
+        self.power_volume = None
+        self.linear = {}
+
+
+class _ZSSummary:
+    """中枢的上下沿、最高最低点，bis 追加笔时增量更新，bis 被重新赋值或最后一笔被替换时重新计算"""
+
+    __slots__ = ("bis_id", "n", "last", "zg", "zd", "gg", "dd")
+
+    def __init__(self):
+        self.bis_id = None
+        self.n = 0
+        self.last = None
+        self.zg = self.zd = self.gg = self.dd = None
+
+    def update(self, bis):
+        n = self.n
+        if self.bis_id != id(bis) or len(bis) < n or (n and bis[n - 1] is not self.last):
+            self.__init__()
+            self.bis_id, n = id(bis), 0
+
+        for i in range(n, len(bis)):
+            bi = bis[i]
+            if i == 0:
+                self.zg, self.zd, self.gg, self.dd = bi.high, bi.low, bi.high, bi.low
+                continue
+            if i < 3:
+                self.zg = min(self.zg, bi.high)
+                self.zd = max(self.zd, bi.low)
+            self.gg = max(self.gg, bi.high)
+            self.dd = min(self.dd, bi.low)
+
+        self.n = len(bis)
+        self.last = bis[-1] if bis else None
+        return self
+
+
+class _SummaryStateMixin:
+    """pickle 时不保存衍生属性，加载后重新创建，兼容没有衍生属性的历史序列化文件"""
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_summary", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__post_init__()
+
+
 @dataclass
-class FX:
+class FX(_SummaryStateMixin):
     symbol: str
     dt: datetime
     mark: Mark
@@ -92,6 +164,9 @@ class FX:
     elements: List = field(default_factory=list)
     cache: dict = field(default_factory=dict)  # cache 用户缓存
 
+    def __post_init__(self):
+        self._summary = _FXSummary()
+
     @property
     def new_bars(self):
         """构成分型的无包含关系K线"""
@@ -99,7 +174,10 @@ class FX:
 
     @property
     def raw_bars(self):
-        """构成分型的原始K线"""
+        """构成分型的原始K线
+
+        最后一根无包含K线可能尚未完成，其原始K线列表会被原地更新，因此这里不缓存
+        """
         res = []
         for e in self.elements:
             res.extend(e.raw_bars)
@@ -107,6 +185,12 @@ class FX:
 
     @property
     def power_str(self):
+        value = self._summary.power_str
+        if value is None:
+            value = self._summary.power_str = self.__power_str()
+        return value
+
+    def __power_str(self):
         assert len(self.elements) == 3
         k1, k2, k3 = self.elements
 
@@ -130,16 +214,22 @@ class FX:
     @property
     def power_volume(self):
         """成交量力度"""
-        assert len(self.elements) == 3
-        return sum([x.vol for x in self.elements])
+        value = self._summary.power_volume
+        if value is None:
+            assert len(self.elements) == 3
+            value = self._summary.power_volume = sum([x.vol for x in self.elements])
+        return value
 
     @property
     def has_zs(self):
         """构成分型的三根无包含K线是否有重叠中枢"""
-        assert len(self.elements) == 3
-        zd = max([x.low for x in self.elements])
-        zg = min([x.high for x in self.elements])
-        return zg >= zd
+        value = self._summary.has_zs
+        if value is None:
+            assert len(self.elements) == 3
+            zd = max([x.low for x in self.elements])
+            zg = min([x.high for x in self.elements])
+            value = self._summary.has_zs = zg >= zd
+        return value
 
 
 @dataclass
@@ -197,7 +287,7 @@ def create_fake_bis(fxs: List[FX]) -> List[FakeBI]:
 
 
 @dataclass
-class BI:
+class BI(_SummaryStateMixin):
     symbol: str
     fx_a: FX    # 笔开始的分型
     fx_b: FX    # 笔结束的分型
@@ -209,6 +299,7 @@ class BI:
     def __post_init__(self):
         self.sdt = self.fx_a.dt
         self.edt = self.fx_b.dt
+        self._summary = _BISummary(self.fx_a, self.fx_b)
 
     def __repr__(self):
         return (
@@ -242,14 +333,10 @@ class BI:
             intercept   截距
             r2          拟合优度
         """
-        cache = self.cache if self.cache else {}
-        key = f"{price_key}_linear_info"
-        value = cache.get(key, None)
-
-        if not value:
-            value = single_linear([x.__dict__[price_key] for x in self.raw_bars])
-            cache[key] = value
-            self.cache = cache
+        linear = self._summary.linear
+        value = linear.get(price_key, None)
+        if value is None:
+            value = linear[price_key] = single_linear([getattr(x, price_key) for x in self.raw_bars])
         return value
 
     # 定义一些附加属性，用的时候才会计算，提高效率
@@ -265,34 +352,36 @@ class BI:
 
     @property
     def high(self):
-        def __default():
-            return max(self.fx_a.high, self.fx_b.high)
-
-        return self.get_cache_with_default("high", __default)
+        return self._summary.high
 
     @property
     def low(self):
-        return min(self.fx_a.low, self.fx_b.low)
+        return self._summary.low
 
     @property
     def power(self):
-        return self.power_price
+        return self._summary.power_price
 
     @property
     def power_price(self):
         """价差力度"""
-        return round(abs(self.fx_b.fx - self.fx_a.fx), 2)
+        return self._summary.power_price
 
     @property
     def power_volume(self):
         """成交量力度"""
-        return sum([x.vol for x in self.bars[1:-1]])
+        value = self._summary.power_volume
+        if value is None:
+            value = self._summary.power_volume = sum([x.vol for x in self.bars[1:-1]])
+        return value
 
     @property
     def change(self):
         """笔的涨跌幅"""
-        c = round((self.fx_b.fx - self.fx_a.fx) / self.fx_a.fx, 4)
-        return c
+        value = self._summary.change
+        if value is None:
+            value = self._summary.change = round((self.fx_b.fx - self.fx_a.fx) / self.fx_a.fx, 4)
+        return value
 
     @property
     def length(self):
@@ -308,19 +397,18 @@ class BI:
     @property
     def raw_bars(self):
         """构成笔的原始K线序列"""
-
-        def __default():
+        value = self._summary.raw_bars
+        if value is None:
             value = []
             for bar in self.bars[1:-1]:
                 value.extend(bar.raw_bars)
-            return value
-
-        return self.get_cache_with_default("raw_bars", __default)
+            self._summary.raw_bars = value
+        return value
 
     @property
     def hypotenuse(self):
         """笔的斜边长度"""
-        return pow(pow(self.power_price, 2) + pow(len(self.raw_bars), 2), 1 / 2)
+        return pow(pow(self._summary.power_price, 2) + pow(len(self.raw_bars), 2), 1 / 2)
 
     @property
     def angle(self):
@@ -329,7 +417,7 @@ class BI:
 
 
 @dataclass
-class ZS:
+class ZS(_SummaryStateMixin):
     """中枢对象，主要用于辅助信号函数计算"""
 
     bis: List[BI]
@@ -337,6 +425,15 @@ class ZS:
 
     def __post_init__(self):
         self.symbol = self.bis[0].symbol
+        self._summary = _ZSSummary()
+
+    def __get_summary(self) -> _ZSSummary:
+        """中枢的上下沿、最高最低点；bis 追加或重新赋值后自动更新"""
+        s = self._summary
+        bis = self.bis
+        if s.n != len(bis) or s.bis_id != id(bis) or (bis and bis[-1] is not s.last):
+            s.update(bis)
+        return s
 
     @property
     def sdt(self):
@@ -361,40 +458,43 @@ class ZS:
     @property
     def zz(self):
         """中枢中轴"""
-        return self.zd + (self.zg - self.zd) / 2
+        s = self.__get_summary()
+        return s.zd + (s.zg - s.zd) / 2
 
     @property
     def gg(self):
         """中枢最高点"""
-        return max([x.high for x in self.bis])
+        return self.__get_summary().gg
 
     @property
     def zg(self):
         """中枢上沿"""
-        return min([x.high for x in self.bis[:3]])
+        return self.__get_summary().zg
 
     @property
     def dd(self):
         """中枢最低点"""
-        return min([x.low for x in self.bis])
+        return self.__get_summary().dd
 
     @property
     def zd(self):
         """中枢下沿"""
-        return max([x.low for x in self.bis[:3]])
+        return self.__get_summary().zd
 
     @property
     def is_valid(self):
         """中枢是否有效"""
-        if self.zg < self.zd:
+        s = self.__get_summary()
+        zg, zd = s.zg, s.zd
+        if zg < zd:
             return False
 
         for bi in self.bis:
             # 中枢内的笔必须与中枢的上下沿有交集
             if (
-                self.zg >= bi.high >= self.zd
-                or self.zg >= bi.low >= self.zd
-                or bi.high >= self.zg > self.zd >= bi.low
+                zg >= bi.high >= zd
+                or zg >= bi.low >= zd
+                or bi.high >= zg > zd >= bi.low
             ):
                 continue
             else:
@@ -410,6 +510,48 @@ class ZS:
         )
 
 
+# 信号值的解析缓存，key 为信号值字符串，value 为 (v1, v2, v3, score) 元组
+_signal_values: Dict[str, Tuple[str, str, str, int]] = {}
+
+
+def parse_signal_value(value: Union[str, tuple]) -> Tuple[str, str, str, int]:
+    """将信号值 "v1_v2_v3_score" 解析为 (v1, v2, v3, score) 元组
+
+    解析结果会被缓存，相同的信号值只解析一次，并且共享同一个元组对象；传入元组时直接返回。
+
+    :param value: 信号值，如 "看多_强_任意_0"
+    :return: 预解析的信号值，如 ("看多", "强", "任意", 0)
+    """
+    if value.__class__ is tuple:
+        return value
+
+    res = _signal_values.get(value, None)
+    if res is None:
+        v1, v2, v3, score = value.split("_")
+        res = (sys.intern(v1), sys.intern(v2), sys.intern(v3), int(score))
+        if len(_signal_values) >= 100000:
+            _signal_values.clear()
+        _signal_values[value] = res
+    return res
+
+
+def parse_signals(s: dict) -> dict:
+    """将信号字典中的信号值全部转换为预解析的元组，其他字段保持不变
+
+    Signal.is_match 同时支持字符串和元组两种信号值；同一份信号需要被大量 Position 反复匹配时，
+    预先转换可以省去每次匹配时的解析。
+
+    :param s: 信号字典，如 CzscSignals.s
+    :return: 新的信号字典
+    """
+    res = {}
+    for k, v in s.items():
+        if isinstance(v, str) and v.count("_") == 3 and v.rsplit("_", 1)[-1].isdigit():
+            v = parse_signal_value(v)
+        res[k] = v
+    return res
+
+
 @dataclass
 class Signal:
     signal: str = ""
@@ -446,6 +588,16 @@ class Signal:
 
         if self.score > 100 or self.score < 0:
             raise ValueError("score 必须在0~100之间")
+        self.__compile()
+
+    def __compile(self):
+        """缓存信号名称和匹配条件，取值为 任意 的条件用 None 表示"""
+        self._key = "_".join(k for k in [self.k1, self.k2, self.k3] if k != "任意")
+        self._pred = tuple(None if v == "任意" else v for v in [self.v1, self.v2, self.v3])
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__compile()
 
     def __repr__(self):
         return f"Signal('{self.signal}')"
@@ -453,11 +605,7 @@ class Signal:
     @property
     def key(self) -> str:
         """获取信号名称"""
-        key = ""
-        for k in [self.k1, self.k2, self.k3]:
-            if k != "任意":
-                key += k + "_"
-        return key.strip("_")
+        return self._key
 
     @property
     def value(self) -> str:
@@ -477,20 +625,19 @@ class Signal:
         如果当前信号的第二个值 v2 等于目标信号的第二个值 self.v2 或者目标信号的第二个值为 "任意"，则继续执行，否则返回 False。
         如果当前信号的第三个值 v3 等于目标信号的第三个值 self.v3 或者目标信号的第三个值为 "任意"，则返回 True，否则返回 False。
 
+        信号值可以是字符串，也可以是 parse_signal_value 预解析的元组。
+
         :param s: 所有信号字典
         :return: bool
         """
-        key = self.key
-        v = s.get(key, None)
+        v = s.get(self._key, None)
         if not v:
-            raise ValueError(f"{key} 不在信号列表中")
-
-        v1, v2, v3, score = v.split("_")
-        if int(score) >= self.score:
-            if v1 == self.v1 or self.v1 == "任意":
-                if v2 == self.v2 or self.v2 == "任意":
-                    if v3 == self.v3 or self.v3 == "任意":
-                        return True
+            raise ValueError(f"{self._key} 不在信号列表中")
+
+        v1, v2, v3, score = v if v.__class__ is tuple else parse_signal_value(v)
+        if score >= self.score:
+            p1, p2, p3 = self._pred
+            return (p1 is None or v1 == p1) and (p2 is None or v2 == p2) and (p3 is None or v3 == p3)
         return False
 
 
@@ -656,14 +803,21 @@ class Event:
         4. 最后判断因子是否满足，顺序遍历因子列表，找到第一个满足的因子就退出，并返回 True 和该因子的名称，表示事件满足。
         5. 如果遍历完所有因子都没有找到满足的因子，则返回 False，表示事件不满足。
         """
-        if self.signals_not and any(signal.is_match(s) for signal in self.signals_not):
-            return False, None
+        # 使用显式循环代替 any/all + 生成器，减少热点路径上的函数调用开销
+        for signal in self.signals_not or ():
+            if signal.is_match(s):
+                return False, None
 
-        if self.signals_all and not all(signal.is_match(s) for signal in self.signals_all):
-            return False, None
+        for signal in self.signals_all or ():
+            if not signal.is_match(s):
+                return False, None
 
-        if self.signals_any and not any(signal.is_match(s) for signal in self.signals_any):
-            return False, None
+        if self.signals_any:
+            for signal in self.signals_any:
+                if signal.is_match(s):
+                    break
+            else:
+                return False, None
 
         for factor in self.factors:
             if factor.is_match(s):
@@ -919,62 +1073,12 @@ class Position:
         :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
         :return: 交易表现
         """
-        holds = deepcopy(self.holds)
-        if trade_dir != "多空":
-            _OD = 1 if trade_dir == "多头" else -1
-            for hold in holds:
-                if hold["pos"] != 0 and hold["pos"] != _OD:
-                    hold["pos"] = 0
-
-        p = {
-            "交易标的": self.symbol,
-            "策略标记": self.name,
-            "交易方向": trade_dir,
-            "开始时间": "",
-            "结束时间": "",
-            "覆盖率": 0,
-            "夏普": 0,
-            "卡玛": 0,
-            "最大回撤": 0,
-            "年化收益": 0,
-            "日胜率": 0,
-        }
-
-        if len(holds) == 0 or all(x["pos"] == 0 for x in holds):
-            return p
-
-        dfh = pd.DataFrame(holds)
-        dfh["n1b"] = (dfh["price"].shift(-1) - dfh["price"]) / dfh["price"]
-        dfh["trade_date"] = dfh["dt"].apply(lambda x: x.strftime("%Y-%m-%d"))
-        dfh["edge"] = dfh["n1b"] * dfh["pos"]  # 持有下一根K线的边际收益
+        from czsc.utils.stats import _evaluate_holds_arrays
 
-        # 按日期聚合
-        dfv = dfh.groupby("trade_date")["edge"].sum()
-        dfv = dfv.cumsum()
-
-        yearly_n = 252
-        yearly_ret = dfv.iloc[-1] * (yearly_n / len(dfv))
-        sharp = (
-            dfv.diff().mean() / dfv.diff().std() * pow(yearly_n, 0.5)
-            if dfv.diff().std() != 0
-            else 0
-        )
-        df0 = dfv.shift(1).ffill().fillna(0)
-        mdd = (1 - (df0 + 1) / (df0 + 1).cummax()).max()
-        calmar = yearly_ret / mdd if mdd != 0 else 1
-
-        p.update(
-            {
-                "开始时间": dfh["dt"].iloc[0].strftime("%Y-%m-%d"),
-                "结束时间": dfh["dt"].iloc[-1].strftime("%Y-%m-%d"),
-                "覆盖率": round(len(dfh[dfh["pos"] != 0]) / len(dfh), 4),
-                "夏普": round(sharp, 4),
-                "卡玛": round(calmar, 4),
-                "最大回撤": round(mdd, 4),
-                "年化收益": round(yearly_ret, 4),
-                "日胜率": round(sum(dfv > 0) / len(dfv), 4),
-            }
-        )
+        holds = self.holds
+        p = {"交易标的": self.symbol, "策略标记": self.name}
+        p.update(_evaluate_holds_arrays([x["dt"] for x in holds], [x["pos"] for x in holds],
+                                        [x["price"] for x in holds], trade_dir))
         return p
 
     def evaluate(self, trade_dir: str = "多空") -> dict:
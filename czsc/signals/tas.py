@@ -26,6 +26,39 @@ from czsc.objects import Signal, Direction, BI, RawBar, FX, Mark, ZS
 from czsc.traders.base import CzscSignals
 from czsc.utils import get_sub_elements, fast_slow_cross, count_last_same, create_single_signal, single_linear
 from czsc.utils.sig import cross_zero_axis, cal_cross_num, down_cross_count
+from czsc.utils.ta_stream import (
+    sync_ta_stream,
+    StreamSMA,
+    StreamEMA,
+    StreamMACD,
+    StreamBOLL,
+    StreamKDJ,
+    StreamRSI,
+    StreamCCI,
+    StreamATR,
+)
+
+
+def _update_stream_cache(c: CZSC, cache_key: str, creator, get_value, overwrite=True):
+    """使用流式指标更新最近K线的缓存，每根新K线只执行一次递推
+
+    :param c: CZSC对象
+    :param cache_key: 缓存的 key，同时作为流式指标的 key
+    :param creator: 创建流式指标的函数
+    :param get_value: 根据流式指标计算缓存的值，参数为 (stream, i)，i 为负数下标
+    :param overwrite: 是否覆盖已有的缓存
+    """
+    stream, bars = sync_ta_stream(c, cache_key, creator)
+    if stream.count == len(bars):
+        # 流式指标刚创建，更早的K线缓存已经由初始化过程写入，只更新最近5根K线
+        bars = bars[-5:]
+    # 只有倒数第二根K线已有缓存时才会执行流式更新，需要回写的K线都在指标的缓冲区中
+    bars = bars[-len(stream.values(stream.outputs[0])) :]
+
+    n = len(bars)
+    for i, bar in enumerate(bars, -n):
+        if overwrite or cache_key not in bar.cache:
+            bar.cache[cache_key] = get_value(stream, i)
 
 
 def update_ma_cache(c: CZSC, **kwargs):
@@ -67,6 +100,11 @@ def update_ma_cache(c: CZSC, **kwargs):
             _c.update({cache_key: ma[i] if ma[i] else close[i]})
             c.bars_raw[i].cache = _c
 
+    elif ma_type in ("SMA", "EMA"):
+        # 流式增量更新
+        creator = StreamSMA if ma_type == "SMA" else StreamEMA
+        _update_stream_cache(c, cache_key, lambda: creator(timeperiod), lambda s, i: s.value("ma", i))
+
     else:
         # 增量更新最近5个K线缓存
         close = np.array([x.close for x in c.bars_raw[-timeperiod - 10 :]])
@@ -110,13 +148,13 @@ def update_macd_cache(c: CZSC, **kwargs):
             c.bars_raw[i].cache = _c
 
     else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-min_count - 10 :]])
-        dif, dea, macd = MACD(close, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod)
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {"dif": dif[-i], "dea": dea[-i], "macd": macd[-i]}})
-            c.bars_raw[-i].cache = _c
+        # 流式增量更新
+        _update_stream_cache(
+            c,
+            cache_key,
+            lambda: StreamMACD(fastperiod, slowperiod, signalperiod),
+            lambda s, i: {"dif": s.value("dif", i), "dea": s.value("dea", i), "macd": s.value("macd", i)},
+        )
     return cache_key
 
 
@@ -151,14 +189,12 @@ def update_boll_cache_V230228(c: CZSC, **kwargs):
             c.bars_raw[i].cache = _c
 
     else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10 :]])
-        u1, m, l1 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=nbdev, nbdevdn=nbdev, matype=0)
+        # 流式增量更新
+        def _get_value(s, i):
+            u1, m, l1 = StreamBOLL.bands(s.value("mid", i), s.value("std", i), nbdev)
+            return {"上轨": u1, "中线": m, "下轨": l1}
 
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {"上轨": u1[-i], "中线": m[-i], "下轨": l1[-i]}})
-            c.bars_raw[-i].cache = _c
+        _update_stream_cache(c, cache_key, lambda: StreamBOLL(timeperiod), _get_value)
 
     return cache_key
 
@@ -211,28 +247,15 @@ def update_boll_cache(c: CZSC, **kwargs):
             c.bars_raw[i].cache = _c
 
     else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10 :]])
-        u1, m, l1 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[0], nbdevdn=dev_seq[0], matype=0)
-        u2, m, l2 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[1], nbdevdn=dev_seq[1], matype=0)
-        u3, m, l3 = ta.BBANDS(close, timeperiod=timeperiod, nbdevup=dev_seq[2], nbdevdn=dev_seq[2], matype=0)
+        # 流式增量更新
+        def _get_value(s, i):
+            mid, std = s.value("mid", i), s.value("std", i)
+            u1, m, l1 = StreamBOLL.bands(mid, std, dev_seq[0])
+            u2, m, l2 = StreamBOLL.bands(mid, std, dev_seq[1])
+            u3, m, l3 = StreamBOLL.bands(mid, std, dev_seq[2])
+            return {"上轨3": u3, "上轨2": u2, "上轨1": u1, "中线": m, "下轨1": l1, "下轨2": l2, "下轨3": l3}
 
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update(
-                {
-                    cache_key: {
-                        "上轨3": u3[-i],
-                        "上轨2": u2[-i],
-                        "上轨1": u1[-i],
-                        "中线": m[-i],
-                        "下轨1": l1[-i],
-                        "下轨2": l2[-i],
-                        "下轨3": l3[-i],
-                    }
-                }
-            )
-            c.bars_raw[-i].cache = _c
+        _update_stream_cache(c, cache_key, lambda: StreamBOLL(timeperiod), _get_value)
 
     return cache_key
 
@@ -1220,19 +1243,13 @@ def update_kdj_cache(c: CZSC, **kwargs):
             c.bars_raw[i].cache = _c
 
     else:
-        bars = c.bars_raw[-min_count - 10 :]
-        high = np.array([x.high for x in bars])
-        low = np.array([x.low for x in bars])
-        close = np.array([x.close for x in bars])
-        k, d = ta.STOCH(
-            high, low, close, fastk_period=fastk_period, slowk_period=slowk_period, slowd_period=slowd_period
+        # 流式增量更新
+        _update_stream_cache(
+            c,
+            cache_key,
+            lambda: StreamKDJ(fastk_period, slowk_period, slowd_period),
+            lambda s, i: {"k": s.value("k", i), "d": s.value("d", i), "j": s.value("j", i)},
         )
-        j = list(map(lambda x, y: 3 * x - 2 * y, k, d))
-
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: {"k": k[-i], "d": d[-i], "j": j[-i]}})
-            c.bars_raw[-i].cache = _c
 
     return cache_key
 
@@ -1380,14 +1397,8 @@ def update_rsi_cache(c: CZSC, **kwargs):
             c.bars_raw[i].cache = _c
 
     else:
-        # 增量更新最近5个K线缓存
-        close = np.array([x.close for x in c.bars_raw[-timeperiod - 10 :]])
-        rsi = ta.RSI(close, timeperiod=timeperiod)
-
-        for i in range(1, 6):
-            _c = dict(c.bars_raw[-i].cache) if c.bars_raw[-i].cache else dict()
-            _c.update({cache_key: rsi[-i]})
-            c.bars_raw[-i].cache = _c
+        # 流式增量更新
+        _update_stream_cache(c, cache_key, lambda: StreamRSI(timeperiod), lambda s, i: s.value("rsi", i))
 
     return cache_key
 
@@ -1920,13 +1931,17 @@ def update_cci_cache(c: CZSC, **kwargs):
         return cache_key
 
     last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
-        # 初始化缓存
-        bars = c.bars_raw
-    else:
-        # 增量更新最近5个K线缓存
-        bars = c.bars_raw[-timeperiod - 10 :]
+    if cache_key in last_cache.keys() and len(c.bars_raw) >= timeperiod + 15:
+        # 流式增量更新
+        def _get_value(s, i):
+            value = s.value("cci", i)
+            return value if value else 0
+
+        _update_stream_cache(c, cache_key, lambda: StreamCCI(timeperiod), _get_value, overwrite=False)
+        return cache_key
 
+    # 初始化缓存
+    bars = c.bars_raw
     high = np.array([x.high for x in bars])
     low = np.array([x.low for x in bars])
     close = np.array([x.close for x in bars])
@@ -2070,13 +2085,17 @@ def update_atr_cache(c: CZSC, **kwargs):
         return cache_key
 
     last_cache = dict(c.bars_raw[-2].cache) if c.bars_raw[-2].cache else dict()
-    if cache_key not in last_cache.keys() or len(c.bars_raw) < timeperiod + 15:
-        # 初始化缓存
-        bars = c.bars_raw
-    else:
-        # 增量更新最近5个K线缓存
-        bars = c.bars_raw[-timeperiod - 80 :]
+    if cache_key in last_cache.keys() and len(c.bars_raw) >= timeperiod + 15:
+        # 流式增量更新
+        def _get_value(s, i):
+            value = s.value("atr", i)
+            return value if value else 0
+
+        _update_stream_cache(c, cache_key, lambda: StreamATR(timeperiod), _get_value, overwrite=False)
+        return cache_key
 
+    # 初始化缓存
+    bars = c.bars_raw
     high = np.array([x.high for x in bars])
     low = np.array([x.low for x in bars])
     close = np.array([x.close for x in bars])
@@ -16,9 +16,11 @@ from tqdm import tqdm
 from copy import deepcopy
 from datetime import timedelta, datetime
 from abc import ABC, abstractmethod
+from typing import Union
 from loguru import logger
 from czsc.objects import RawBar, List, Operate, Signal, Factor, Event, Position
 from czsc.traders.base import CzscTrader
+from czsc.traders.vector_backtest import vector_dummy
 from czsc.traders.sig_parse import get_signals_freqs, get_signals_config
 from czsc.utils import x_round, freqs_sorted, BarGenerator, dill_dump, save_json, read_json
 from czsc.utils import check_freq_and_market
@@ -163,12 +165,21 @@ class CzscStrategyBase(ABC):
         trader = self.init_trader(bars, **kwargs)
         return trader
 
-    def dummy(self, sigs: List[dict], **kwargs) -> CzscTrader:
+    def dummy(self, sigs: Union[List[dict], pd.DataFrame], **kwargs) -> CzscTrader:
         """使用信号缓存进行策略回测
 
-        :param sigs: 信号缓存，一般指 generate_czsc_signals 函数计算的结果缓存
+        :param sigs: 信号缓存，一般指 generate_czsc_signals 函数计算的结果缓存；
+            传入 DataFrame 时，使用 czsc.traders.vector_backtest 中的向量化回测，结果与逐行回测一致
         :return: 完成策略回测后的 CzscTrader 对象
         """
+        if isinstance(sigs, pd.DataFrame):
+            trader = CzscTrader(positions=vector_dummy(sigs, self.positions))  # type: ignore
+            if len(sigs) > 0:
+                trader.s = sigs.iloc[-1].to_dict()
+                trader.symbol, trader.end_dt = trader.s['symbol'], trader.s['dt']
+                trader.bid, trader.latest_price = trader.s['id'], trader.s['close']
+            return trader
+
         sleep_time = kwargs.get("sleep_time", 0)
         sleep_step = kwargs.get("sleep_step", 1000)
 
@@ -6,14 +6,19 @@ create_dt: 2021/11/1 22:20
 describe: 交易员（traders）：使用 CZSC 分析工具进行择时策略的开发，交易等
 """
 from czsc.traders.base import (
-    CzscSignals, CzscTrader, generate_czsc_signals, check_signals_acc, get_unique_signals
+    CzscSignals, CzscTrader, generate_czsc_signals, prepare_czsc_signals, check_signals_acc, get_unique_signals
 )
 
 from czsc.traders.performance import (
     PairsPerformance, combine_holds_and_pairs, combine_dates_and_pairs, stock_holds_performance
 )
 from czsc.traders.dummy import DummyBacktest
+from czsc.traders.vector_backtest import SignalsMatrix, vector_dummy
+from czsc.traders.signal_engine import SignalEngine, generate_signals_frame
+from czsc.traders.snapshot import TraderSnapshot, dump_snapshot, load_snapshot, load_trader
 from czsc.traders.sig_parse import SignalsParser, get_signals_config, get_signals_freqs
 from czsc.traders.weight_backtest import WeightBacktest, get_ensemble_weight, long_short_equity, stoploss_by_direction
-from czsc.traders.rwc import RedisWeightsClient, get_strategy_mates, get_heartbeat_time, clear_strategy, get_strategy_weights
+from czsc.traders.rwc import (
+    RedisWeightsClient, RedisWeightsPublisher, get_strategy_mates, get_heartbeat_time, clear_strategy, get_strategy_weights
+)
 from czsc.traders.optimize import OpensOptimize, ExitsOptimize
@@ -6,6 +6,7 @@ create_dt: 2022/12/24 22:20
 describe: 简单的单仓位策略执行
 """
 import os
+import time
 import webbrowser
 import numpy as np
 import pandas as pd
@@ -21,8 +22,9 @@ from pyecharts.options import ComponentTitleOpts
 from czsc.analyze import CZSC
 from czsc.objects import Position, RawBar, Signal
 from czsc.utils.bar_generator import BarGenerator
+from czsc.utils.bar_store import bar_fields
 from czsc.utils.cache import home_path
-from czsc.utils import sorted_freqs, import_by_name
+from czsc.utils import sorted_freqs, import_by_name, compact_signals
 from czsc.traders.sig_parse import get_signals_freqs
 
 
@@ -39,6 +41,10 @@ class CzscSignals:
         self.cache = OrderedDict()
         self.kwargs = kwargs
         self.signals_config = kwargs.get("signals_config", [])
+        # 信号计算的执行计划，由 compile_signals_config 生成；signals_timing 记录每个信号函数的耗时
+        self._signals_plan = None
+        self._signals_plan_key = None
+        self.signals_timing = OrderedDict()
 
         if bg:
             self.bg = bg
@@ -52,7 +58,7 @@ class CzscSignals:
             self.end_dt, self.bid, self.latest_price = last_bar.dt, last_bar.id, last_bar.close
             self.s = OrderedDict()
             self.s.update(self.get_signals_by_conf())
-            self.s.update(last_bar.__dict__)
+            self.s.update(bar_fields(last_bar))
         else:
             self.bg = None
             self.symbol = None
@@ -84,23 +90,74 @@ class CzscSignals:
                 {'name': 'czsc.signals.tas_double_ma_V221203', 'freq': '日线', 'di': 5, 'ma_seq': (5, 20), 'th': 100},
             ]
 
+        信号参数配置只在第一次调用时编译为执行计划（参见 compile_signals_config），之后每根K线只执行预先绑定好的调用。
+        初始化时传入 profile_signals=True，会在 signals_timing 中记录每个信号函数的耗时，使用 get_signals_timing 查看。
+
         :return: 信号字典
         """
         s = OrderedDict()
         if not self.signals_config:
             return s
 
+        if getattr(self, "_signals_plan_key", None) != self.__signals_plan_key():
+            self.compile_signals_config()
+
+        if self.kwargs.get("profile_signals", False):
+            timing = self.signals_timing
+            for label, sig_func, target, param in self._signals_plan:
+                start = time.perf_counter()
+                s.update(sig_func(target, **param))
+                cost = time.perf_counter() - start
+                count, total = timing.get(label, (0, 0.0))
+                timing[label] = (count + 1, total + cost)
+        else:
+            for _, sig_func, target, param in self._signals_plan:
+                s.update(sig_func(target, **param))
+        return s
+
+    def __signals_plan_key(self):
+        """执行计划依赖的对象，任意一个发生变化都需要重新编译"""
+        return id(self.signals_config), len(self.signals_config), id(self.kas)
+
+    def compile_signals_config(self):
+        """将信号参数配置编译为执行计划
+
+        1. 对每个配置只执行一次 dict(param)、import_by_name 和 freq 查找，将信号函数、参数、输入对象绑定为一个调用；
+        2. 指定了 freq 且 freq 在 self.kas 中的，输入对象为对应的 CZSC 对象，否则为 CzscSignals 对象本身；
+        3. 完全相同的配置只保留第一个，信号结果的顺序与逐个执行配置的结果一致。
+
+        signals_config 或 kas 被替换后，get_signals_by_conf 会自动重新编译；原地修改某个配置的内容后，需要手动调用本方法。
+
+        :return: 执行计划，[(信号标识, 信号函数, 输入对象, 参数), ...]
+        """
+        plan, seen = [], set()
         for param in self.signals_config:
             param = dict(param)
             sig_name = param.pop('name')
             sig_func = import_by_name(sig_name) if isinstance(sig_name, str) else sig_name
-
             freq = param.pop('freq', None)
-            if freq in self.kas:    # 如果指定了 freq，那么就使用 CZSC 对象作为输入
-                s.update(sig_func(self.kas[freq], **param))
-            else:                   # 否则使用 CAT 作为输入
-                s.update(sig_func(self, **param))
-        return s
+
+            name = sig_name if isinstance(sig_name, str) else getattr(sig_func, "__name__", repr(sig_func))
+            label = f"{name}#{freq}#{sorted(param.items())}"
+            if label in seen:
+                continue
+            seen.add(label)
+
+            target = self.kas[freq] if self.kas and freq in self.kas else self
+            plan.append((label, sig_func, target, param))
+
+        self._signals_plan = plan
+        self._signals_plan_key = self.__signals_plan_key()
+        return plan
+
+    def get_signals_timing(self) -> pd.DataFrame:
+        """获取每个信号函数的耗时统计，需要初始化时传入 profile_signals=True
+
+        :return: 耗时统计，按总耗时降序排列，列：signal, count, total, mean；耗时单位为秒
+        """
+        rows = [{"signal": k, "count": v[0], "total": v[1], "mean": v[1] / v[0]} for k, v in self.signals_timing.items()]
+        df = pd.DataFrame(rows, columns=["signal", "count", "total", "mean"])
+        return df.sort_values("total", ascending=False, ignore_index=True)
 
     def take_snapshot(self, file_html=None, width: str = "1400px", height: str = "580px"):
         """获取快照
@@ -186,7 +243,40 @@ class CzscSignals:
         self.end_dt, self.bid, self.latest_price = last_bar.dt, last_bar.id, last_bar.close
         self.s = OrderedDict()
         self.s.update(self.get_signals_by_conf())
-        self.s.update(last_bar.__dict__)
+        self.s.update(bar_fields(last_bar))
+
+
+def prepare_czsc_signals(bars: List[RawBar], signals_config: List[dict],
+                         sdt: Union[AnyStr, datetime] = "20170101", init_n: int = 500, **kwargs):
+    """按信号计算开始时间切分K线，并用左侧K线初始化 CzscSignals
+
+    :param bars: 基础周期 K 线序列
+    :param signals_config: 信号函数配置
+    :param sdt: 信号计算开始时间
+    :param init_n: 用于 BarGenerator 初始化的基础周期K线数量
+    :return: (cs, bars_right)，bars_right 为空时 cs 为 None
+    """
+    freqs = get_signals_freqs(signals_config)
+    freqs = [freq for freq in freqs if freq != bars[0].freq.value]
+    sdt = pd.to_datetime(sdt)                       # type: ignore
+    bars_left = [x for x in bars if x.dt < sdt]     # type: ignore
+    if len(bars_left) <= init_n:
+        bars_left = bars[:init_n]
+        bars_right = bars[init_n:]
+    else:
+        bars_right = [x for x in bars if x.dt >= sdt]   # type: ignore
+
+    if len(bars_right) == 0:
+        return None, []
+
+    base_freq = str(bars[0].freq.value)
+    bg = BarGenerator(base_freq=base_freq, freqs=freqs, max_count=kwargs.get("bg_max_count", 5000))
+    for bar in bars_left:
+        bg.update(bar)
+
+    cs = CzscSignals(bg, signals_config=signals_config, **kwargs)
+    cs.cache.update({'gsc_kwargs': kwargs})
+    return cs, bars_right
 
 
 def generate_czsc_signals(bars: List[RawBar], signals_config: List[dict],
@@ -201,7 +291,7 @@ def generate_czsc_signals(bars: List[RawBar], signals_config: List[dict],
     4. 函数创建一个BarGenerator对象bg，并使用bars_left中的K线数据来初始化它。
     5. 函数创建一个CzscSignals对象cs，并将bg和信号配置signals_config作为参数传入。
     6. 函数遍历bars_right中的每一根K线，对于每一根K线，函数调用cs.update_signals(bar)来更新信号，并将更新后的信号添加到_sigs列表中。
-    7. 最后，如果df参数为True，函数将_sigs转换为DataFrame并返回；否则，直接返回_sigs。
+    7. 最后，如果df参数为True，函数将_sigs转换为DataFrame并返回，其中信号列为分类编码（参见 compact_signals）；否则，直接返回_sigs。
 
     :param bars: 基础周期 K 线序列
     :param signals_config: 信号函数配置，格式如下：
@@ -213,40 +303,24 @@ def generate_czsc_signals(bars: List[RawBar], signals_config: List[dict],
         ]
     :param sdt: 信号计算开始时间
     :param init_n: 用于 BarGenerator 初始化的基础周期K线数量
-    :param df: 是否返回 df 格式的信号计算结果，默认 False
+    :param df: 是否返回 df 格式的信号计算结果，默认 False；信号列为 category 类型
     :return: 信号计算结果
     """
-    freqs = get_signals_freqs(signals_config)
-    freqs = [freq for freq in freqs if freq != bars[0].freq.value]
-    sdt = pd.to_datetime(sdt)                       # type: ignore
-    bars_left = [x for x in bars if x.dt < sdt]     # type: ignore
-    if len(bars_left) <= init_n:
-        bars_left = bars[:init_n]
-        bars_right = bars[init_n:]
-    else:
-        bars_right = [x for x in bars if x.dt >= sdt]   # type: ignore
-
-    if len(bars_right) == 0:
+    cs, bars_right = prepare_czsc_signals(bars, signals_config, sdt=sdt, init_n=init_n, **kwargs)
+    if not bars_right:
         logger.warning("右侧K线为空，无法进行信号生成", category=RuntimeWarning)
         if df:
             return pd.DataFrame()
         else:
             return []
 
-    base_freq = str(bars[0].freq.value)
-    bg = BarGenerator(base_freq=base_freq, freqs=freqs, max_count=kwargs.get("bg_max_count", 5000))
-    for bar in bars_left:
-        bg.update(bar)
-
     _sigs = []
-    cs = CzscSignals(bg, signals_config=signals_config, **kwargs)
-    cs.cache.update({'gsc_kwargs': kwargs})
-    for bar in tqdm(bars_right, desc=f'generate signals of {bg.symbol}'):
+    for bar in tqdm(bars_right, desc=f'generate signals of {cs.symbol}'):
         cs.update_signals(bar)
         _sigs.append(dict(cs.s))
 
     if df:
-        return pd.DataFrame(_sigs)
+        return compact_signals(pd.DataFrame(_sigs), inplace=True)
     else:
         return _sigs
 
@@ -12,7 +12,7 @@ from tqdm import tqdm
 from loguru import logger
 from concurrent.futures import ProcessPoolExecutor
 from czsc import fsa
-from czsc.traders.base import generate_czsc_signals
+from czsc.traders.signal_engine import generate_signals_frame
 
 
 class DummyBacktest:
@@ -66,15 +66,13 @@ class DummyBacktest:
             file_sigs = os.path.join(self.signals_path, f"{symbol}.sigs")
             if not os.path.exists(file_sigs):
                 bars = self.read_bars(symbol, tactic.base_freq, self.bars_sdt, self.edt, fq='后复权')
-                sigs = generate_czsc_signals(bars, signals_config=tactic.signals_config, sdt=self.sdt, df=True)
-                sigs.drop(columns=['freq', 'cache'], inplace=True)
+                sigs = generate_signals_frame(bars, signals_config=tactic.signals_config, sdt=self.sdt)
                 sigs.to_parquet(file_sigs)
             else:
                 sigs = pd.read_parquet(file_sigs)
                 sigs = sigs[sigs['dt'] >= self.sdt]
 
-            sigs = sigs.to_dict('records')
-            trader = tactic.dummy(sigs)
+            trader = tactic.dummy(sigs.reset_index(drop=True))
 
         except Exception as e:
             logger.exception(e)
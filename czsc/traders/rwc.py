@@ -10,6 +10,7 @@ import time
 import json
 import redis
 import threading
+import numpy as np
 import pandas as pd
 from loguru import logger
 from datetime import datetime
@@ -18,7 +19,7 @@ from datetime import datetime
 class RedisWeightsClient:
     """策略持仓权重收发客户端"""
 
-    version = "V240303"
+    version = "V240616"
 
     def __init__(self, strategy_name, redis_url=None, connection_pool=None, send_heartbeat=True, **kwargs):
         """
@@ -52,9 +53,28 @@ class RedisWeightsClient:
 
             - key_prefix: str, redis中key的前缀，默认为 Weights
             - heartbeat_prefix: str, 心跳key的前缀，默认为 heartbeat
+            - stream_maxlen: int, 发布权重时同步写入 Redis Stream 的最大长度（近似），默认为0，即不写入 Stream
+
+        redis 中的数据结构（以 key_prefix=Weights 为例）：
+
+            - Weights:{strategy_name}:{symbol}:{YYYYmmddHHMMSS}，hash，单条权重记录
+            - Weights:{strategy_name}:{symbol}:LAST，hash，品种最近一次权重记录
+            - Weights:{strategy_name}:{symbol}，zset，品种所有权重记录的 key，score 为时间
+            - Weights:SYMBOLS:{strategy_name}，set，策略交易的品种列表
+            - Weights:SYMBOLS_READY:{strategy_name}，string，品种索引已经包含索引上线之前写入的品种
+            - Weights:STREAM:{strategy_name}，stream，按发布顺序记录的权重，用于增量消费
+
+        所有读取操作都通过品种索引和 zset 索引完成，不使用 KEYS 遍历整个 redis。
         """
         self.strategy_name = strategy_name
         self.key_prefix = kwargs.get("key_prefix", "Weights")
+        self.stream_maxlen = int(kwargs.get("stream_maxlen", 0) or 0)
+        self.symbols_key = f"{self.key_prefix}:SYMBOLS:{strategy_name}"
+        self.symbols_ready_key = f"{self.key_prefix}:SYMBOLS_READY:{strategy_name}"
+        self._index_ready = False
+        self.stream_key = f"{self.key_prefix}:STREAM:{strategy_name}"
+        self._weights_cache = None  # sync_weights 同步的权重记录，按 symbol, dt 排序
+        self._last_dts = {}  # sync_weights 中每个品种已同步的最大 dt
 
         if connection_pool:
             thread_safe_pool = connection_pool
@@ -145,20 +165,32 @@ class RedisWeightsClient:
         :param overwrite: boolean, 是否覆盖已有记录
         :return: 成功发布信号的条数
         """
-        if not isinstance(dt, datetime):
-            dt = pd.to_datetime(dt)
+        cnt = self.publish_many([(symbol, dt, weight, price, ref)], overwrite=overwrite)
+        if cnt == 0 and not overwrite:
+            logger.warning(f"不允许重复写入，已过滤 {symbol} {dt} 的重复信号")
+        return cnt
 
-        if not overwrite:
-            last_dt = self.get_last_times(symbol)
-            if last_dt is not None and dt <= last_dt:   # type: ignore
-                logger.warning(f"不允许重复写入，已过滤 {symbol} {dt} 的重复信号")
-                return 0
+    def publish_many(self, rows, overwrite=False):
+        """在一次 lua 调用中发布多条权重，不需要额外的请求获取最近一次发布时间
 
-        udt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        key = f'{self.key_prefix}:{self.strategy_name}:{symbol}:{dt.strftime("%Y%m%d%H%M%S")}'
-        ref = ref if ref else '{}'
-        ref_str = json.dumps(ref) if isinstance(ref, dict) else ref
-        return self.lua_publish(keys=[key], args=[1 if overwrite else 0, udt, weight, price, ref_str])
+        不覆盖已有记录时，由 lua 脚本在 redis 端过滤 dt 不晚于该品种最近一次发布时间、或者权重与最近一次相同的记录。
+
+        :param rows: list, 权重记录列表，每条记录为 (symbol, dt, weight, price, ref)，同一品种需按 dt 升序排列
+        :param overwrite: boolean, 是否覆盖已有记录
+        :return: 成功发布信号的条数
+        """
+        if not rows:
+            return 0
+
+        self.ensure_index()
+        keys, args = [], [1 if overwrite else 0, datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        for symbol, dt, weight, price, ref in rows:
+            dt = dt if isinstance(dt, datetime) else pd.to_datetime(dt)
+            keys.append(f'{self.key_prefix}:{self.strategy_name}:{symbol}:{dt.strftime("%Y%m%d%H%M%S")}')
+            ref = ref if ref else '{}'
+            args.extend([weight, price if price is not None else 0, json.dumps(ref) if isinstance(ref, dict) else ref])
+        args.append(self.stream_maxlen)
+        return self.lua_publish(keys=keys, args=args)
 
     def publish_dataframe(self, df, overwrite=False, batch_size=10000):
         """批量发布多个策略信号
@@ -173,13 +205,9 @@ class RedisWeightsClient:
         logger.info(f"输入数据中有 {len(df)} 条权重信号")
 
         # 去除单个品种下相邻时间权重相同的数据
-        _res = []
-        for _, dfg in df.groupby('symbol'):
-            dfg = dfg.sort_values('dt', ascending=True).reset_index(drop=True)
-            dfg = dfg[dfg['weight'].diff().fillna(1) != 0].copy()
-            _res.append(dfg)
-        df = pd.concat(_res, ignore_index=True)
-        df = df.sort_values(['dt']).reset_index(drop=True)
+        df = df.sort_values(['symbol', 'dt'], kind='mergesort', ignore_index=True)
+        df = df[df.groupby('symbol')['weight'].diff().fillna(1) != 0]
+        df = df.sort_values(['dt'], kind='mergesort', ignore_index=True)
         logger.info(f"去除单个品种下相邻时间权重相同的数据后，剩余 {len(df)} 条权重信号")
 
         if 'price' not in df.columns:
@@ -187,43 +215,15 @@ class RedisWeightsClient:
         if 'ref' not in df.columns:
             df['ref'] = '{}'
 
-        if not overwrite:
-            raw_count = len(df)
-            _time = self.get_last_times()
-            _data = []
-            for symbol, dfg in df.groupby('symbol'):
-                last_dt = _time.get(symbol)
-                if last_dt is not None:
-                    dfg = dfg[dfg['dt'] > last_dt]
-                _data.append(dfg)
-            df = pd.concat(_data, ignore_index=True)
-            logger.info(f"不允许重复写入，已过滤 {raw_count - len(df)} 条重复信号")
-
-        keys, args = [], []
-        for row in df[['symbol', 'dt', 'weight', 'price', 'ref']].to_numpy():
-            key = f'{self.key_prefix}:{self.strategy_name}:{row[0]}:{row[1].strftime("%Y%m%d%H%M%S")}'
-            keys.append(key)
-
-            args.append(row[2])
-            args.append(row[3])
-            ref = row[4]
-            args.append(json.dumps(ref) if isinstance(ref, dict) else ref)
-
-        udt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        overwrite = 1 if overwrite else 0
-
+        # 不覆盖已有记录时，由 lua 脚本在 redis 端过滤早于最近一次发布时间的记录
+        rows = df[['symbol', 'dt', 'weight', 'price', 'ref']].to_numpy().tolist()
         pub_cnt = 0
-        len_keys = len(keys)
-        for i in range(0, len_keys, batch_size):
-            if i + batch_size < len_keys:
-                tmp_keys = keys[i: i + batch_size]
-                tmp_args = [overwrite, udt] + args[3 * i: 3 * (i + batch_size)]
-            else:
-                tmp_keys = keys[i: len_keys]
-                tmp_args = [overwrite, udt] + args[3 * i: 3 * len_keys]
-            logger.info(f"索引 {i}，即将发布 {len(tmp_keys)} 条权重信号")
-            pub_cnt += self.lua_publish(keys=tmp_keys, args=tmp_args)
+        for i in range(0, len(rows), batch_size):
+            logger.info(f"索引 {i}，即将发布 {len(rows[i: i + batch_size])} 条权重信号")
+            pub_cnt += self.publish_many(rows[i: i + batch_size], overwrite=overwrite)
             logger.info(f"已完成 {pub_cnt} 次发布")
+        if not overwrite:
+            logger.info(f"不允许重复写入，已过滤 {len(rows) - pub_cnt} 条重复或权重未变化的信号")
 
         self.update_last()
         return pub_cnt
@@ -238,13 +238,94 @@ class RedisWeightsClient:
             time.sleep(15)
 
     def get_keys(self, pattern) -> list:
-        """获取 redis 中指定 pattern 的 keys"""
-        k = self.r.keys(pattern)
-        return k if k else []    # type: ignore
+        """获取 redis 中指定 pattern 的 keys
+
+        使用 SCAN 分批遍历，不会像 KEYS 一样阻塞 redis；仍然需要遍历整个 redis，只用于维护索引等低频操作。
+        """
+        return list(self.r.scan_iter(match=pattern, count=10000))
+
+    def rebuild_index(self):
+        """根据各品种的 LAST 记录重建品种索引，用于索引上线之前写入的策略数据
+
+        :return: list, 品种列表
+        """
+        keys = self.get_keys(f'{self.key_prefix}:{self.strategy_name}:*:LAST')
+        symbols = [x.split(":")[2] for x in keys]   # type: ignore
+        if symbols:
+            self.r.sadd(self.symbols_key, *symbols)
+            logger.info(f"{self.strategy_name} 重建品种索引，共 {len(symbols)} 个品种")
+        return sorted(symbols)
+
+    def ensure_index(self):
+        """确保品种索引包含索引上线之前写入的品种
+
+        是否完成回填由 SYMBOLS_READY 标记判断，不能根据品种索引是否为空判断：索引上线之后第一次发布会创建只包含
+        当前品种的索引，此时更早写入的品种还不在索引中。每个对象只检查一次标记。
+        """
+        if self._index_ready:
+            return
+        if not self.r.exists(self.symbols_ready_key):
+            self.rebuild_index()
+            self.r.set(self.symbols_ready_key, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        self._index_ready = True
+
+    def get_weight_keys(self, symbols=None, sdt=None, edt=None) -> dict:
+        """通过 zset 索引获取权重记录的 key
+
+        :param symbols: list, 品种列表, 默认为None, 即获取所有品种
+        :param sdt: str, 开始时间, eg: 20210924 10:19:00
+        :param edt: str, 结束时间, eg: 20220924 10:19:00
+        :return: dict, {symbol: [key1, key2, ...]}，key 按时间升序排列
+        """
+        symbols = symbols if symbols else self.get_symbols()
+        start_score = pd.to_datetime(sdt).strftime('%Y%m%d%H%M%S') if sdt else '-inf'
+        end_score = pd.to_datetime(edt).strftime('%Y%m%d%H%M%S') if edt else '+inf'
+        with self.r.pipeline() as pipe:
+            for symbol in symbols:
+                pipe.zrangebyscore(f'{self.key_prefix}:{self.strategy_name}:{symbol}', start_score, end_score)
+            rows = pipe.execute()
+        return dict(zip(symbols, rows))
+
+    def _hgetall_many(self, keys, batch_size=10000) -> list:
+        """分批使用 pipeline 读取多个 hash"""
+        rows = []
+        for i in range(0, len(keys), batch_size):
+            with self.r.pipeline() as pipe:
+                for key in keys[i: i + batch_size]:
+                    pipe.hgetall(key)
+                rows.extend(pipe.execute())
+        return rows
+
+    def read_stream(self, last_id='0-0', count=None, block=None):
+        """增量读取权重 Stream，需要在发布权重时设置 stream_maxlen > 0
+
+        :param last_id: str, 上一次读取到的消息 ID，默认为 0-0，即从头开始读取
+        :param count: int, 最多读取的消息数量
+        :param block: int, 没有新消息时阻塞等待的毫秒数，默认为None，即不阻塞
+        :return: (pd.DataFrame, last_id)，DataFrame 的列：['id', 'symbol', 'dt', 'weight', 'price', 'ref', 'update_time']
+        """
+        res = self.r.xread({self.stream_key: last_id}, count=count, block=block)
+        messages = res[0][1] if res else []     # type: ignore
+        if not messages:
+            return pd.DataFrame(), last_id
+
+        dfs = pd.DataFrame([dict(fields, id=msg_id) for msg_id, fields in messages])
+        dfs['dt'] = pd.to_datetime(dfs['dt'])
+        dfs['weight'] = dfs['weight'].astype(float)
+        dfs['price'] = dfs['price'].astype(float)
+        dfs = dfs[['id', 'symbol', 'dt', 'weight', 'price', 'ref', 'update_time']]
+        return dfs, messages[-1][0]
 
     def clear_all(self, with_human=True):
         """删除该策略所有记录"""
-        keys = self.get_keys(f'{self.key_prefix}:{self.strategy_name}*')
+        keys = []
+        for symbol, weight_keys in self.get_weight_keys().items():
+            keys.extend(weight_keys)
+            keys.append(f'{self.key_prefix}:{self.strategy_name}:{symbol}')
+            keys.append(f'{self.key_prefix}:{self.strategy_name}:{symbol}:LAST')
+        keys.append(self.symbols_key)
+        keys.append(self.symbols_ready_key)
+        keys.append(self.stream_key)
         keys.append(f'{self.key_prefix}:META:{self.strategy_name}')
         keys.append(f'{self.key_prefix}:LAST:{self.strategy_name}')
         keys.append(f'{self.key_prefix}:{self.heartbeat_prefix}:{self.strategy_name}')
@@ -259,7 +340,9 @@ class RedisWeightsClient:
                 logger.warning(f"{self.strategy_name} 删除操作已取消")
                 return
 
-        self.r.delete(*keys)                # type: ignore
+        for i in range(0, len(keys), 10000):
+            self.r.delete(*keys[i: i + 10000])  # type: ignore
+        self._index_ready = False
         logger.info(f"{self.strategy_name} 删除了 {len(keys)} 条记录")
 
     @staticmethod
@@ -267,6 +350,7 @@ class RedisWeightsClient:
         lua_body = '''
 local overwrite = ARGV[1]
 local update_time = ARGV[2]
+local stream_maxlen = tonumber(ARGV[3 + 3 * #KEYS] or '0') or 0
 local cnt = 0
 local ret
 for i = 1, #KEYS do
@@ -278,28 +362,37 @@ for i = 1, #KEYS do
     key:gsub('[^:]+', function(s) table.insert(split_str, s) end)
     local model_key = split_str[1] .. ':' .. split_str[2] .. ':' .. split_str[3]
 
+    local strategy_name, symbol, action_time = split_str[2], split_str[3], split_str[4]
+    local at_str = string.sub(action_time, 1, 4) .. '-' .. string.sub(action_time, 5, 6) .. '-' ..
+        string.sub(action_time, 7, 8) .. ' ' .. string.sub(action_time, 9, 10) .. ':' ..
+        string.sub(action_time, 11, 12) .. ':' .. string.sub(action_time, 13, 14)
+
     local if_pass = true
     if overwrite ~= '0' then
         if_pass = false
     else
-        local pos = redis.call('HGET', model_key .. ':LAST', 'weight')
-        if not pos or math.abs(tonumber(sig) - tonumber(pos)) > 0.00001 then
-            if_pass = false
+        local last = redis.call('HMGET', model_key .. ':LAST', 'weight', 'dt')
+        local pos, last_dt = last[1], last[2]
+        if not last_dt or at_str > last_dt then
+            if not pos or math.abs(tonumber(sig) - tonumber(pos)) > 0.00001 then
+                if_pass = false
+            end
         end
     end
 
     if not if_pass then
-        local strategy_name, symbol, action_time = split_str[2], split_str[3], split_str[4]
-        local at_str = string.sub(action_time, 1, 4) .. '-' .. string.sub(action_time, 5, 6) .. '-' ..
-            string.sub(action_time, 7, 8) .. ' ' .. string.sub(action_time, 9, 10) .. ':' ..
-            string.sub(action_time, 11, 12) .. ':' .. string.sub(action_time, 13, 14)
         redis.call('ZADD', model_key, tonumber(action_time), key)
+        redis.call('SADD', split_str[1] .. ':SYMBOLS:' .. strategy_name, symbol)
         local ret1 = redis.call('HMSET', key, 'symbol', symbol, 'weight', sig, 'dt', at_str, 'update_time', update_time, 'price', price, 'ref', ref_str)
         local ret2 = redis.call('HMSET', key:gsub(action_time, 'LAST'), 'symbol', symbol, 'weight', sig, 'dt', at_str, 'update_time', update_time, 'price', price, 'ref', ref_str)
         if ret1.ok and ret2.ok then
             cnt = cnt + 1
             local pubKey = 'PUBSUB:' .. split_str[1] .. ':' .. strategy_name .. ':' .. symbol
             redis.call('PUBLISH', pubKey, key .. ':' .. sig .. ':' .. price .. ':' .. ref_str)
+            if stream_maxlen > 0 then
+                redis.call('XADD', split_str[1] .. ':STREAM:' .. strategy_name, 'MAXLEN', '~', stream_maxlen, '*',
+                    'symbol', symbol, 'dt', at_str, 'weight', sig, 'price', price, 'ref', ref_str, 'update_time', update_time)
+            end
         end
     end
 end
@@ -308,10 +401,9 @@ return cnt
         return client.register_script(lua_body)
 
     def get_symbols(self):
-        """获取策略交易的品种列表"""
-        keys = self.get_keys(f'{self.key_prefix}:{self.strategy_name}*')
-        symbols = {x.split(":")[2] for x in keys}       # type: ignore
-        return list(symbols)
+        """获取策略交易的品种列表，从品种索引中读取；第一次读取时，先把索引上线之前写入的品种回填到索引中"""
+        self.ensure_index()
+        return sorted(self.r.smembers(self.symbols_key))     # type: ignore
 
     def get_last_weights(self, symbols=None, ignore_zero=True, lua=True):
         """获取最近的持仓权重
@@ -319,23 +411,21 @@ return cnt
         :param symbols: list, 品种列表
         :param ignore_zero: boolean, 是否忽略权重为0的品种
         :param lua: boolean, 是否使用 lua 脚本获取，默认为True
-            如果要全量获取，推荐使用 lua 脚本，速度更快；如果要获取指定 symbols，不推荐使用 lua 脚本。
+            如果要全量获取，推荐使用 lua 脚本，一次请求完成读取；如果要获取指定 symbols，不推荐使用 lua 脚本。
         :return: pd.DataFrame
         """
-        if lua:
+        self.ensure_index()
+        if lua and not symbols and self.r.exists(self.symbols_key):
             lua_script = """
-            local keys = redis.call('KEYS', ARGV[1])
+            local symbols = redis.call('SMEMBERS', KEYS[1])
             local results = {}
-            for i=1, #keys do
-                results[i] = redis.call('HGETALL', keys[i])
+            for i=1, #symbols do
+                results[i] = redis.call('HGETALL', ARGV[1] .. symbols[i] .. ':LAST')
             end
             return results
             """
-            key_pattern = self.key_prefix + ':' + self.strategy_name + ':*:LAST'
-            results = self.r.eval(lua_script, 0, key_pattern)
+            results = self.r.eval(lua_script, 1, self.symbols_key, f'{self.key_prefix}:{self.strategy_name}:')
             rows = [dict(zip(r[::2], r[1::2])) for r in results]     # type: ignore
-            if symbols:
-                rows = [r for r in rows if r['symbol'] in symbols]
 
         else:
             symbols = symbols if symbols else self.get_symbols()
@@ -343,6 +433,7 @@ return cnt
                 for symbol in symbols:
                     pipe.hgetall(f'{self.key_prefix}:{self.strategy_name}:{symbol}:LAST')
                 rows = pipe.execute()
+        rows = [r for r in rows if r]
 
         dfw = pd.DataFrame(rows)
         dfw['weight'] = dfw['weight'].astype(float)
@@ -390,51 +481,275 @@ return cnt
         dfw = dfw.sort_values('dt').reset_index(drop=True)
         return dfw
 
+    def _fetch_weights(self, keys) -> pd.DataFrame:
+        """读取权重记录，返回 DataFrame，列：['symbol', 'dt', 'weight', 'price', 'ref', 'update_time']"""
+        cols = ['symbol', 'dt', 'weight', 'price', 'ref', 'update_time']
+        rows = [r for r in self._hgetall_many(keys) if r]
+        if not rows:
+            return pd.DataFrame(columns=cols)
+
+        df = pd.DataFrame(rows)
+        for col in cols:
+            if col not in df.columns:
+                df[col] = None
+        df = df[cols].copy()
+        df['dt'] = pd.to_datetime(df['dt'])
+        df['weight'] = df['weight'].astype(float)
+        df['price'] = pd.to_numeric(df['price'], errors='coerce')
+        return df
+
+    def sync_weights(self, cache_path=None, refresh=False) -> pd.DataFrame:
+        """增量同步策略的全部权重记录到本地缓存
+
+        1. 当前对象记录了每个品种已同步的最大 dt，只通过 zset 索引读取此后新增的权重记录，并按位置插入已排序的缓存；
+        2. cache_path 为本地缓存目录，每次同步把新增记录写入一个新的 parquet 分片，不重写已有的分片；
+           不指定时只缓存在当前对象的内存中；
+        3. 使用 overwrite=True 修改历史记录或者删除记录之后，需要设置 refresh=True 全量同步，此时会清空缓存目录。
+
+        :param cache_path: str, 本地缓存目录，默认为None
+        :param refresh: boolean, 是否忽略本地缓存，全量同步
+        :return: pd.DataFrame, 按 symbol, dt 排序的权重记录，列：['symbol', 'dt', 'weight', 'price', 'ref', 'update_time']
+        """
+        if refresh:
+            self._weights_cache, self._last_dts = None, {}
+            for file in self.__cache_files(cache_path):
+                os.remove(file)
+
+        cache = self._weights_cache
+        if cache is None and self.__cache_files(cache_path):
+            cache = self.__read_cache(cache_path)
+            self._last_dts = cache.groupby('symbol')['dt'].max().to_dict()
+
+        with self.r.pipeline() as pipe:
+            for symbol in self.get_symbols():
+                last_dt = self._last_dts.get(symbol)
+                pipe.zrangebyscore(f'{self.key_prefix}:{self.strategy_name}:{symbol}',
+                                   f'({last_dt:%Y%m%d%H%M%S}' if last_dt is not None else '-inf', '+inf')
+            keys = [key for rows in pipe.execute() for key in rows]
+
+        new = self._fetch_weights(keys)
+        if not new.empty:
+            new = new.sort_values(['symbol', 'dt'], kind='mergesort', ignore_index=True)
+            cache = self.__insert_weights(cache, new)
+            self._last_dts.update(new.groupby('symbol')['dt'].max().to_dict())
+            if cache_path:
+                os.makedirs(cache_path, exist_ok=True)
+                new.to_parquet(os.path.join(cache_path, f"{datetime.now():%Y%m%d%H%M%S%f}.parquet"), index=False)
+        elif cache is None:
+            cache = new
+
+        self._weights_cache = cache
+        logger.info(f"{self.strategy_name} 同步了 {len(keys)} 条新的权重记录，本地共 {len(cache)} 条")
+        return cache
+
+    @staticmethod
+    def __cache_files(cache_path):
+        """缓存目录中的 parquet 分片，按写入顺序排列"""
+        if not cache_path or not os.path.isdir(cache_path):
+            return []
+        return [os.path.join(cache_path, x) for x in sorted(os.listdir(cache_path)) if x.endswith('.parquet')]
+
+    def __read_cache(self, cache_path) -> pd.DataFrame:
+        """读取缓存目录中的全部分片；多个对象同步到同一目录时可能有重复记录，保留最后写入的一条"""
+        df = pd.concat([pd.read_parquet(file) for file in self.__cache_files(cache_path)], ignore_index=True)
+        df = df.drop_duplicates(['symbol', 'dt'], keep='last')
+        return df.sort_values(['symbol', 'dt'], kind='mergesort', ignore_index=True)
+
+    @staticmethod
+    def __insert_weights(cache, new) -> pd.DataFrame:
+        """把新增记录插入到按 symbol, dt 排序的缓存中
+
+        新增记录的 dt 都大于缓存中同一品种的最大 dt，插入位置就是缓存中同一品种最后一条记录之后。
+        """
+        if cache is None or cache.empty:
+            return new
+        pos = np.searchsorted(cache['symbol'].values, new['symbol'].values, side='right')
+        order = np.insert(np.arange(len(cache)), pos, np.arange(len(cache), len(cache) + len(new)))
+        return pd.concat([cache, new], ignore_index=True).take(order).reset_index(drop=True)
+
+    @staticmethod
+    def expand_weights(df: pd.DataFrame) -> pd.DataFrame:
+        """将权重记录展开为所有时间点上所有品种的持仓权重
+
+        每个品种的权重向前填充，第一条记录之前的权重为0；update_time 向前填充，第一条记录之前使用第一条记录的值。
+
+        :param df: pd.DataFrame, 权重记录，必需包含 ['symbol', 'dt', 'weight', 'update_time'] 列，(symbol, dt) 唯一
+        :return: pd.DataFrame, 按 dt, symbol 排序，列：['dt', 'symbol', 'weight', 'update_time']
+        """
+        if df.empty:
+            return pd.DataFrame(columns=['dt', 'symbol', 'weight', 'update_time'])
+
+        df = df.sort_values(['symbol', 'dt'], kind='mergesort', ignore_index=True)
+        dts, dt_idx = np.unique(df['dt'].values, return_inverse=True)
+        symbols, first, sym_idx = np.unique(df['symbol'].values.astype(str), return_index=True, return_inverse=True)
+
+        # 每个位置上最近一条记录的序号；记录按 symbol, dt 排序，累计最大值即为向前填充
+        pos = np.full((len(dts), len(symbols)), -1, dtype=np.int64)
+        pos[dt_idx, sym_idx] = np.arange(len(df))
+        pos = np.maximum.accumulate(pos, axis=0)
+
+        missing = pos < 0
+        weight = np.where(missing, 0.0, df['weight'].values.astype(float)[pos])
+        update_time = df['update_time'].values[np.where(missing, first[None, :], pos)]
+
+        return pd.DataFrame({
+            'dt': np.repeat(dts, len(symbols)),
+            'symbol': np.tile(symbols.astype(object), len(dts)),
+            'weight': weight.ravel(),
+            'update_time': update_time.ravel(),
+        })
+
     def get_all_weights(self, sdt=None, edt=None, **kwargs) -> pd.DataFrame:
         """获取所有权重数据
 
         :param sdt: str, 开始时间, eg: 20210924 10:19:00
         :param edt: str, 结束时间, eg: 20220924 10:19:00
-        :return: pd.DataFrame
-        """
-        lua_script = """
-        local keys = redis.call('KEYS', ARGV[1])
-        local results = {}
-        for i=1, #keys do
-            local last_part = keys[i]:match('([^:]+)$')
-            if #last_part == 14 and tonumber(last_part) ~= nil then
-                results[#results + 1] = redis.call('HGETALL', keys[i])
-            end
-        end
-        return results
-        """
-        key_pattern = self.key_prefix + ':' + self.strategy_name + ':*:*'
-        results = self.r.eval(lua_script, 0, key_pattern)
-        results = [dict(zip(r[::2], r[1::2])) for r in results]     # type: ignore
-
-        df = pd.DataFrame(results)
-        df['dt'] = pd.to_datetime(df['dt'])
-        df['weight'] = df['weight'].astype(float)
-        df = df.sort_values(['dt', 'symbol']).reset_index(drop=True)
-        # df 中的columns：['symbol', 'weight', 'dt', 'update_time', 'price', 'ref']
+        :param kwargs: dict, 其他参数
 
-        df1 = pd.pivot_table(df, index='dt', columns='symbol', values='weight').sort_index().ffill().fillna(0)
-        df1 = pd.melt(df1.reset_index(), id_vars='dt', value_vars=df1.columns, value_name='weight')     # type: ignore
+            - incremental: boolean, 是否使用本地缓存增量同步，默认为False；设置了 cache_path 时默认为 True
+            - cache_path: str, 本地缓存目录（parquet 分片），参见 sync_weights
+            - refresh: boolean, 是否忽略本地缓存，全量同步
 
-        # 加上 df 中的 update_time 信息
-        df1 = df1.merge(df[['dt', 'symbol', 'update_time']], on=['dt', 'symbol'], how='left')
-        df1 = df1.sort_values(['symbol', 'dt']).reset_index(drop=True)
-        for _, dfg in df1.groupby('symbol'):
-            df1.loc[dfg.index, 'update_time'] = dfg['update_time'].ffill().bfill()
+        :return: pd.DataFrame，列：['dt', 'symbol', 'weight', 'update_time']
+        """
+        cache_path = kwargs.get('cache_path')
+        if kwargs.get('incremental', bool(cache_path)):
+            df = self.sync_weights(cache_path=cache_path, refresh=kwargs.get('refresh', False))
+        else:
+            keys = [key for weight_keys in self.get_weight_keys().values() for key in weight_keys]
+            df = self._fetch_weights(keys)
 
+        df1 = self.expand_weights(df)
         if sdt:
             df1 = df1[df1['dt'] >= pd.to_datetime(sdt)].reset_index(drop=True)
         if edt:
             df1 = df1[df1['dt'] <= pd.to_datetime(edt)].reset_index(drop=True)
-        df1 = df1.sort_values(['dt', 'symbol']).reset_index(drop=True)
         return df1
 
 
+class RedisWeightsPublisher:
+    """策略持仓权重的后台批量发布器
+
+    实盘中每根K线更新后调用 put 放入权重，后台线程按 flush_interval 合并发布：
+
+    1. 同一品种、同一时间的多次更新只保留最后一次；
+    2. 每次发布只执行一次 lua 调用（RedisWeightsClient.publish_many），由 redis 端检查最近一次发布时间；
+       发布失败的权重放回缓冲区，下次发布时重试；close 时最多重试 close_retries 次，仍然失败则抛出异常；
+    3. metrics 中记录发布次数、条数、每次发布的耗时和权重在队列中的等待时间（毫秒）。
+    """
+
+    def __init__(self, rwc: RedisWeightsClient, flush_interval=0.2, max_batch=5000, overwrite=False,
+                 close_retries=3, retry_interval=0.5):
+        """
+
+        :param rwc: RedisWeightsClient, 权重收发客户端
+        :param flush_interval: float, 后台发布的时间间隔，单位：秒
+        :param max_batch: int, 缓冲区中的权重数量达到 max_batch 时立即发布
+        :param overwrite: boolean, 是否覆盖已有记录
+        :param close_retries: int, close 时发布剩余权重的最大尝试次数
+        :param retry_interval: float, close 时两次尝试之间的等待时间，单位：秒
+        """
+        self.rwc = rwc
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.overwrite = overwrite
+        self.close_retries = max(int(close_retries), 1)
+        self.retry_interval = retry_interval
+        self.metrics = {"batches": 0, "received": 0, "published": 0, "errors": 0,
+                        "last_latency_ms": 0.0, "max_latency_ms": 0.0, "total_latency_ms": 0.0,
+                        "max_wait_ms": 0.0}
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+    def put(self, symbol, dt, weight, price=0, ref=None):
+        """放入一条待发布的权重"""
+        dt = dt if isinstance(dt, datetime) else pd.to_datetime(dt)
+        with self._lock:
+            self._pending[(symbol, dt)] = (symbol, dt, weight, price, ref, time.perf_counter())
+            self.metrics["received"] += 1
+            size = len(self._pending)
+        if size >= self.max_batch:
+            self._wakeup.set()
+
+    def flush(self):
+        """立即发布缓冲区中的所有权重
+
+        :return: 成功发布信号的条数
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            rows = sorted(pending.values(), key=lambda x: x[1])
+            start = time.perf_counter()
+            try:
+                cnt = self.rwc.publish_many([x[:5] for x in rows], overwrite=self.overwrite)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.exception(f"{self.rwc.strategy_name} 批量发布 {len(rows)} 条权重失败：{e}")
+                with self._lock:
+                    # 放回缓冲区等待下次发布；发布期间同一品种、同一时间有新的权重时保留新的权重
+                    for key, row in pending.items():
+                        self._pending.setdefault(key, row)
+                return 0
+
+            end = time.perf_counter()
+            latency = (end - start) * 1000
+            m = self.metrics
+            m["batches"] += 1
+            m["published"] += cnt
+            m["last_latency_ms"] = latency
+            m["max_latency_ms"] = max(m["max_latency_ms"], latency)
+            m["total_latency_ms"] += latency
+            m["max_wait_ms"] = max(m["max_wait_ms"], (end - min(x[5] for x in rows)) * 1000)
+            return cnt
+
+    @property
+    def avg_latency_ms(self):
+        """每次发布的平均耗时，单位：毫秒"""
+        return self.metrics["total_latency_ms"] / self.metrics["batches"] if self.metrics["batches"] else 0.0
+
+    def close(self):
+        """停止后台线程，并发布缓冲区中剩余的权重
+
+        后台线程停止后不会再重试，发布失败时最多尝试 close_retries 次；仍有未发布的权重时记录日志并抛出 RuntimeError，
+        未发布的权重保留在缓冲区中。
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        for i in range(self.close_retries):
+            if i > 0:
+                time.sleep(self.retry_interval)
+            self.flush()
+            if not self._pending:
+                return
+
+        unpublished = sorted(((x[0], x[1]) for x in self._pending.values()), key=lambda x: x[1])
+        logger.error(f"{self.rwc.strategy_name} 关闭发布器时仍有 {len(unpublished)} 条权重未发布：{unpublished}")
+        raise RuntimeError(f"{self.rwc.strategy_name} 有 {len(unpublished)} 条权重未发布")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
 def clear_strategy(strategy_name, redis_url=None, connection_pool=None, key_prefix="Weights", **kwargs):
     """删除策略所有记录
 
@@ -509,7 +824,7 @@ def get_strategy_mates(redis_url=None, connection_pool=None, key_pattern="Weight
         r = redis.Redis.from_url(redis_url, decode_responses=True)
 
     rows = []
-    for key in r.keys(key_pattern):     # type: ignore
+    for key in r.scan_iter(match=key_pattern, count=10000):     # type: ignore
         meta = r.hgetall(key)
         if not meta:
             logger.warning(f"{key} 没有策略元数据")
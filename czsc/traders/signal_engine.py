@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/15 20:40
+describe: 多品种并行信号计算引擎
+"""
+import os
+import time
+import pandas as pd
+from tqdm import tqdm
+from loguru import logger
+from datetime import datetime
+from collections import OrderedDict
+from typing import Callable, List, Union, AnyStr, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from czsc.objects import RawBar
+from czsc.utils import import_by_name, compact_signals
+from czsc.traders.base import prepare_czsc_signals
+from czsc.traders.sig_parse import get_signals_freqs
+
+
+def generate_signals_frame(bars: List[RawBar], signals_config: List[dict],
+                           sdt: Union[AnyStr, datetime] = "20170101", init_n: int = 500,
+                           exclude=("cache", "freq"), **kwargs) -> pd.DataFrame:
+    """使用 CzscSignals 生成信号，直接按列收集结果
+
+    与 generate_czsc_signals(df=True) 的结果一致，区别在于：
+
+    1. 每根K线只把 cs.s 中的值追加到对应的列，不再为每根K线复制一个字典；
+    2. 默认去掉 cache 和 freq 两列，这两列无法按列存储（parquet / arrow）；
+    3. 信号列为分类编码，写入 parquet 时按字典编码存储。
+
+    :param bars: 基础周期 K 线序列
+    :param signals_config: 信号函数配置
+    :param sdt: 信号计算开始时间
+    :param init_n: 用于 BarGenerator 初始化的基础周期K线数量
+    :param exclude: 不需要输出的列
+    :return: 信号计算结果
+    """
+    cs, bars_right = prepare_czsc_signals(bars, signals_config, sdt=sdt, init_n=init_n, **kwargs)
+    if not bars_right:
+        return pd.DataFrame()
+
+    exclude = set(exclude)
+    cols = OrderedDict()
+    for i, bar in enumerate(bars_right):
+        cs.update_signals(bar)
+        for key, value in cs.s.items():
+            if key in exclude:
+                continue
+            col = cols.get(key)
+            if col is None:
+                col = cols[key] = [None] * i
+            col.append(value)
+
+        # 个别信号函数在部分K线上不返回结果时，补齐缺失值
+        n = i + 1
+        for col in cols.values():
+            if len(col) < n:
+                col.append(None)
+
+    return compact_signals(pd.DataFrame(cols), inplace=True)
+
+
+# 工作进程的全局状态，由 _init_worker 在进程启动时设置一次
+_worker_state = {}
+
+
+def _init_worker(read_bars: Callable, signals_config: List[dict], kwargs: dict):
+    """工作进程初始化：接收任务参数，并预先导入全部信号函数"""
+    for conf in signals_config:
+        import_by_name(conf["name"])
+    _worker_state.update({"read_bars": read_bars, "signals_config": signals_config, "kwargs": kwargs})
+
+
+def _run_symbol(symbol: str) -> dict:
+    """在工作进程中计算单个品种的信号"""
+    read_bars = _worker_state["read_bars"]
+    signals_config = _worker_state["signals_config"]
+    kwargs = dict(_worker_state["kwargs"])
+    results_path = kwargs.pop("results_path", None)
+    base_freq = kwargs.pop("base_freq")
+    bar_sdt = kwargs.pop("bar_sdt")
+    edt = kwargs.pop("edt")
+    fq = kwargs.pop("fq")
+    read_kwargs = kwargs.pop("read_kwargs", {})
+
+    start = time.perf_counter()
+    res = {"symbol": symbol, "bars": 0, "rows": 0, "cost": 0.0, "error": None, "data": None}
+    try:
+        bars = read_bars(symbol, freq=base_freq, sdt=bar_sdt, edt=edt, fq=fq, **read_kwargs)
+        res["bars"] = len(bars)
+        if bars:
+            dfs = generate_signals_frame(bars, signals_config, **kwargs)
+            res["rows"] = len(dfs)
+            if results_path:
+                dfs.to_parquet(os.path.join(results_path, f"{symbol}.parquet"), index=False)
+            else:
+                res["data"] = dfs
+    except Exception as e:
+        logger.exception(f"{symbol} 信号计算失败：{e}")
+        res["error"] = str(e)
+    res["cost"] = time.perf_counter() - start
+    return res
+
+
+def _run_chunk(symbols: List[str]) -> List[dict]:
+    return [_run_symbol(symbol) for symbol in symbols]
+
+
+class SignalEngine:
+    """多品种并行信号计算引擎
+
+    1. 按 chunk_size 将品种分块调度，减少进程间通信次数；
+    2. 工作进程启动时一次性接收 read_bars、signals_config，并预先导入信号函数；
+    3. 每个品种的信号直接按列生成，指定 results_path 时写入 {symbol}.parquet，否则保存在 results 中；
+    4. 每个品种记录K线数量、信号行数、耗时，汇总到 metrics 中。
+    """
+
+    def __init__(self, n_jobs: int = 1, chunk_size: int = 4, results_path: Optional[str] = None, **kwargs):
+        """
+
+        :param n_jobs: 进程数量，1 表示在当前进程中顺序执行
+        :param chunk_size: 每个任务包含的品种数量
+        :param results_path: 信号结果保存路径，每个品种保存为一个 parquet 文件；为 None 时保存在 self.results 中
+        :param kwargs:
+
+            - show_progress: 是否显示进度条，默认 True
+        """
+        self.n_jobs = max(1, int(n_jobs))
+        self.chunk_size = max(1, int(chunk_size))
+        self.results_path = results_path
+        self.kwargs = kwargs
+        self.results = {}
+        self.stats = pd.DataFrame()
+        self.metrics = {}
+        self._bars_done = 0
+        if results_path:
+            os.makedirs(results_path, exist_ok=True)
+
+    def run(self, symbols: List[str], read_bars: Callable, signals_config: List[dict],
+            sdt="20170101", edt="20220101", bar_sdt=None, fq="前复权", **kwargs) -> pd.DataFrame:
+        """计算多个品种的信号
+
+        :param symbols: 品种列表
+        :param read_bars: 读取K线数据的函数，n_jobs > 1 时必须可以被 pickle，函数签名如下：
+            read_bars(symbol, freq, sdt, edt, fq='前复权', **kwargs) -> List[RawBar]
+        :param signals_config: 信号函数配置
+        :param sdt: 信号计算开始时间
+        :param edt: 信号计算结束时间
+        :param bar_sdt: K线读取开始时间，默认为 sdt 前 365 天
+        :param fq: 复权方式
+        :param kwargs:
+
+            - base_freq: 基础周期，默认为 signals_config 中最小的周期
+            - init_n: 用于 BarGenerator 初始化的基础周期K线数量
+            - read_kwargs: 传给 read_bars 的其他参数
+            - 其他参数透传给 CzscSignals
+        :return: 每个品种的计算统计，列：symbol, bars, rows, cost, error
+        """
+        base_freq = kwargs.pop("base_freq", None) or get_signals_freqs(signals_config)[0]
+        bar_sdt = bar_sdt or (pd.to_datetime(sdt) - pd.Timedelta(days=365)).strftime("%Y%m%d")
+        task_kwargs = dict(kwargs, sdt=sdt, edt=edt, bar_sdt=bar_sdt, fq=fq,
+                           base_freq=base_freq, results_path=self.results_path)
+
+        symbols = list(dict.fromkeys(symbols))
+        chunks = [symbols[i: i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+        progress = tqdm(total=len(symbols), desc="SignalEngine", disable=not self.kwargs.get("show_progress", True))
+
+        rows = []
+        self._bars_done = 0
+        start = time.perf_counter()
+        if self.n_jobs == 1:
+            _init_worker(read_bars, signals_config, task_kwargs)
+            for chunk in chunks:
+                rows.extend(self.__collect(_run_chunk(chunk), progress, start))
+        else:
+            with ProcessPoolExecutor(self.n_jobs, initializer=_init_worker,
+                                     initargs=(read_bars, signals_config, task_kwargs)) as pool:
+                futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    rows.extend(self.__collect(future.result(), progress, start))
+        progress.close()
+        total_cost = time.perf_counter() - start
+
+        stats = pd.DataFrame(rows, columns=["symbol", "bars", "rows", "cost", "error"])
+        self.stats = stats.set_index("symbol").reindex(symbols).reset_index()
+        n_bars = int(stats["bars"].sum())
+        self.metrics = {
+            "symbols": len(symbols),
+            "failed": int(stats["error"].notna().sum()),
+            "bars": n_bars,
+            "rows": int(stats["rows"].sum()),
+            "cost": round(total_cost, 4),
+            "bars_per_second": round(n_bars / total_cost, 2) if total_cost > 0 else 0,
+            "symbols_per_second": round(len(symbols) / total_cost, 4) if total_cost > 0 else 0,
+        }
+        logger.info(f"SignalEngine 计算完成：{self.metrics}")
+        return self.stats
+
+    def __collect(self, results: List[dict], progress, start):
+        """汇总一个任务块的结果，更新进度条和吞吐量"""
+        for res in results:
+            data = res.pop("data")
+            if data is not None:
+                self.results[res["symbol"]] = data
+        self._bars_done += sum(r["bars"] for r in results)
+        cost = time.perf_counter() - start
+        progress.update(len(results))
+        progress.set_postfix(bars_per_second=int(self._bars_done / cost) if cost > 0 else 0)
+        return results
+
+    def read(self, symbol: str) -> pd.DataFrame:
+        """读取单个品种的信号结果"""
+        if symbol in self.results:
+            return self.results[symbol]
+        if self.results_path:
+            file = os.path.join(self.results_path, f"{symbol}.parquet")
+            if os.path.exists(file):
+                return pd.read_parquet(file)
+        return pd.DataFrame()
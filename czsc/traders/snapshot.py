@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/13 21:40
+describe: CzscTrader 快照的保存与恢复
+
+快照文件格式（版本 1）：
+
+    MAGIC(8字节) | 版本号(uint32) | header 长度(uint64) | header(JSON) | 数据区
+
+1. header 中保存交易对象的元数据（标的、周期、最新时间、各仓位的持仓等），以及数据区中每个数组、对象块的位置；
+2. 原始K线、无包含K线、分型、笔按周期以列的形式保存为 NumPy 数组，对象之间的引用保存为整数下标；
+3. 信号、持仓状态、指标缓存等其他状态使用 dill 序列化为对象块；
+4. 读取时使用 mmap 映射文件，只解析 header 即可获得元数据，调用 to_trader 时才创建K线、笔等对象。
+"""
+import gc
+import json
+import mmap
+import dill
+import importlib
+from copy import copy
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections import OrderedDict
+from typing import Union
+from czsc.objects import RawBar, NewBar, FX, BI, Mark, Direction
+from czsc.analyze import CZSC, UbiTracker
+from czsc.utils.sig import ZsTracker
+from czsc.utils.bar_store import BarView, BarRange
+from czsc.utils.bar_generator import BarGenerator
+from czsc.utils.io import dill_load
+
+
+SNAPSHOT_MAGIC = b"CZSCSNAP"
+SNAPSHOT_VERSION = 1
+
+_MARKS = [Mark.D, Mark.G]
+_DIRECTIONS = [Direction.Up, Direction.Down]
+_ALIGN = 64
+
+
+def _encode_dts(dts):
+    """datetime 列表编码为 int64 纳秒数组，返回 (数组, 时区名称)"""
+    index = pd.DatetimeIndex(pd.to_datetime(list(dts)))
+    tz = str(index.tz) if index.tz is not None else None
+    return index.asi8.copy(), tz
+
+
+def _decode_dts(values, tz=None):
+    index = pd.DatetimeIndex(np.asarray(values, dtype="datetime64[ns]"))
+    if tz:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return index.tolist()
+
+
+def _flat(groups):
+    """二维下标列表展平为 (ptr, flat)，第 i 组为 flat[ptr[i]: ptr[i + 1]]"""
+    ptr = np.zeros(len(groups) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(x) for x in groups])
+    flat = np.fromiter((i for g in groups for i in g), dtype=np.int64, count=int(ptr[-1]))
+    return ptr, flat
+
+
+class _Index:
+    """按对象 id 去重的对象表；BarView 每次访问都是新对象，按所在数据块和位置去重"""
+
+    def __init__(self):
+        self.objs = []
+        self.ids = {}
+
+    def add(self, obj) -> int:
+        key = (id(obj._block), obj._i) if isinstance(obj, BarView) else id(obj)
+        i = self.ids.get(key)
+        if i is None:
+            i = self.ids[key] = len(self.objs)
+            self.objs.append(obj)
+        return i
+
+    def __len__(self):
+        return len(self.objs)
+
+
+class _SnapshotWriter:
+    def __init__(self):
+        self.meta = {}
+        self.arrays = OrderedDict()
+        self.blobs = OrderedDict()
+
+    def add_array(self, name, arr):
+        self.arrays[name] = np.ascontiguousarray(arr)
+
+    def add_blob(self, name, obj):
+        self.blobs[name] = dill.dumps(obj)
+
+    def write(self, file):
+        items, chunks, offset = {}, [], 0
+        for name, arr in self.arrays.items():
+            # 数组按 _ALIGN 字节对齐，方便映射为 NumPy 数组
+            items[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+            data = arr.tobytes()
+            data += b"\0" * (-len(data) % _ALIGN)
+            chunks.append(data)
+            offset += len(data)
+        for name, blob in self.blobs.items():
+            items[name] = {"offset": offset, "size": len(blob)}
+            chunks.append(blob)
+            offset += len(blob)
+
+        header = json.dumps({"meta": self.meta, "items": items}, ensure_ascii=False).encode("utf-8")
+        start = len(SNAPSHOT_MAGIC) + 12 + len(header)
+        pad = -start % _ALIGN
+        with open(file, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(np.uint32(SNAPSHOT_VERSION).tobytes())
+            f.write(np.uint64(len(header) + pad).tobytes())
+            f.write(header + b" " * pad)
+            for chunk in chunks:
+                f.write(chunk)
+
+
+def _dump_freq(w: _SnapshotWriter, p: str, c: CZSC, bg_bars):
+    """保存一个周期的 CZSC 对象和 BarGenerator 中的K线"""
+    raws, nbs, fxs, bis = _Index(), _Index(), _Index(), _Index()
+    for bi in c.bi_list:
+        bis.add(bi)
+        for fx in [bi.fx_a, bi.fx_b] + list(bi.fxs):
+            fxs.add(fx)
+        for x in bi.bars:
+            nbs.add(x)
+    for fx in fxs.objs:
+        for x in fx.elements:
+            nbs.add(x)
+    for x in c.bars_ubi:
+        nbs.add(x)
+
+    bars_raw = [] if c.columnar else [raws.add(x) for x in c.bars_raw]
+    bg_raw = [raws.add(x) for x in bg_bars] if bg_bars is not None else None
+    nb_elements = [[raws.add(e) for e in x.elements] for x in nbs.objs]
+
+    def __columns(prefix, objs):
+        w.add_array(f"{prefix}.id", np.array([x.id for x in objs], dtype=np.int64))
+        w.add_array(f"{prefix}.dt", _encode_dts([x.dt for x in objs])[0])
+        w.add_array(f"{prefix}.ohlcva", np.array([(x.open, x.close, x.high, x.low, x.vol, x.amount) for x in objs],
+                                                 dtype=np.float64).reshape(-1, 6))
+
+    __columns(f"{p}.raw", raws.objs)
+    __columns(f"{p}.nb", nbs.objs)
+    ptr, flat = _flat(nb_elements)
+    w.add_array(f"{p}.nb.elements_ptr", ptr)
+    w.add_array(f"{p}.nb.elements", flat)
+
+    w.add_array(f"{p}.fx.dt", _encode_dts([x.dt for x in fxs.objs])[0])
+    w.add_array(f"{p}.fx.mark", np.array([_MARKS.index(x.mark) for x in fxs.objs], dtype=np.int8))
+    w.add_array(f"{p}.fx.hlf", np.array([(x.high, x.low, x.fx) for x in fxs.objs], dtype=np.float64).reshape(-1, 3))
+    w.add_array(f"{p}.fx.elements", np.array([[nbs.ids[id(e)] for e in x.elements] for x in fxs.objs],
+                                             dtype=np.int64).reshape(-1, 3))
+
+    w.add_array(f"{p}.bi.fx_ab", np.array([(fxs.ids[id(x.fx_a)], fxs.ids[id(x.fx_b)]) for x in bis.objs],
+                                          dtype=np.int64).reshape(-1, 2))
+    w.add_array(f"{p}.bi.direction", np.array([_DIRECTIONS.index(x.direction) for x in bis.objs], dtype=np.int8))
+    for name, groups in [("fxs", [[fxs.ids[id(f)] for f in x.fxs] for x in bis.objs]),
+                         ("bars", [[nbs.ids[id(b)] for b in x.bars] for x in bis.objs])]:
+        ptr, flat = _flat(groups)
+        w.add_array(f"{p}.bi.{name}_ptr", ptr)
+        w.add_array(f"{p}.bi.{name}", flat)
+
+    w.add_array(f"{p}.czsc.bars_raw", np.array(bars_raw, dtype=np.int64))
+    w.add_array(f"{p}.czsc.bars_ubi", np.array([nbs.ids[id(x)] for x in c.bars_ubi], dtype=np.int64))
+    w.add_array(f"{p}.czsc.bi_list", np.array([bis.ids[id(x)] for x in c.bi_list], dtype=np.int64))
+    if bg_raw is not None:
+        w.add_array(f"{p}.bg.bars", np.array(bg_raw, dtype=np.int64))
+
+    # 对象上的 cache 只保存非空部分；BarView 的 cache 在第一次访问时才创建，这里直接读取数据块，避免创建空字典
+    caches = {k: {i: x.cache for i, x in enumerate(t.objs) if x.cache}
+              for k, t in [("nb", nbs), ("fx", fxs), ("bi", bis)]}
+    raw_caches = [x._block.caches[x._i] if isinstance(x, BarView) else x.cache for x in raws.objs]
+    caches["raw"] = {i: x for i, x in enumerate(raw_caches) if x}
+    w.add_blob(f"{p}.caches", caches)
+
+    exclude = {"bars_ubi", "bi_list", "_ubi_tracker", "_ubi_ref", "_ubi_seen", "_zs_tracker"}
+    exclude |= set() if c.columnar else {"bars_raw"}
+    w.add_blob(f"{p}.czsc", {k: v for k, v in c.__dict__.items() if k not in exclude})
+
+    symbols = {x.symbol for x in raws.objs} | {c.symbol}
+    assert len(symbols) == 1, f"{c} 中存在多个标的代码：{symbols}"
+    return {"freq": c.freq.value, "symbol": c.symbol, "tz": _encode_dts([x.dt for x in raws.objs[:1]])[1]}
+
+
+def dump_snapshot(trader, file: Union[str, Path]):
+    """保存 CzscTrader（或 CzscSignals）的快照
+
+    :param trader: CzscTrader 或 CzscSignals 对象
+    :param file: 快照文件路径
+    """
+    w = _SnapshotWriter()
+    positions = getattr(trader, "positions", None) or []
+    w.meta = {
+        "version": SNAPSHOT_VERSION,
+        "class": f"{type(trader).__module__}:{type(trader).__qualname__}",
+        "name": trader.name,
+        "symbol": trader.symbol,
+        "base_freq": trader.base_freq,
+        "freqs": list(trader.kas.keys()) if trader.kas else [],
+        "has_kas": trader.kas is not None,
+        "end_dt": str(trader.end_dt) if trader.end_dt is not None else None,
+        "bid": int(trader.bid) if trader.bid is not None else None,
+        "latest_price": float(trader.latest_price) if trader.latest_price is not None else None,
+        "positions": [{"name": x.name, "pos": x.pos, "end_dt": str(x.end_dt) if x.end_dt else None} for x in positions],
+        "freq_meta": [],
+    }
+
+    bg = trader.bg
+    for i, freq in enumerate(w.meta["freqs"]):
+        bg_bars = bg.bars.get(freq) if bg is not None else None
+        w.meta["freq_meta"].append(_dump_freq(w, f"f{i}", trader.kas[freq], bg_bars))
+
+    if bg is not None:
+        w.meta["bg_freqs"] = list(bg.bars.keys())
+        assert set(w.meta["bg_freqs"]) == set(w.meta["freqs"]), "BarGenerator 与 kas 中的周期不一致"
+        w.add_blob("bg", {k: v for k, v in bg.__dict__.items() if k != "bars"})
+
+    # 持仓状态列表 holds 按列保存，对象块中只保留仓位的其他状态
+    state = {k: v for k, v in trader.__dict__.items() if k not in {"bg", "kas", "_signals_plan", "_signals_plan_key"}}
+    if positions:
+        state["positions"] = [copy(x) for x in positions]
+        holds_dts = {}
+        w.meta["holds"] = {}
+        for i, pos in enumerate(state["positions"]):
+            if all(h.keys() == {"dt", "pos", "price"} for h in pos.holds):
+                dts, tz = _encode_dts([h["dt"] for h in pos.holds])
+                # 同一个交易对象中各仓位的持仓时间序列通常相同，只保存一份
+                key = (dts.tobytes(), tz)
+                j = holds_dts.setdefault(key, i)
+                if j == i:
+                    w.add_array(f"p{i}.holds.dt", dts)
+                w.add_array(f"p{i}.holds.pos", np.array([h["pos"] for h in pos.holds], dtype=np.int8))
+                w.add_array(f"p{i}.holds.price", np.array([h["price"] for h in pos.holds], dtype=np.float64))
+                w.meta["holds"][str(i)] = {"dt": j, "tz": tz}
+                pos.holds = []
+    w.add_blob("trader", state)
+    w.write(file)
+
+
+def is_snapshot(file: Union[str, Path]) -> bool:
+    """判断文件是否为快照文件"""
+    with open(file, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+class TraderSnapshot:
+    """快照文件的只读视图
+
+    1. 创建时只读取 header，meta 属性中包含标的、周期、最新时间、各仓位的持仓等元数据；
+    2. 数组通过 mmap 直接映射到文件，只有调用 to_trader 时才创建K线、笔等对象。
+    """
+
+    def __init__(self, file: Union[str, Path], use_mmap: bool = True):
+        self.file = str(file)
+        with open(self.file, "rb") as f:
+            if use_mmap:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buffer = f.read()
+
+        buf = memoryview(self._buffer)
+        n = len(SNAPSHOT_MAGIC)
+        if bytes(buf[:n]) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.file} 不是 CzscTrader 快照文件")
+        version = int(np.frombuffer(buf[n: n + 4], dtype=np.uint32)[0])
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"不支持的快照版本：{version}，当前支持的版本为 {SNAPSHOT_VERSION}")
+        header_len = int(np.frombuffer(buf[n + 4: n + 12], dtype=np.uint64)[0])
+        header = json.loads(bytes(buf[n + 12: n + 12 + header_len]).decode("utf-8"))
+        self._start = n + 12 + header_len
+        self.meta = header["meta"]
+        self.items = header["items"]
+        self._trader = None
+
+    def __repr__(self):
+        return f"<TraderSnapshot {self.meta['symbol']} @ {self.meta['end_dt']}>"
+
+    @property
+    def symbol(self):
+        return self.meta["symbol"]
+
+    @property
+    def end_dt(self):
+        return pd.to_datetime(self.meta["end_dt"]) if self.meta["end_dt"] else None
+
+    @property
+    def positions(self):
+        """各仓位的持仓元数据，不需要恢复交易对象"""
+        return self.meta["positions"]
+
+    def array(self, name) -> np.ndarray:
+        """读取数组，结果为映射到文件的只读数组"""
+        item = self.items[name]
+        dtype = np.dtype(item["dtype"])
+        count = int(np.prod(item["shape"]))
+        arr = np.frombuffer(self._buffer, dtype=dtype, count=count, offset=self._start + item["offset"])
+        return arr.reshape(item["shape"])
+
+    def blob(self, name):
+        item = self.items[name]
+        start = self._start + item["offset"]
+        return dill.loads(self._buffer[start: start + item["size"]])
+
+    @staticmethod
+    def __store_views(store, raw_dts, raws):
+        """columnar 模式下把原始K线替换为 BarStore 中的视图，与 bars_raw 共享数据和 cache
+
+        已经从 BarStore 中删除的K线没有对应的视图，仍然使用恢复的 RawBar。
+        """
+        views = {dt: view for dt, view in zip(store.dt.view(np.int64).tolist(), store)}
+        return [views.get(dt, raw) for dt, raw in zip(raw_dts.tolist(), raws)]
+
+    def __load_freq(self, p: str, fm: dict, has_bg: bool):
+        symbol, tz = fm["symbol"], fm["tz"]
+        c = CZSC.__new__(CZSC)
+        c.__dict__.update(self.blob(f"{p}.czsc"))
+        freq = c.freq
+        caches = self.blob(f"{p}.caches")
+
+        def __bars(prefix, cls, cache):
+            ids = self.array(f"{prefix}.id").tolist()
+            dts = _decode_dts(self.array(f"{prefix}.dt"), tz)
+            values = self.array(f"{prefix}.ohlcva").tolist()
+            return [cls(symbol=symbol, id=ids[i], dt=dts[i], freq=freq, open=v[0], close=v[1], high=v[2], low=v[3],
+                        vol=v[4], amount=v[5], cache=cache.get(i, {})) for i, v in enumerate(values)]
+
+        raws = __bars(f"{p}.raw", RawBar, caches["raw"])
+        nbs = __bars(f"{p}.nb", NewBar, caches["nb"])
+        ptr = self.array(f"{p}.nb.elements_ptr").tolist()
+        flat = self.array(f"{p}.nb.elements").tolist()
+        elements = self.__store_views(c.bars_raw, self.array(f"{p}.raw.dt"), raws) if c.columnar else raws
+        for i, x in enumerate(nbs):
+            x.elements = [elements[j] for j in flat[ptr[i]: ptr[i + 1]]]
+            if c.columnar:
+                x.elements = BarRange.from_views(x.elements)
+
+        fx_dts = _decode_dts(self.array(f"{p}.fx.dt"), tz)
+        marks = self.array(f"{p}.fx.mark").tolist()
+        hlf = self.array(f"{p}.fx.hlf").tolist()
+        elements = self.array(f"{p}.fx.elements").tolist()
+        fxs = [FX(symbol=symbol, dt=fx_dts[i], mark=_MARKS[marks[i]], high=hlf[i][0], low=hlf[i][1], fx=hlf[i][2],
+                  elements=[nbs[j] for j in elements[i]], cache=caches["fx"].get(i, {})) for i in range(len(marks))]
+
+        fx_ab = self.array(f"{p}.bi.fx_ab").tolist()
+        directions = self.array(f"{p}.bi.direction").tolist()
+        fxs_ptr, fxs_flat = self.array(f"{p}.bi.fxs_ptr").tolist(), self.array(f"{p}.bi.fxs").tolist()
+        bars_ptr, bars_flat = self.array(f"{p}.bi.bars_ptr").tolist(), self.array(f"{p}.bi.bars").tolist()
+        bis = [BI(symbol=symbol, fx_a=fxs[a], fx_b=fxs[b], fxs=[fxs[j] for j in fxs_flat[fxs_ptr[i]: fxs_ptr[i + 1]]],
+                  direction=_DIRECTIONS[directions[i]], bars=[nbs[j] for j in bars_flat[bars_ptr[i]: bars_ptr[i + 1]]],
+                  cache=caches["bi"].get(i, {})) for i, (a, b) in enumerate(fx_ab)]
+
+        if not c.columnar:
+            c.bars_raw = [raws[i] for i in self.array(f"{p}.czsc.bars_raw").tolist()]
+        c.bars_ubi = [nbs[i] for i in self.array(f"{p}.czsc.bars_ubi").tolist()]
+        c.bi_list = [bis[i] for i in self.array(f"{p}.czsc.bi_list").tolist()]
+        c._ubi_tracker = UbiTracker()
+        c._ubi_ref = None
+        c._ubi_seen = []
+        c._zs_tracker = ZsTracker()
+
+        bg_bars = [raws[i] for i in self.array(f"{p}.bg.bars").tolist()] if has_bg else None
+        return c, bg_bars
+
+    def to_trader(self):
+        """恢复交易对象，多次调用返回同一个对象"""
+        if self._trader is not None:
+            return self._trader
+
+        # 一次性创建大量对象时暂停垃圾回收，避免反复触发全量扫描
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._trader = self.__create_trader()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return self._trader
+
+    def __create_trader(self):
+        module, qualname = self.meta["class"].split(":")
+        cls = importlib.import_module(module)
+        for name in qualname.split("."):
+            cls = getattr(cls, name)
+
+        trader = cls.__new__(cls)
+        trader.__dict__.update(self.blob("trader"))
+        trader._signals_plan = None
+        trader._signals_plan_key = None
+        holds_dts = {}
+        for i, pos in enumerate(getattr(trader, "positions", None) or []):
+            hm = self.meta.get("holds", {}).get(str(i))
+            if hm:
+                j = hm["dt"]
+                if j not in holds_dts:
+                    holds_dts[j] = _decode_dts(self.array(f"p{j}.holds.dt"), hm["tz"])
+                values = zip(holds_dts[j], self.array(f"p{i}.holds.pos").tolist(), self.array(f"p{i}.holds.price").tolist())
+                pos.holds = [{"dt": dt, "pos": v, "price": price} for dt, v, price in values]
+
+        has_bg = "bg" in self.items
+        kas, bg_bars = {}, {}
+        for i, (freq, fm) in enumerate(zip(self.meta["freqs"], self.meta["freq_meta"])):
+            kas[freq], bg_bars[freq] = self.__load_freq(f"f{i}", fm, has_bg)
+        trader.kas = kas if self.meta["has_kas"] else None
+
+        if has_bg:
+            bg = BarGenerator.__new__(BarGenerator)
+            bg.__dict__.update(self.blob("bg"))
+            bg.bars = {freq: bg_bars[freq] for freq in self.meta["bg_freqs"]}
+            trader.bg = bg
+        else:
+            trader.bg = None
+        return trader
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+def load_snapshot(file: Union[str, Path]):
+    """从快照文件恢复 CzscTrader（或 CzscSignals）对象
+
+    :param file: 快照文件路径
+    :return: 交易对象
+    """
+    snapshot = TraderSnapshot(file)
+    try:
+        return snapshot.to_trader()
+    finally:
+        snapshot.close()
+
+
+def load_trader(file: Union[str, Path]):
+    """读取交易对象文件，兼容快照文件和 dill 序列化文件"""
+    return load_snapshot(file) if is_snapshot(file) else dill_load(file)
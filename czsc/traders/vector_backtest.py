@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/8 16:20
+describe: 基于信号矩阵的 Position 向量化回测
+
+将 Signal/Factor/Event 编译为信号列上的布尔掩码，再逐个 Position 执行一遍状态机，
+得到与 CzscTrader.on_sig 逐行回测完全一致的 operates/holds/pairs。
+"""
+import numpy as np
+import pandas as pd
+from copy import deepcopy
+from typing import List, Union, Dict, Tuple
+from czsc.objects import Signal, Factor, Event, Position, Operate
+
+
+_OP_CODES = {Operate.HO: 0, Operate.LO: 1, Operate.LE: 2, Operate.SO: 3, Operate.SE: 4}
+HO, LO, LE, SO, SE = 0, 1, 2, 3, 4
+
+
+class SignalsMatrix:
+    """信号矩阵：对信号 DataFrame 的每个信号列做分类编码，缓存 Signal/Factor/Event 的匹配结果
+
+    1. 信号列只在第一次使用时编码，信号值字符串只解析一次；
+    2. 同一个信号、因子、事件只计算一次掩码，多个 Position 之间共享，适合大量仓位变体的批量回测；
+    3. 信号值缺失的行视为不匹配（逐行回测时会抛出异常）。
+    """
+
+    def __init__(self, sigs: pd.DataFrame):
+        """
+
+        :param sigs: 信号 DataFrame，一般是 generate_czsc_signals(..., df=True) 的结果，
+            必须包含 symbol, dt, id, close 列，按 dt 升序排列
+        """
+        self.sigs = sigs.reset_index(drop=True)
+        self.n = len(self.sigs)
+        self._codes: Dict[str, Tuple[np.ndarray, list]] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        self._factors: Dict[tuple, np.ndarray] = {}
+        self._events: Dict[tuple, Tuple[np.ndarray, np.ndarray]] = {}
+
+        dt = pd.to_datetime(self.sigs["dt"])
+        self.dts = self.sigs["dt"].tolist()
+        self.ns = dt.values.view("i8")
+        self.days = dt.dt.normalize().values.view("i8")
+        self.symbols = self.sigs["symbol"].tolist()
+        self.bids = self.sigs["id"].tolist()
+        self.prices = self.sigs["close"].tolist()
+        self._bids = np.array(self.bids, dtype=np.int64)
+        self._prices = np.array(self.prices, dtype=np.float64)
+
+    def _column(self, key: str) -> Tuple[np.ndarray, list]:
+        """信号列的分类编码：(codes, 解析后的信号值列表)，缺失值的 code 为 -1"""
+        if key not in self._codes:
+            if key not in self.sigs.columns:
+                raise ValueError(f"{key} 不在信号列表中")
+            ser = self.sigs[key]
+            if isinstance(ser.dtype, pd.CategoricalDtype):
+                # 分类编码的信号列直接使用 codes，不需要重新编码
+                codes, uniques = ser.cat.codes.values, ser.cat.categories
+            else:
+                codes, uniques = pd.factorize(ser)
+            values = [tuple(str(x).split("_")) for x in uniques]
+            self._codes[key] = (codes, [(v1, v2, v3, int(score)) for v1, v2, v3, score in values])
+        return self._codes[key]
+
+    def signal_mask(self, signal: Union[Signal, str]) -> np.ndarray:
+        """信号匹配结果，与 Signal.is_match 逐行计算的结果一致"""
+        signal = Signal(signal) if isinstance(signal, str) else signal
+        if signal.signal not in self._masks:
+            codes, values = self._column(signal.key)
+            lut = np.array(
+                [
+                    score >= signal.score
+                    and (v1 == signal.v1 or signal.v1 == "任意")
+                    and (v2 == signal.v2 or signal.v2 == "任意")
+                    and (v3 == signal.v3 or signal.v3 == "任意")
+                    for v1, v2, v3, score in values
+                ]
+                + [False],
+                dtype=bool,
+            )
+            self._masks[signal.signal] = lut[codes]
+        return self._masks[signal.signal]
+
+    def _any(self, signals: List[Signal]) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        for signal in signals:
+            mask |= self.signal_mask(signal)
+        return mask
+
+    def _all(self, signals: List[Signal]) -> np.ndarray:
+        mask = np.ones(self.n, dtype=bool)
+        for signal in signals:
+            mask &= self.signal_mask(signal)
+        return mask
+
+    def _filter(self, obj: Union[Factor, Event]) -> np.ndarray:
+        """signals_all, signals_any, signals_not 三个条件的匹配结果"""
+        mask = self._all(obj.signals_all) if obj.signals_all else np.ones(self.n, dtype=bool)
+        if obj.signals_not:
+            mask &= ~self._any(obj.signals_not)
+        if obj.signals_any:
+            mask &= self._any(obj.signals_any)
+        return mask
+
+    @staticmethod
+    def _signals_key(obj: Union[Factor, Event]) -> tuple:
+        return tuple(tuple(x.signal for x in (s or [])) for s in [obj.signals_all, obj.signals_any, obj.signals_not])
+
+    def factor_mask(self, factor: Factor) -> np.ndarray:
+        """因子匹配结果，与 Factor.is_match 逐行计算的结果一致"""
+        key = self._signals_key(factor)
+        if key not in self._factors:
+            self._factors[key] = self._filter(factor)
+        return self._factors[key]
+
+    def event_match(self, event: Event) -> Tuple[np.ndarray, np.ndarray]:
+        """事件匹配结果，与 Event.is_match 逐行计算的结果一致
+
+        :return: (是否匹配, 第一个满足的因子在 event.factors 中的序号，不匹配时为 -1)
+        """
+        key = (self._signals_key(event), tuple(self._signals_key(f) for f in event.factors))
+        if key not in self._events:
+            factor_idx = np.full(self.n, -1, dtype=np.int32)
+            for i in range(len(event.factors) - 1, -1, -1):
+                factor_idx[self.factor_mask(event.factors[i])] = i
+            factor_idx[~self._filter(event)] = -1
+            self._events[key] = (factor_idx >= 0, factor_idx)
+        return self._events[key]
+
+    def position_ops(self, position: Position) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Position 每一行触发的操作，与 Position.update 中遍历 events 的结果一致
+
+        :return: (操作编码, 触发的事件序号, 触发的因子序号)
+        """
+        ops = np.zeros(self.n, dtype=np.int8)
+        event_idx = np.full(self.n, -1, dtype=np.int32)
+        factor_idx = np.full(self.n, -1, dtype=np.int32)
+        for i in range(len(position.events) - 1, -1, -1):
+            event = position.events[i]
+            mask, fi = self.event_match(event)
+            ops[mask] = _OP_CODES[event.operate]
+            event_idx[mask] = i
+            factor_idx[mask] = fi[mask]
+        return ops, event_idx, factor_idx
+
+    def backtest(self, position: Position) -> Position:
+        """执行单个 Position 的回测，返回完成回测的 Position 副本"""
+        pos = deepcopy(position)
+        ops, event_idx, factor_idx = self.position_ops(pos)
+
+        # 与 Position.update 一致：跳过时间不晚于上一次信号的行
+        prev_max = np.maximum.accumulate(np.concatenate([[np.iinfo(np.int64).min], self.ns[:-1]]))
+        if pos.end_dt is not None:
+            prev_max = np.maximum(prev_max, pd.Timestamp(pos.end_dt).value)
+        rows = np.flatnonzero(self.ns > prev_max)
+        if len(rows) == 0:
+            return pos
+
+        _PositionRunner(self, pos, rows, ops, event_idx, factor_idx).run()
+        return pos
+
+
+_OPERATES = [Operate.HO, Operate.LO, Operate.LE, Operate.SO, Operate.SE]
+
+
+def _last_open(dt):
+    """最近一次开仓时间：(时间, 纳秒时间戳, 当天零点的纳秒时间戳)"""
+    if dt is None:
+        return None, None, None
+    dt = pd.Timestamp(dt)
+    return dt, dt.value, dt.normalize().value
+
+
+class _PositionRunner:
+    """单个 Position 在信号矩阵上的状态机
+
+    update 及其调用的 _long_open/_short_open/_long_exit/_short_exit 与 Position.update 的分支一一对应；
+    run 中用 _skip_flat/_skip_hold 跳过不会改变状态的行，只记录持仓。
+    """
+
+    def __init__(self, sm: SignalsMatrix, pos: Position, rows: np.ndarray, ops: np.ndarray,
+                 event_idx: np.ndarray, factor_idx: np.ndarray):
+        self.sm, self.pos, self.rows = sm, pos, rows
+        self.event_idx, self.factor_idx = event_idx, factor_idx
+        self.ops, self.ns, self.days = ops.tolist(), sm.ns.tolist(), sm.days.tolist()
+        self.stop_loss = -pos.stop_loss / 10000
+        self.p = pos.pos
+        self.le = pos.last_event
+        self.le_bid, self.le_price = self.le["bid"], self.le["price"]
+        self.last_lo, self.last_lo_ns, self.last_lo_day = _last_open(pos.last_lo_dt)
+        self.last_so, self.last_so_ns, self.last_so_day = _last_open(pos.last_so_dt)
+
+        # 空仓时只有开仓事件、持仓时只有事件或者止损/超时会改变状态
+        row_ops = ops[rows]
+        self.open_k = np.flatnonzero((row_ops == LO) | (row_ops == SO))
+        self.event_k = np.flatnonzero(row_ops != HO)
+        self.row_days, self.row_prices, self.row_bids = sm.days[rows], sm._prices[rows], sm._bids[rows]
+        self.holds_pos = np.zeros(len(rows), dtype=np.int64)
+
+    def run(self):
+        rows, ops, operates = self.rows.tolist(), self.ops, self.pos.operates
+        n_rows = len(rows)
+        k, last_k, n_ops = 0, -1, len(operates)
+        while k < n_rows:
+            i, o = rows[k], ops[rows[k]]
+            if self.p == 0 and o != LO and o != SO:
+                k = self._skip_flat(k)
+                continue
+            if self.p != 0 and o == HO:
+                t = self._skip_hold(k)
+                if t > k:
+                    k = t
+                    continue
+
+            last_k, n_ops = k, len(operates)
+            self.update(i, o)
+            self.holds_pos[k] = self.p
+            k += 1
+
+        sm, pos = self.sm, self.pos
+        holds = zip(rows, self.holds_pos.tolist())
+        pos.holds.extend({"dt": sm.dts[i], "pos": x, "price": sm.prices[i]} for i, x in holds)
+        pos.pos = self.p
+        pos.last_event = self.le
+        pos.last_lo_dt, pos.last_so_dt = self.last_lo, self.last_so
+        pos.end_dt = sm.dts[rows[-1]]
+        pos.pos_changed = last_k == n_rows - 1 and len(operates) > n_ops
+
+    def _skip_flat(self, k: int) -> int:
+        """空仓时跳到下一个有开仓事件的行"""
+        j = np.searchsorted(self.open_k, k)
+        return int(self.open_k[j]) if j < len(self.open_k) else len(self.rows)
+
+    def _skip_hold(self, k: int) -> int:
+        """持仓时，在下一个事件之前查找第一个触发止损或超时的行，之前的行只记录持仓
+
+        :return: 需要执行 update 的行；返回 k 表示当前行需要执行 update
+        """
+        j = np.searchsorted(self.event_k, k)
+        e = int(self.event_k[j]) if j < len(self.event_k) else len(self.rows)
+        prices, timeout = self.row_prices[k:e], self.row_bids[k:e] - self.le_bid > self.pos.timeout
+        if self.p == 1:
+            trig, last_day = (prices / self.le_price - 1 < self.stop_loss) | timeout, self.last_lo_day
+        else:
+            trig, last_day = (1 - prices / self.le_price < self.stop_loss) | timeout, self.last_so_day
+        if not self.pos.T0:
+            trig &= self.row_days[k:e] != last_day
+        t = k + int(trig.argmax()) if trig.any() else e
+        self.holds_pos[k:t] = self.p
+        return t
+
+    def _operate(self, i: int, op: Operate, op_desc: str):
+        sm = self.sm
+        self.pos.operates.append({"symbol": sm.symbols[i], "dt": sm.dts[i], "bid": sm.bids[i],
+                                  "price": sm.prices[i], "op": op, "op_desc": op_desc, "pos": self.p})
+
+    def _can_exit(self, i: int, last_day) -> bool:
+        """T0 或者不是开仓当天时才允许平仓"""
+        return self.pos.T0 or self.days[i] != last_day
+
+    def update(self, i: int, o: int):
+        """处理第 i 行信号，对应 Position.update"""
+        sm = self.sm
+        op_desc = ""
+        if o != HO:
+            event = self.pos.events[self.event_idx[i]]
+            op_desc = f"{event.name}@{event.factors[self.factor_idx[i]].name}"
+
+        # 当有新的开仓 event 发生，更新 last_event
+        if o == LO or o == SO:
+            self.le = {"dt": sm.dts[i], "bid": sm.bids[i], "price": sm.prices[i],
+                       "op": _OPERATES[o], "op_desc": op_desc}
+            self.le_bid, self.le_price = sm.bids[i], sm.prices[i]
+
+        if o == LO:
+            self._long_open(i, op_desc)
+        if o == SO:
+            self._short_open(i, op_desc)
+        if self.p == 1 and self._can_exit(i, self.last_lo_day):
+            self._long_exit(i, o, op_desc)
+        if self.p == -1 and self._can_exit(i, self.last_so_day):
+            self._short_exit(i, o, op_desc)
+
+    def _long_open(self, i: int, op_desc: str):
+        """与前一次开多间隔时间大于 interval，直接开多；否则仅对空头平仓"""
+        if self.p != 1 and (self.last_lo_ns is None or (self.ns[i] - self.last_lo_ns) / 1e9 > self.pos.interval):
+            self.p = 1
+            self._operate(i, Operate.LO, op_desc)
+            self.last_lo, self.last_lo_ns, self.last_lo_day = self.sm.dts[i], self.ns[i], self.days[i]
+        elif self.p == -1 and self._can_exit(i, self.last_so_day):
+            self.p = 0
+            self._operate(i, Operate.SE, op_desc)
+
+    def _short_open(self, i: int, op_desc: str):
+        """与前一次开空间隔时间大于 interval，直接开空；否则仅对多头平仓"""
+        if self.p != -1 and (self.last_so_ns is None or (self.ns[i] - self.last_so_ns) / 1e9 > self.pos.interval):
+            self.p = -1
+            self._operate(i, Operate.SO, op_desc)
+            self.last_so, self.last_so_ns, self.last_so_day = self.sm.dts[i], self.ns[i], self.days[i]
+        elif self.p == 1 and self._can_exit(i, self.last_lo_day):
+            self.p = 0
+            self._operate(i, Operate.LE, op_desc)
+
+    def _long_exit(self, i: int, o: int, op_desc: str):
+        """多头出场：平多事件、止损、超时"""
+        if o == LE:
+            self.p = 0
+            self._operate(i, Operate.LE, op_desc)
+        if self.sm.prices[i] / self.le_price - 1 < self.stop_loss:
+            self.p = 0
+            self._operate(i, Operate.LE, f"平多@{self.pos.stop_loss}BP止损")
+        if self.sm.bids[i] - self.le_bid > self.pos.timeout:
+            self.p = 0
+            self._operate(i, Operate.LE, f"平多@{self.pos.timeout}K超时")
+
+    def _short_exit(self, i: int, o: int, op_desc: str):
+        """空头出场：平空事件、止损、超时"""
+        if o == SE:
+            self.p = 0
+            self._operate(i, Operate.SE, op_desc)
+        if 1 - self.sm.prices[i] / self.le_price < self.stop_loss:
+            self.p = 0
+            self._operate(i, Operate.SE, f"平空@{self.pos.stop_loss}BP止损")
+        if self.sm.bids[i] - self.le_bid > self.pos.timeout:
+            self.p = 0
+            self._operate(i, Operate.SE, f"平空@{self.pos.timeout}K超时")
+
+
+def vector_dummy(sigs: Union[pd.DataFrame, SignalsMatrix], positions: List[Position]) -> List[Position]:
+    """使用信号矩阵批量回测多个 Position
+
+    结果与 CzscTrader(positions=positions) 逐行调用 on_sig 完全一致，传入的 positions 不会被修改。
+
+    :param sigs: 信号 DataFrame 或者 SignalsMatrix 对象，多次回测同一份信号时，传入 SignalsMatrix 可以复用匹配结果
+    :param positions: 持仓策略列表
+    :return: 完成回测的 Position 列表
+    """
+    sm = sigs if isinstance(sigs, SignalsMatrix) else SignalsMatrix(sigs)
+    return [sm.backtest(pos) for pos in positions]
@@ -222,6 +222,91 @@ def stoploss_by_direction(dfw, stoploss=0.03, **kwargs):
     return dfw1
 
 
+def match_volume_lots(volumes):
+    """按批次对持仓数量序列进行开平仓配对
+
+    持仓数量每变化一次只记录一个批次，平仓时从最近的开仓批次开始配对，部分平仓时拆分开仓批次；
+    与按单位逐个开平仓配对的结果完全一致，但计算量只与持仓变化次数有关，与单位数量无关。
+
+    :param volumes: array-like，每根K线结束时的目标持仓数量（整数），正数为多头，负数为空头
+    :return: (open_ids, close_ids, lots)，np.ndarray，分别为开仓K线序号、平仓K线序号、配对数量（单位数）
+    """
+    volumes = np.asarray(volumes, dtype=np.int64)
+    open_ids, close_ids, lots = [], [], []
+    if len(volumes) == 0:
+        return np.array(open_ids, dtype=np.int64), np.array(close_ids, dtype=np.int64), np.array(lots, dtype=np.int64)
+
+    stack_ids, stack_lots = [], []  # 未平仓批次：开仓K线序号、剩余数量
+    if volumes[0] != 0:
+        stack_ids.append(0)
+        stack_lots.append(abs(int(volumes[0])))
+
+    changes = np.flatnonzero(np.diff(volumes)) + 1
+    for i, v1, v2 in zip(changes.tolist(), volumes[changes - 1].tolist(), volumes[changes].tolist()):
+        if v1 * v2 < 0:
+            close_n, open_n = abs(v1), abs(v2)
+        elif abs(v2) > abs(v1):
+            close_n, open_n = 0, abs(v2) - abs(v1)
+        else:
+            close_n, open_n = abs(v1) - abs(v2), 0
+
+        while close_n > 0:
+            n = min(close_n, stack_lots[-1])
+            open_ids.append(stack_ids[-1])
+            close_ids.append(i)
+            lots.append(n)
+            close_n -= n
+            if n == stack_lots[-1]:
+                stack_ids.pop()
+                stack_lots.pop()
+            else:
+                stack_lots[-1] -= n
+
+        if open_n > 0:
+            stack_ids.append(i)
+            stack_lots.append(open_n)
+
+    return np.array(open_ids, dtype=np.int64), np.array(close_ids, dtype=np.int64), np.array(lots, dtype=np.int64)
+
+
+def symbol_pairs(symbol, dfs, digits=2):
+    """根据单个品种的持仓权重序列生成开平交易记录
+
+    :param symbol: str，合约代码
+    :param dfs: pd.DataFrame，单个品种按 dt 升序排列的持仓权重数据，columns 至少包含 ['dt', 'weight', 'price']
+    :param digits: int，权重列保留小数位数
+    :return: pd.DataFrame，开平交易记录，每个配对批次一条记录；配对数量 为批次包含的持仓单位数，每个单位的权重为 10 ** -digits
+    """
+    volumes = (dfs["weight"] * pow(10, digits)).astype(int).values
+    open_ids, close_ids, lots = match_volume_lots(volumes)
+    if len(lots) == 0:
+        return pd.DataFrame()
+
+    open_dt = dfs["dt"].iloc[open_ids].reset_index(drop=True)
+    close_dt = dfs["dt"].iloc[close_ids].reset_index(drop=True)
+    prices = dfs["price"].values
+    is_long = volumes[open_ids] > 0
+    open_price, close_price = prices[open_ids], prices[close_ids]
+    p_ret = np.where(is_long, close_price - open_price, open_price - close_price) / open_price * 10000
+
+    df_pairs = pd.DataFrame(
+        {
+            "标的代码": symbol,
+            "交易方向": np.where(is_long, "多头", "空头"),
+            "开仓时间": open_dt,
+            "平仓时间": close_dt,
+            "开仓价格": open_price,
+            "平仓价格": close_price,
+            "持仓K线数": close_ids - open_ids + 1,
+            "事件序列": np.where(is_long, "开多 -> 平多", "开空 -> 平空"),
+            "持仓天数": (close_dt - open_dt).dt.days,
+            "盈亏比例": [round(x, 2) for x in p_ret.tolist()],
+            "配对数量": lots,
+        }
+    )
+    return df_pairs
+
+
 class WeightBacktest:
     """持仓权重回测
 
@@ -267,6 +352,10 @@ class WeightBacktest:
 
             - fee_rate: float，单边交易成本，包括手续费与冲击成本, 默认为 0.0002
             - n_jobs: int, 并行计算的进程数，默认为 min(cpu_count() // 2, len(self.symbols))
+            - engine: str, 回测引擎，默认为 "vector"
+
+                - vector  按 (symbol, dt) 排序一次，分组向量化计算所有品种的日收益，只把品种切片发送给子进程计算交易对
+                - symbol  逐个品种从 dfw 中筛选数据计算，即原始实现
 
         """
         self.kwargs = kwargs
@@ -342,111 +431,15 @@ class WeightBacktest:
 
         函数计算逻辑：
 
-        1. 从实例变量self.dfw中筛选出交易标的为symbol的数据，并复制到新的DataFrame dfs。
-        2. 将权重乘以10的self.digits次方，并转换为整数类型，作为volume列的值。
-        3. 生成bar_id列，从1开始递增，与行数对应。
-        4. 创建一个空列表operates，用于存储开平仓交易记录。
-        5. 定义内部函数__add_operate，用于向operates列表中添加开平仓交易记录。
-           函数接受日期dt、bar_id、交易量volume、价格price和操作类型operate作为参数。
-           函数根据交易量的绝对值循环添加交易记录到operates列表中。
-        6. 将dfs转换为字典列表rows。
-        7. 处理第一个行记录。
-           - 如果volume大于0，则调用__add_operate函数添加"开多"操作的交易记录。
-           - 如果volume小于0，则调用__add_operate函数添加"开空"操作的交易记录。
-        8. 处理后续的行记录。
-           - 使用zip函数遍历rows[:-1]和rows[1:]，同时获取当前行row1和下一行row2。
-           - 根据volume的正负和变化情况，调用__add_operate函数添加对应的开平仓交易记录。
-        9. 创建空列表pairs和opens，用于存储交易对和开仓记录。
-        10. 遍历operates列表中的交易记录。
-            - 如果操作类型为"开多"或"开空"，将交易记录添加到opens列表中，并继续下一次循环。
-            - 如果操作类型为"平多"或"平空"，将对应的开仓记录从opens列表中弹出。
-              根据开仓和平仓的价格计算盈亏比例，并创建一个交易对字典，将其添加到pairs列表中。
-        11. 将pairs列表转换为DataFrame，并返回包含交易标的的开平仓交易记录的DataFrame。
+        1. 从实例变量self.dfw中筛选出交易标的为symbol的数据，将权重乘以10的self.digits次方并转换为整数，作为持仓数量 volume。
+        2. 找出持仓数量发生变化的K线，调用 match_volume_lots 按批次（每次变化一条记录）进行开平仓配对，
+           部分平仓时拆分开仓批次，得到开仓K线序号、平仓K线序号和配对数量。
+        3. 用 NumPy 数组一次性计算每个批次的交易方向、持仓K线数、持仓天数和盈亏比例。
+        4. 每个批次一条记录，配对数量 列为批次包含的单位数；按 配对数量 展开后与逐单位配对的结果完全一致。
 
         """
-        dfs = self.dfw[self.dfw["symbol"] == symbol].copy()
-        dfs["volume"] = (dfs["weight"] * pow(10, self.digits)).astype(int)
-        dfs["bar_id"] = list(range(1, len(dfs) + 1))
-
-        # 根据权重变化生成开平仓记录
-        operates = []
-
-        def __add_operate(dt, bar_id, volume, price, operate):
-            for _ in range(abs(volume)):
-                _op = {"bar_id": bar_id, "dt": dt, "price": price, "operate": operate}
-                operates.append(_op)
-
-        rows = dfs.to_dict(orient="records")
-
-        # 处理第一个 row
-        if rows[0]["volume"] > 0:
-            __add_operate(rows[0]["dt"], rows[0]["bar_id"], rows[0]["volume"], rows[0]["price"], operate="开多")
-        elif rows[0]["volume"] < 0:
-            __add_operate(rows[0]["dt"], rows[0]["bar_id"], rows[0]["volume"], rows[0]["price"], operate="开空")
-
-        # 处理后续 rows
-        for row1, row2 in zip(rows[:-1], rows[1:]):
-            if row1["volume"] >= 0 and row2["volume"] >= 0:
-                # 多头仓位变化对应的操作
-                if row2["volume"] > row1["volume"]:
-                    __add_operate(
-                        row2["dt"], row2["bar_id"], row2["volume"] - row1["volume"], row2["price"], operate="开多"
-                    )
-                elif row2["volume"] < row1["volume"]:
-                    __add_operate(
-                        row2["dt"], row2["bar_id"], row1["volume"] - row2["volume"], row2["price"], operate="平多"
-                    )
-
-            elif row1["volume"] <= 0 and row2["volume"] <= 0:
-                # 空头仓位变化对应的操作
-                if row2["volume"] > row1["volume"]:
-                    __add_operate(
-                        row2["dt"], row2["bar_id"], row1["volume"] - row2["volume"], row2["price"], operate="平空"
-                    )
-                elif row2["volume"] < row1["volume"]:
-                    __add_operate(
-                        row2["dt"], row2["bar_id"], row2["volume"] - row1["volume"], row2["price"], operate="开空"
-                    )
-
-            elif row1["volume"] >= 0 >= row2["volume"]:
-                # 多头转换成空头对应的操作
-                __add_operate(row2["dt"], row2["bar_id"], row1["volume"], row2["price"], operate="平多")
-                __add_operate(row2["dt"], row2["bar_id"], row2["volume"], row2["price"], operate="开空")
-
-            elif row1["volume"] <= 0 <= row2["volume"]:
-                # 空头转换成多头对应的操作
-                __add_operate(row2["dt"], row2["bar_id"], row1["volume"], row2["price"], operate="平空")
-                __add_operate(row2["dt"], row2["bar_id"], row2["volume"], row2["price"], operate="开多")
-
-        pairs, opens = [], []
-        for op in operates:
-            if op["operate"] in ["开多", "开空"]:
-                opens.append(op)
-                continue
-
-            assert op["operate"] in ["平多", "平空"]
-            open_op = opens.pop()
-            if open_op["operate"] == "开多":
-                p_ret = round((op["price"] - open_op["price"]) / open_op["price"] * 10000, 2)
-                p_dir = "多头"
-            else:
-                p_ret = round((open_op["price"] - op["price"]) / open_op["price"] * 10000, 2)
-                p_dir = "空头"
-            pair = {
-                "标的代码": symbol,
-                "交易方向": p_dir,
-                "开仓时间": open_op["dt"],
-                "平仓时间": op["dt"],
-                "开仓价格": open_op["price"],
-                "平仓价格": op["price"],
-                "持仓K线数": op["bar_id"] - open_op["bar_id"] + 1,
-                "事件序列": f"{open_op['operate']} -> {op['operate']}",
-                "持仓天数": (op["dt"] - open_op["dt"]).days,
-                "盈亏比例": p_ret,
-            }
-            pairs.append(pair)
-        df_pairs = pd.DataFrame(pairs)
-        return df_pairs
+        dfs = self.dfw[self.dfw["symbol"] == symbol]
+        return symbol_pairs(symbol, dfs, self.digits)
 
     def process_symbol(self, symbol):
         """处理某个合约的回测数据"""
@@ -454,12 +447,69 @@ class WeightBacktest:
         pairs = self.get_symbol_pairs(symbol)
         return symbol, {"daily": daily, "pairs": pairs}
 
+    def get_daily(self, dfw=None):
+        """分组向量化计算所有合约的每日收益率
+
+        计算逻辑与 get_symbol_daily 一致：按 (symbol, dt) 排序后，用分组 shift 计算 edge 和 cost，
+        再按 (symbol, date) 分组求和，一次得到所有合约的日收益。
+
+        :param dfw: pd.DataFrame，按 (symbol, dt) 排序的持仓权重数据，默认为 self.dfw 排序后的结果
+        :return: pd.DataFrame，columns = ['date', 'symbol', 'edge', 'return', 'cost']
+        """
+        if dfw is None:
+            dfw = self.dfw.sort_values(["symbol", "dt"], kind="mergesort", ignore_index=True)
+
+        gs = dfw.groupby("symbol", sort=False)
+        edge = dfw["weight"] * (gs["price"].shift(-1) / dfw["price"] - 1)
+        cost = abs(gs["weight"].shift(1) - dfw["weight"]) * self.fee_rate
+        dfs = pd.DataFrame({"edge": edge, "edge_post_fee": edge - cost, "cost": cost})
+        keys = [dfw["symbol"].rename("symbol"), dfw["dt"].dt.normalize().rename("date")]
+        daily = dfs.groupby(keys, sort=False).sum().reset_index()
+        daily["date"] = daily["date"].dt.date
+        daily.rename(columns={"edge_post_fee": "return"}, inplace=True)
+        return daily[["date", "symbol", "edge", "return", "cost"]]
+
+    def __backtest_by_symbol(self, symbols, n_jobs):
+        res = {}
+        if n_jobs <= 1:
+            for symbol in tqdm(symbols, desc="WBT进度", leave=False):
+                res[symbol] = self.process_symbol(symbol)[1]
+        else:
+            with ProcessPoolExecutor(n_jobs) as pool:
+                for symbol, res_symbol in tqdm(
+                    pool.map(self.process_symbol, symbols), desc="WBT进度", total=len(symbols), leave=False
+                ):
+                    res[symbol] = res_symbol
+        return res
+
+    def __backtest_by_vector(self, symbols, n_jobs):
+        dfw = self.dfw[["dt", "symbol", "weight", "price"]].sort_values(["symbol", "dt"], kind="mergesort")
+        dfw.reset_index(drop=True, inplace=True)
+        daily = self.get_daily(dfw)
+
+        def __slices(df):
+            values = df["symbol"].values
+            starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+            ends = np.r_[starts[1:], len(values)]
+            return {values[i]: df.iloc[i:j].reset_index(drop=True) for i, j in zip(starts, ends)}
+
+        dailys = __slices(daily)
+        weights = __slices(dfw[["dt", "symbol", "weight", "price"]])
+        if n_jobs <= 1:
+            pairs = [symbol_pairs(symbol, weights[symbol], self.digits) for symbol in symbols]
+        else:
+            with ProcessPoolExecutor(n_jobs) as pool:
+                args = (symbols, [weights[x] for x in symbols], [self.digits] * len(symbols))
+                pairs = list(tqdm(pool.map(symbol_pairs, *args), desc="WBT进度", total=len(symbols), leave=False))
+        return {symbol: {"daily": dailys[symbol], "pairs": pairs[i]} for i, symbol in enumerate(symbols)}
+
     def backtest(self, n_jobs=1):
         """回测所有合约的收益率
 
         函数计算逻辑：
 
-        1. 获取数据：遍历所有合约，调用get_symbol_daily方法获取每个合约的日收益，调用get_symbol_pairs方法获取每个合约的交易流水。
+        1. 获取数据：engine 为 symbol 时，遍历所有合约，调用get_symbol_daily方法获取每个合约的日收益，调用get_symbol_pairs方法获取每个合约的交易流水；
+            engine 为 vector 时，调用 get_daily 方法一次计算所有合约的日收益，再把每个合约的持仓权重切片交给 symbol_pairs 计算交易流水。
 
         2. 数据处理：将每个合约的日收益合并为一个DataFrame，使用pd.pivot_table方法将数据重塑为以日期为索引、合约为列、
             收益率为值的表格，并将缺失值填充为0。计算所有合约收益率的平均值，并将该列添加到DataFrame中。将结果存储在res字典中，
@@ -471,19 +521,16 @@ class WeightBacktest:
         4. 返回结果：将合约的等权日收益数据和绩效评价结果存储在res字典中，并将该字典作为函数的返回结果。
         """
         n_jobs = min(n_jobs, cpu_count())
-        logger.info(f"n_jobs={n_jobs}，将使用 {n_jobs} 个进程进行回测")
+        engine = self.kwargs.get("engine", "vector")
+        logger.info(f"n_jobs={n_jobs}，engine={engine}，将使用 {n_jobs} 个进程进行回测")
 
         symbols = self.symbols
-        res = {}
-        if n_jobs <= 1:
-            for symbol in tqdm(sorted(symbols), desc="WBT进度", leave=False):
-                res[symbol] = self.process_symbol(symbol)[1]
+        if engine == "vector":
+            res = self.__backtest_by_vector(sorted(symbols), n_jobs)
+        elif engine == "symbol":
+            res = self.__backtest_by_symbol(sorted(symbols), n_jobs)
         else:
-            with ProcessPoolExecutor(n_jobs) as pool:
-                for symbol, res_symbol in tqdm(
-                    pool.map(self.process_symbol, sorted(symbols)), desc="WBT进度", total=len(symbols), leave=False
-                ):
-                    res[symbol] = res_symbol
+            raise ValueError(f"engine 参数错误：{engine}，可选值为 vector、symbol")
 
         dret = pd.concat([v["daily"] for k, v in res.items() if k in symbols], ignore_index=True)
         dret = pd.pivot_table(dret, index="date", columns="symbol", values="return").fillna(0)
@@ -497,7 +544,7 @@ class WeightBacktest:
         pairs_stats = {k: v for k, v in pairs_stats.items() if k in ["单笔收益", "持仓K线数", "交易胜率", "持仓天数"]}
         stats.update(pairs_stats)
 
-        dfw = self.dfw.copy()
+        dfw = self.dfw
         long_rate = dfw[dfw["weight"] > 0].shape[0] / dfw.shape[0]
         short_rate = dfw[dfw["weight"] < 0].shape[0] / dfw.shape[0]
         stats.update({"多头占比": long_rate, "空头占比": short_rate})
@@ -4,17 +4,20 @@ from typing import List, Union
 
 from . import qywx
 from . import ta
+from . import ta_stream
 from . import io
 from . import echarts_plot
 
 from .echarts_plot import kline_pro, heat_map
 from .word_writer import WordWriter
-from .corr import nmi_matrix, single_linear, cross_sectional_ic
-from .bar_generator import BarGenerator, freq_end_time, resample_bars, format_standard_kline
+from .corr import nmi_matrix, single_linear, cross_sectional_ic, cross_sectional_stats
+from .bar_generator import BarGenerator, MultiBarGenerator, freq_end_time, freq_end_times, resample_bars, format_standard_kline
+from .bar_store import BarStore, BarView, bar_fields
 from .bar_generator import is_trading_time, get_intraday_times, check_freq_and_market
 from .io import dill_dump, dill_load, read_json, save_json
 from .sig import check_pressure_support, check_gap_info, is_bis_down, is_bis_up, get_sub_elements, is_symmetry_zs
 from .sig import same_dir_counts, fast_slow_cross, count_last_same, create_single_signal
+from .sig import get_signal_columns, compact_signals
 from .plotly_plot import KlineChart
 from .trade import cal_trade_price, update_nxb, update_bbars, update_tbars, risk_free_returns, resample_to_daily
 from .cross import CrossSectionalPerformance, cross_sectional_ranker
@@ -26,6 +29,8 @@ from .stats import (
     holds_performance,
     top_drawdowns,
     rolling_daily_performance,
+    rolling_daily_performance_fast,
+    daily_performance_matrix,
     psi,
 )
 from .signal_analyzer import SignalAnalyzer, SignalPerformance
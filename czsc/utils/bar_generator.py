@@ -5,21 +5,28 @@ email: zeng_bin8888@163.com
 create_dt: 2021/11/14 12:39
 describe: 从任意周期K线开始合成更高周期K线的工具类
 """
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta, date
-from typing import List, Union, AnyStr, Optional
+from typing import List, Union, AnyStr, Optional, Dict
 from czsc.objects import RawBar, Freq
 from pathlib import Path
 from loguru import logger
 
 
 mss = pd.read_feather(Path(__file__).parent / "minites_split.feather")
-freq_market_times, freq_edt_map = {}, {}
+freq_market_times, freq_edt_map, freq_edt_minutes = {}, {}, {}
 for _m, dfg in mss.groupby('market'):
     for _f in [x for x in mss.columns if x.endswith("分钟")]:
         freq_market_times[f"{_f}_{_m}"] = list(dfg[_f].unique())
         freq_edt_map[f"{_f}_{_m}"] = {k: v for k, v in dfg[["time", _f]].values}
 
+        # 日内分钟序号（0 ~ 1439）到周期结束分钟序号的查找表，-1 表示非交易时间
+        _edt_minutes = np.full(1440, -1, dtype=np.int64)
+        for _k, _v in freq_edt_map[f"{_f}_{_m}"].items():
+            _edt_minutes[int(_k[:2]) * 60 + int(_k[3:])] = int(_v[:2]) * 60 + int(_v[3:])
+        freq_edt_minutes[f"{_f}_{_m}"] = _edt_minutes
+
 
 def is_trading_time(dt: datetime = datetime.now(), market="A股"):
     """判断指定时间是否是交易时间"""
@@ -156,13 +163,14 @@ def freq_end_time(dt: datetime, freq: Union[Freq, AnyStr], market="A股") -> dat
     if dt.second > 0 or dt.microsecond > 0:
         dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
 
-    hm = dt.strftime("%H:%M")
-    key = f"{freq.value}_{market}"
     if freq.value.endswith("分钟"):
-        h, m = map(int, freq_edt_map[key][hm].split(":"))
-        edt = dt.replace(hour=h, minute=m)
+        minute = dt.hour * 60 + dt.minute
+        edt_minute = freq_edt_minutes[f"{freq.value}_{market}"][minute]
+        if edt_minute < 0:
+            raise KeyError(dt.strftime("%H:%M"))
+        edt = dt.replace(hour=int(edt_minute) // 60, minute=int(edt_minute) % 60)
 
-        if h == m == 0 and freq != Freq.F1 and hm != "00:00":
+        if edt_minute == 0 and freq != Freq.F1 and minute != 0:
             edt += timedelta(days=1)
 
         return edt
@@ -173,13 +181,62 @@ def freq_end_time(dt: datetime, freq: Union[Freq, AnyStr], market="A股") -> dat
     return freq_end_date(dt.date(), freq)
 
 
+def _minute_end_times(dts: pd.Series, freq: Freq, market: str) -> pd.Series:
+    """分钟周期的 freq_end_times：通过 freq_edt_minutes 查找表计算周期结束时间"""
+    days = dts.dt.normalize()
+    minutes = (dts.dt.hour * 60 + dts.dt.minute).values
+    edt_minutes = freq_edt_minutes[f"{freq.value}_{market}"][minutes]
+    if (edt_minutes < 0).any():
+        raise KeyError(dts[edt_minutes < 0].iloc[0].strftime("%H:%M"))
+
+    if freq != Freq.F1:
+        # 周期结束时间为 00:00 的跨日K线，结束时间为下一个自然日的 00:00
+        edt_minutes = np.where((edt_minutes == 0) & (minutes != 0), 1440, edt_minutes)
+    return days + pd.to_timedelta(edt_minutes, unit="min")
+
+
+def freq_end_times(dts: pd.Series, freq: Union[Freq, AnyStr], market="A股") -> pd.Series:
+    """freq_end_time 的向量化版本，批量计算 dts 对应的K线周期结束时间
+
+    分钟周期通过 freq_edt_minutes 查找表将日内分钟序号映射为周期结束分钟序号；
+    日线、周线、月线、季线、年线直接用日期运算计算，结果与逐个调用 freq_end_time 一致。
+
+    :param dts: pd.Series，datetime 序列
+    :param freq: Freq，目标周期
+    :param market: 市场名称，可选值：A股、期货、默认
+    :return: pd.Series，与 dts 等长的周期结束时间序列
+    """
+    assert market in ['A股', '期货', '默认'], "market 参数必须为 A股 或 期货 或 默认"
+    if not isinstance(freq, Freq):
+        freq = Freq(freq)
+    dts = pd.Series(pd.to_datetime(dts)).dt.ceil("min")
+
+    if freq.value.endswith("分钟"):
+        return _minute_end_times(dts, freq, market)
+
+    if dts.dt.tz is not None:
+        dts = dts.dt.tz_localize(None)
+    days = dts.dt.normalize()
+    if freq == Freq.D:
+        return days
+    if freq == Freq.W:
+        return days + pd.to_timedelta(4 - days.dt.dayofweek, unit="D")
+    if freq == Freq.M:
+        return days + pd.offsets.MonthEnd(0)
+    if freq == Freq.S:
+        return days + pd.offsets.QuarterEnd(0)
+    if freq == Freq.Y:
+        return days + pd.offsets.YearEnd(0)
+    return dts.apply(lambda x: freq_end_time(x, freq, market))
+
+
 def resample_bars(df: pd.DataFrame, target_freq: Union[Freq, AnyStr], raw_bars=True, **kwargs):
     """将给定的K线数据重新采样为目标周期的K线数据
 
     函数计算逻辑：
 
     1. 确定目标周期`target_freq`的类型和市场类型。
-    2. 添加一个新列`freq_edt`，表示每个数据点对应的目标周期的结束时间。
+    2. 添加一个新列`freq_edt`，表示每个数据点对应的目标周期的结束时间，由 freq_end_times 向量化计算。
     3. 根据`freq_edt`对数据进行分组，并对每组数据进行聚合，得到目标周期的K线数据。
     4. 重置索引，并选择需要的列。
     5. 根据`raw_bars`参数，决定返回的数据类型：如果为True，转换为`RawBar`对象；如果为False，直接返回DataFrame。
@@ -212,12 +269,12 @@ def resample_bars(df: pd.DataFrame, target_freq: Union[Freq, AnyStr], raw_bars=T
 
     base_freq = kwargs.get('base_freq', None)
     if target_freq.value.endswith("分钟"):
-        uni_times = sorted(df['dt'].tail(2000).apply(lambda x: x.strftime("%H:%M")).unique().tolist())
+        uni_times = sorted(df['dt'].tail(2000).dt.strftime("%H:%M").unique().tolist())
         _, market = check_freq_and_market(uni_times, freq=base_freq)
     else:
         market = "默认"
 
-    df['freq_edt'] = df['dt'].apply(lambda x: freq_end_time(x, target_freq, market))
+    df['freq_edt'] = freq_end_times(df['dt'], target_freq, market)
     dfk1 = df.groupby('freq_edt').agg(
         {'symbol': 'first', 'dt': 'last', 'open': 'first', 'close': 'last', 'high': 'max',
          'low': 'min', 'vol': 'sum', 'amount': 'sum', 'freq_edt': 'last'})
@@ -226,10 +283,10 @@ def resample_bars(df: pd.DataFrame, target_freq: Union[Freq, AnyStr], raw_bars=T
     dfk1 = dfk1[['symbol', 'dt', 'open', 'close', 'high', 'low', 'vol', 'amount']]
 
     if raw_bars:
-        _bars = []
-        for i, row in enumerate(dfk1.to_dict("records"), 1):
-            row.update({'id': i, 'freq': target_freq})
-            _bars.append(RawBar(**row))
+        cols = [dfk1[x].tolist() for x in ['symbol', 'dt', 'open', 'close', 'high', 'low', 'vol', 'amount']]
+        _bars = [RawBar(symbol=symbol, id=i, dt=dt, freq=target_freq, open=open_, close=close, high=high, low=low,
+                        vol=vol, amount=amount)
+                 for i, (symbol, dt, open_, close, high, low, vol, amount) in enumerate(zip(*cols), 1)]
 
         if kwargs.get('drop_unfinished', True):
             # 清除最后一根未完成的K线
@@ -356,3 +413,110 @@ class BarGenerator:
         for f, b in self.bars.items():
             if len(b) > self.max_count:
                 self.bars[f] = b[-self.max_count:]
+
+
+class MultiBarGenerator:
+    """多品种K线合成器
+
+    1. 每次输入一批基础周期K线（通常是同一时刻所有品种的K线），同一个 dt 的各周期结束时间只计算一次；
+    2. 分钟周期的结束时间通过 freq_edt_minutes 查找表计算，不再逐根K线格式化字符串；
+    3. 未完成的周期K线原地更新，只有进入新周期时才创建新的 RawBar；
+    4. 每个品种对应一个 BarGenerator 视图，bars 属性与 BarGenerator.bars 完全兼容。
+    """
+
+    version = 'V240612'
+
+    def __init__(self, base_freq: str, freqs: List[str], max_count: int = 5000, market="默认"):
+        self.base_freq = base_freq
+        self.freqs = freqs
+        self.max_count = max_count
+        self.market = market
+        self.end_dt = None
+        self.generators: Dict[str, BarGenerator] = {}
+
+        # 校验周期参数，并确定各周期的更新顺序
+        _bg = BarGenerator(base_freq, freqs, max_count, market)
+        self.freq_seq = [Freq(x) for x in _bg.bars.keys()]
+        self.__edt_cache = {}
+
+    def __repr__(self):
+        return f"<MultiBarGenerator for {len(self.generators)} symbols @ {self.end_dt}>"
+
+    def __getitem__(self, symbol: str) -> BarGenerator:
+        return self.generators[symbol]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.generators
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.generators.keys())
+
+    def get_bg(self, symbol: str) -> BarGenerator:
+        """获取某个品种的 BarGenerator 视图，不存在则创建"""
+        bg = self.generators.get(symbol)
+        if bg is None:
+            bg = BarGenerator(self.base_freq, self.freqs, self.max_count, self.market)
+            bg.symbol = symbol
+            self.generators[symbol] = bg
+        return bg
+
+    def init_freq_bars(self, symbol: str, freq: str, bars: List[RawBar]):
+        """初始化某个品种某个周期的K线序列"""
+        self.get_bg(symbol).init_freq_bars(freq, bars)
+
+    def get_freq_edts(self, dt: datetime) -> tuple:
+        """获取 dt 在各周期（顺序与 freq_seq 一致）的结束时间，同一个 dt 只计算一次"""
+        edts = self.__edt_cache.get(dt)
+        if edts is None:
+            if len(self.__edt_cache) > 10000:
+                self.__edt_cache.clear()
+            edts = tuple(freq_end_time(dt, freq, self.market) for freq in self.freq_seq)
+            self.__edt_cache[dt] = edts
+        return edts
+
+    def update(self, bars: List[RawBar]) -> List[str]:
+        """批量更新多个品种的各周期K线
+
+        :param bars: 基础周期已完成K线列表，每个品种最多一根
+        :return: 本次更新成功的品种列表
+        """
+        base_freq = self.base_freq
+        max_count = self.max_count
+        freq_seq = self.freq_seq
+
+        updated = []
+        for bar in bars:
+            if bar.freq.value != base_freq:
+                raise ValueError(f"Input bar frequency does not match base frequency. "
+                                 f"Expected {base_freq}, got {bar.freq.value}")
+
+            bg = self.get_bg(bar.symbol)
+            base_bars = bg.bars[base_freq]
+            if base_bars and base_bars[-1].dt == bar.dt:
+                logger.warning(f"MultiBarGenerator.update: {bar.symbol} 输入重复K线 {bar.dt}，已忽略")
+                continue
+
+            for freq, edt in zip(freq_seq, self.get_freq_edts(bar.dt)):
+                fbs = bg.bars[freq.value]
+                last = fbs[-1] if fbs else None
+                if last is None or last.dt != edt:
+                    fbs.append(RawBar(symbol=bar.symbol, freq=freq, dt=edt, id=last.id + 1 if last else 0,
+                                      open=bar.open, close=bar.close, high=bar.high, low=bar.low,
+                                      vol=bar.vol, amount=bar.amount))
+                    if len(fbs) > max_count:
+                        del fbs[:-max_count]
+                else:
+                    # 未完成K线原地更新；与 BarGenerator 创建新对象一致，清空上一个状态的缓存
+                    last.close = bar.close
+                    last.high = max(last.high, bar.high)
+                    last.low = min(last.low, bar.low)
+                    last.vol += bar.vol
+                    last.amount += bar.amount
+                    last.cache = {}
+
+            bg.symbol = bar.symbol
+            bg.end_dt = bar.dt
+            self.end_dt = bar.dt
+            updated.append(bar.symbol)
+        return updated
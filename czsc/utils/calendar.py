@@ -4,13 +4,15 @@ author: zengbin93
 email: zeng_bin8888@163.com
 create_dt: 2023/9/10 17:53
 describe: A股+期货的交易日历
+
+交易日历在第一次使用时才读取，读取后转换为按日期排序的 int64 天数索引（自 1970-01-01 起的天数），
+单个日期的查询使用 searchsorted 二分查找，批量查询接口一次处理一组日期。
 """
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-
-
-calendar = pd.read_feather(Path(__file__).parent / "china_calendar.feather")
+from functools import lru_cache
 
 
 def prepare_chain_calendar():
@@ -22,31 +24,116 @@ def prepare_chain_calendar():
     df.to_feather(Path(__file__).parent / "china_calendar.feather")
 
 
-def is_trading_date(date=datetime.now()):
+@lru_cache(maxsize=1)
+def _load_calendar() -> pd.DataFrame:
+    return pd.read_feather(Path(__file__).parent / "china_calendar.feather")
+
+
+@lru_cache(maxsize=1)
+def _open_days() -> np.ndarray:
+    """所有交易日的天数索引，升序排列"""
+    df = _load_calendar()
+    days = df['cal_date'].values.astype('datetime64[D]').astype(np.int64)
+    return np.sort(days[df['is_open'].values == 1])
+
+
+def __getattr__(name):
+    # 兼容直接访问 calendar 的用法，同时避免 import czsc 时读取日历文件
+    if name == "calendar":
+        return _load_calendar()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _to_day(date) -> int:
+    """单个日期转换为天数索引，带时区的时间按当地日期计算"""
+    date = datetime.now() if date is None else date
+    return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+
+def _to_days(dates) -> np.ndarray:
+    """一组日期转换为天数索引"""
+    dts = pd.DatetimeIndex(pd.to_datetime(dates))
+    if dts.tz is not None:
+        dts = dts.tz_localize(None)
+    return dts.values.astype('datetime64[D]').astype(np.int64)
+
+
+def _to_timestamp(day: int) -> pd.Timestamp:
+    return pd.Timestamp(np.datetime64(int(day), 'D'))
+
+
+def is_trading_date(date=None):
     """判断是否是交易日"""
-    date = pd.to_datetime(pd.to_datetime(date).date())
-    is_open = calendar[calendar['cal_date'] == date].iloc[0]['is_open']
-    return is_open == 1
+    days = _open_days()
+    day = _to_day(date)
+    i = np.searchsorted(days, day)
+    return bool(i < len(days) and days[i] == day)
 
 
-def next_trading_date(date=datetime.now(), n=1):
+def next_trading_date(date=None, n=1):
     """获取未来第N个交易日"""
-    date = pd.to_datetime(pd.to_datetime(date).date())
-    df = calendar[calendar['cal_date'] > date]
-    return df[df['is_open'] == 1].iloc[n - 1]['cal_date']
+    days = _open_days()
+    i = np.searchsorted(days, _to_day(date), side='right') + n - 1
+    if n < 1 or i >= len(days):
+        raise IndexError(f"交易日历中没有 {date} 之后的第 {n} 个交易日")
+    return _to_timestamp(days[i])
 
 
-def prev_trading_date(date=datetime.now(), n=1):
+def prev_trading_date(date=None, n=1):
     """获取过去第N个交易日"""
-    date = pd.to_datetime(pd.to_datetime(date).date())
-    df = calendar[calendar['cal_date'] < date]
-    return df[df['is_open'] == 1].iloc[-n]['cal_date']
+    days = _open_days()
+    i = np.searchsorted(days, _to_day(date), side='left') - n
+    if n < 1 or i < 0:
+        raise IndexError(f"交易日历中没有 {date} 之前的第 {n} 个交易日")
+    return _to_timestamp(days[i])
 
 
-def get_trading_dates(sdt, edt=datetime.now()):
+def get_trading_dates(sdt, edt=None):
     """获取两个日期之间的所有交易日"""
-    sdt = pd.to_datetime(sdt).date()
-    edt = pd.to_datetime(edt).date()
-    sdt, edt = pd.to_datetime(sdt), pd.to_datetime(edt)
-    df = calendar[(calendar['cal_date'] >= sdt) & (calendar['cal_date'] <= edt)]
-    return df[df['is_open'] == 1]['cal_date'].tolist()
+    days = _open_days()
+    i = np.searchsorted(days, _to_day(sdt), side='left')
+    j = np.searchsorted(days, _to_day(edt), side='right')
+    return pd.to_datetime(days[i:j].astype('datetime64[D]')).tolist()
+
+
+def is_trading_dates(dates) -> np.ndarray:
+    """批量判断是否是交易日
+
+    :param dates: 日期序列
+    :return: np.ndarray, bool 数组，与 dates 一一对应
+    """
+    days = _open_days()
+    query = _to_days(dates)
+    i = np.minimum(np.searchsorted(days, query), len(days) - 1)
+    return days[i] == query
+
+
+def next_trading_dates(dates, n=1) -> pd.DatetimeIndex:
+    """批量获取未来第N个交易日，超出交易日历范围的结果为 NaT
+
+    :param dates: 日期序列
+    :param n: 第N个交易日
+    :return: pd.DatetimeIndex，与 dates 一一对应
+    """
+    days = _open_days()
+    i = np.searchsorted(days, _to_days(dates), side='right') + n - 1
+    return _take_days(days, i)
+
+
+def prev_trading_dates(dates, n=1) -> pd.DatetimeIndex:
+    """批量获取过去第N个交易日，超出交易日历范围的结果为 NaT
+
+    :param dates: 日期序列
+    :param n: 第N个交易日
+    :return: pd.DatetimeIndex，与 dates 一一对应
+    """
+    days = _open_days()
+    i = np.searchsorted(days, _to_days(dates), side='left') - n
+    return _take_days(days, i)
+
+
+def _take_days(days: np.ndarray, i: np.ndarray) -> pd.DatetimeIndex:
+    valid = (i >= 0) & (i < len(days))
+    res = np.full(len(i), np.datetime64('NaT'), dtype='datetime64[ns]')
+    res[valid] = days[i[valid]].astype('datetime64[D]')
+    return pd.DatetimeIndex(res)
@@ -94,6 +94,157 @@ def single_linear(y: Union[np.array, list], x: Union[np.array, list] = None) ->
     return res
 
 
+def _sectional_groups(dts):
+    """按时间分组：排序一次，返回排序后的行号、分组键、每组的起始位置、每行的组号"""
+    codes, keys = pd.factorize(dts, sort=True)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    gid = codes[order]
+    starts = np.flatnonzero(np.r_[True, gid[1:] != gid[:-1]]) if len(gid) else np.array([], dtype=int)
+    return order, keys, starts, gid
+
+
+def _group_rank(v: np.ndarray, gid: np.ndarray) -> np.ndarray:
+    """组内平均排名，与 scipy.stats.rankdata(method='average') 一致
+
+    :param v: 数值序列，不能有 NaN
+    :param gid: 每个值的组号，升序排列
+    """
+    n = len(v)
+    # 先全局排序得到名次，再按 (组号, 名次) 组成整数键排序，比 np.lexsort 快
+    pos = np.empty(n, dtype=np.int64)
+    pos[np.argsort(v)] = np.arange(n)
+    order = np.argsort(gid.astype(np.int64) * n + pos)
+    sv, sg = v[order], gid[order]
+
+    brk = np.r_[True, (sv[1:] != sv[:-1]) | (sg[1:] != sg[:-1])]
+    block_id = np.cumsum(brk) - 1
+    block_start = np.flatnonzero(brk)
+    block_end = np.r_[block_start[1:], n]
+
+    g_new = np.r_[True, sg[1:] != sg[:-1]]
+    g_start = np.flatnonzero(g_new)[np.cumsum(g_new) - 1]
+
+    ranks = np.empty(n, dtype=np.float64)
+    ranks[order] = (block_start + block_end - 1)[block_id] / 2 - g_start + 1
+    return ranks
+
+
+def _sectional_reduce(x: np.ndarray, y: np.ndarray, starts: np.ndarray, kind="pearson", **kwargs):
+    """分段规约计算截面统计量
+
+    :param x: 因子矩阵，shape = (k, n)，每行一个因子，列已按时间排序
+    :param y: 目标序列，shape = (n,)，已按时间排序
+    :param starts: 每组的起始位置
+    :param kind: pearson 相关系数，或 slope 单变量回归斜率
+    :return: (values, counts)，shape 均为 (k, len(starts))
+    """
+    lengths = np.diff(np.r_[starts, x.shape[1]])
+    mask = ~np.isnan(x) & ~np.isnan(y)
+    if mask.all():
+        cnt = np.broadcast_to(lengths.astype(np.float64), (len(x), len(starts)))
+        xs, ys = x, np.broadcast_to(y, x.shape)
+    else:
+        cnt = np.add.reduceat(mask, starts, axis=1).astype(np.float64)
+        xs, ys = np.where(mask, x, 0.0), np.where(mask, y, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if kind == "slope" and not kwargs.get("fit_intercept", False):
+            sxy = np.add.reduceat(xs * ys, starts, axis=1)
+            sxx = np.add.reduceat(xs * xs, starts, axis=1)
+            return np.where(sxx > 0, sxy / sxx, 0.0), cnt
+
+        dx = xs - np.repeat(np.add.reduceat(xs, starts, axis=1) / cnt, lengths, axis=1)
+        dy = ys - np.repeat(np.add.reduceat(ys, starts, axis=1) / cnt, lengths, axis=1)
+        if not mask.all():
+            dx[~mask] = 0.0
+            dy[~mask] = 0.0
+        sxy = np.add.reduceat(dx * dy, starts, axis=1)
+        sxx = np.add.reduceat(dx * dx, starts, axis=1)
+        if kind == "slope":
+            return np.where(sxx > 0, sxy / sxx, 0.0), cnt
+
+        # 与 np.corrcoef 的计算顺序保持一致
+        syy = np.add.reduceat(dy * dy, starts, axis=1)
+        fact = cnt - 1
+        c = sxy / fact / np.sqrt(sxx / fact) / np.sqrt(syy / fact)
+    return np.clip(c, -1, 1), cnt
+
+
+def cross_sectional_stats(df: pd.DataFrame, factors, target="n1b", method="pearson", **kwargs):
+    """一次计算多个因子的截面统计量（IC、截面回归斜率）
+
+    只按时间排序一次，再用 NumPy 分段规约（np.add.reduceat）同时计算所有截面、所有因子的结果；
+    每个截面内，因子和目标都不为空的样本才参与计算，与 pandas 的 Series.corr 一致。
+
+    :param df: 数据，必须包含 dt_col、factors、target 列
+    :param factors: 因子列名，str 或 list
+    :param target: 目标列名，一般为 n1b
+    :param method: 计算方法
+        * pearson : 截面 Pearson 相关系数
+        * spearman : 截面 Spearman 秩相关系数，组内平均排名后计算 Pearson 相关系数
+        * slope : 截面单变量回归斜率
+    :param kwargs:
+
+        - dt_col: 时间列名，默认为 dt
+        - fit_intercept: method='slope' 时是否拟合截距项，默认为 False
+        - batch_size: 每批计算的因子数量，默认为 32，用于控制内存占用
+        - return_count: 是否同时返回每个截面的有效样本数量，默认为 False
+
+    :return: pd.DataFrame，index 为时间，columns 为因子；return_count=True 时返回 (结果, 样本数量)
+    """
+    dt_col = kwargs.get("dt_col", "dt")
+    batch_size = kwargs.get("batch_size", 32)
+    factors = [factors] if isinstance(factors, str) else list(factors)
+    if method not in ["pearson", "spearman", "slope"]:
+        raise ValueError(f"不支持的计算方法：{method}")
+
+    order, keys, starts, gid = _sectional_groups(df[dt_col])
+    values = np.full((len(factors), len(keys)), np.nan)
+    counts = np.zeros((len(factors), len(keys)))
+    if len(order) > 0:
+        y = df[target].to_numpy(dtype=np.float64)[order]
+        y_rank = {}
+        for i in range(0, len(factors), batch_size):
+            cols = factors[i: i + batch_size]
+            x = np.ascontiguousarray(df[cols].to_numpy(dtype=np.float64)[order].T)
+            if method != "spearman":
+                res, cnt = _sectional_reduce(x, y, starts, kind=method, **kwargs)
+                values[i: i + len(cols)], counts[i: i + len(cols)] = res, cnt
+                continue
+
+            # 排名前先去掉因子或目标为空的样本；样本相同的因子共用目标的排名
+            for j in range(len(cols)):
+                mask = ~np.isnan(x[j]) & ~np.isnan(y)
+                key = mask.tobytes() if not mask.all() else None
+                if key not in y_rank:
+                    y_rank.clear()
+                    y_rank[key] = np.full(len(y), np.nan)
+                    y_rank[key][mask] = _group_rank(y[mask], gid[mask])
+                rx = np.full(len(y), np.nan)
+                rx[mask] = _group_rank(x[j][mask], gid[mask])
+                res, cnt = _sectional_reduce(rx[None, :], y_rank[key], starts, kind="pearson")
+                values[i + j], counts[i + j] = res[0], cnt[0]
+
+    index = pd.Index(keys, name=dt_col)
+    dfv = pd.DataFrame(values.T, index=index, columns=factors)
+    if kwargs.get("return_count", False):
+        return dfv, pd.DataFrame(counts.T.astype(int), index=index, columns=factors)
+    return dfv
+
+
+def _sectional_corr(df, x_col, y_col, method, dt_col):
+    """计算每个截面的相关系数，返回 (Series, 有效样本数量)；kendall 和自定义函数按截面逐个计算"""
+    if method in ["pearson", "spearman"]:
+        dfv, dfn = cross_sectional_stats(df, x_col, y_col, method=method, dt_col=dt_col, return_count=True)
+        return dfv[x_col], dfn[x_col]
+
+    dfs = df[[dt_col, x_col, y_col]].dropna(subset=[dt_col])
+    s = dfs.groupby(dt_col).apply(lambda row: row[x_col].corr(row[y_col], method=method))
+    n = dfs[[x_col, y_col]].notna().all(axis=1).groupby(dfs[dt_col]).sum()
+    return s, n
+
+
 def cross_sectional_ic(df, x_col="open", y_col="n1b", method="spearman", **kwargs):
     """分析 df 中 x_col 和 y_col 列的截面相关性（IC）
 
@@ -108,9 +259,8 @@ def cross_sectional_ic(df, x_col="open", y_col="n1b", method="spearman", **kwarg
     :return：df，res: 前者是每日相关系数结果，后者是每日相关系数的统计结果
     """
     dt_col = kwargs.pop("dt_col", "dt")
-    tqdm.pandas(desc="cross_section_ic")
-    s = df.groupby(dt_col).progress_apply(lambda row: row[x_col].corr(row[y_col], method=method))
-    df = pd.DataFrame(s, columns=["ic"]).reset_index(inplace=False)
+    s, _ = _sectional_corr(df, x_col, y_col, method, dt_col)
+    df = pd.DataFrame({dt_col: s.index, "ic": s.values})
 
     res = {
         "x_col": x_col,
@@ -6,6 +6,7 @@ create_dt: 2022/10/27 23:23
 describe: 用于信号计算函数的各种辅助工具函数
 """
 import numpy as np
+import pandas as pd
 from deprecated import deprecated
 from collections import Counter, OrderedDict
 from typing import List, Any, Dict, Union, Tuple
@@ -23,6 +24,52 @@ def create_single_signal(**kwargs) -> OrderedDict:
     return s
 
 
+def get_signal_columns(df: pd.DataFrame) -> List[str]:
+    """获取信号 DataFrame 中的信号列
+
+    信号列的列名为 k1_k2_k3，取值为 v1_v2_v3_score 格式的字符串（或者已经是分类编码的列）
+
+    :param df: 信号 DataFrame
+    :return: 信号列名列表
+    """
+    cols = []
+    for col in df.columns:
+        if not isinstance(col, str) or len(col.split("_")) != 3:
+            continue
+        ser = df[col]
+        if isinstance(ser.dtype, pd.CategoricalDtype):
+            values = ser.cat.categories
+        elif ser.dtype == object:
+            idx = ser.first_valid_index()
+            values = [] if idx is None else [ser[idx]]
+        else:
+            continue
+        if len(values) and isinstance(values[0], str) and len(values[0].split("_")) == 4:
+            cols.append(col)
+    return cols
+
+
+def compact_signals(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """将信号列转换为分类编码（pandas category / parquet 字典编码）
+
+    信号列的取值种类很少，但每个取值都是较长的中文字符串，按分类编码存储后：
+
+    1. 内存和 parquet 文件的体积都大幅减少，读取速度更快；
+    2. 信号列的 cat.codes 可以直接用于向量化的信号匹配，参见 czsc.traders.vector_backtest.SignalsMatrix；
+    3. 按行读取（to_dict / apply）得到的仍然是原始字符串，Signal.is_match 等逐行逻辑不受影响。
+
+    :param df: 信号 DataFrame
+    :param inplace: 是否直接修改 df
+    :return: 信号列为分类编码的 DataFrame
+    """
+    if not inplace:
+        df = df.copy()
+    for col in get_signal_columns(df):
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
 def is_symmetry_zs(bis: List[BI], th: float = 0.3) -> bool:
     """对称中枢判断：中枢中所有笔的力度序列，标准差小于均值的一定比例
 
@@ -335,34 +382,54 @@ def is_bis_up(bis: List[BI]):
         return False
 
 
+class ZsTracker:
+    """中枢序列的增量识别器
+
+    按笔的顺序逐笔识别中枢：笔向上且高点低于当前中枢的 zd，或笔向下且低点高于当前中枢的 zg 时，
+    以这一笔开始一个新的中枢，否则把这一笔加入当前中枢。
+
+    笔序列只在尾部发生变化（追加、弹出）时，每一笔的计算量为 O(1)，识别结果与 get_zs_seq 一致。
+    """
+
+    def __init__(self, bis: List[BI] = None):
+        self.bis: List[BI] = []
+        self.zs_list: List[ZS] = []
+        self.reset(bis or [])
+
+    def reset(self, bis: List[BI]):
+        """使用新的笔序列重新识别"""
+        self.bis = []
+        self.zs_list = []
+        for bi in bis:
+            self.push(bi)
+
+    def push(self, bi: BI):
+        """在尾部追加一笔"""
+        self.bis.append(bi)
+        zs = self.zs_list[-1] if self.zs_list else None
+        if zs is None or (bi.direction == Direction.Up and bi.high < zs.zd) \
+                or (bi.direction == Direction.Down and bi.low > zs.zg):
+            self.zs_list.append(ZS(bis=[bi]))
+        else:
+            zs.bis.append(bi)
+
+    def truncate(self, n: int):
+        """只保留前 n 笔，从尾部依次弹出被删除的笔"""
+        while len(self.bis) > n:
+            self.bis.pop()
+            zs = self.zs_list[-1]
+            zs.bis.pop()
+            if not zs.bis:
+                self.zs_list.pop()
+
+
 def get_zs_seq(bis: List[BI]) -> List[ZS]:
     """获取连续笔中的中枢序列
 
     :param bis: 连续笔对象列表
     :return: 中枢序列
     """
-    zs_list = []
-    if not bis:
-        return []
-
-    for bi in bis:
-        if not zs_list:
-            zs_list.append(ZS(bis=[bi]))
-            continue
-
-        zs = zs_list[-1]
-        if not zs.bis:
-            zs.bis.append(bi)
-            zs_list[-1] = zs
-        else:
-            if (bi.direction == Direction.Up and bi.high < zs.zd) or (
-                bi.direction == Direction.Down and bi.low > zs.zg
-            ):
-                zs_list.append(ZS(bis=[bi]))
-            else:
-                zs.bis.append(bi)
-                zs_list[-1] = zs
-    return zs_list
+    return ZsTracker(bis).zs_list
 
 
 def cross_zero_axis(n1: Union[List, np.ndarray], n2: Union[List, np.ndarray]) -> int:
@@ -14,6 +14,7 @@ from loguru import logger
 from deprecated import deprecated
 from typing import List, AnyStr
 from concurrent.futures import ProcessPoolExecutor
+from czsc.utils.sig import compact_signals
 
 
 @deprecated(version="1.0.0", reason="分析方法不太合理，不再使用")
@@ -74,7 +75,7 @@ class SignalPerformance:
 
         results = [__static(dfs, "基准")]
 
-        for values, dfg in dfs.groupby(by=keys if len(keys) > 1 else keys[0]):
+        for values, dfg in dfs.groupby(by=keys if len(keys) > 1 else keys[0], observed=True):
             if isinstance(values, str):
                 values = [values]
             assert isinstance(keys, (list, tuple)) and isinstance(values, (list, tuple))
@@ -225,7 +226,8 @@ class SignalAnalyzer:
                         symbols_sig.append(result)
 
         results_path = self.results_path
-        dfs = pd.concat(symbols_sig, ignore_index=True)
+        # 不同品种的分类编码不一致，合并后重新编码
+        dfs = compact_signals(pd.concat(symbols_sig, ignore_index=True), inplace=True)
 
         sig_keys = [x for x in dfs.columns if len(x.split("_")) == 3]
         sps = {"向后看截面": [], "向后看时序": []}
@@ -8,7 +8,6 @@ describe: 绩效表现统计
 import numpy as np
 import pandas as pd
 from deprecated import deprecated
-from collections import Counter
 
 
 def cal_break_even_point(seq) -> float:
@@ -63,6 +62,13 @@ def subtract_fee(df, fee=1):
     return df
 
 
+def _max_run_length(seq: np.ndarray) -> int:
+    """非递减序列中相同取值的最大连续个数，即最大新高间隔"""
+    change = np.flatnonzero(seq[1:] != seq[:-1]) + 1
+    bounds = np.concatenate([[0], change, [len(seq)]])
+    return int(np.diff(bounds).max())
+
+
 def daily_performance(daily_returns, **kwargs):
     """采用单利计算日收益数据的各项指标
 
@@ -92,7 +98,7 @@ def daily_performance(daily_returns, **kwargs):
     daily_returns = np.array(daily_returns, dtype=np.float64)
     yearly_days = kwargs.get("yearly_days", 252)
 
-    if len(daily_returns) == 0 or np.std(daily_returns) == 0 or all(x == 0 for x in daily_returns):
+    if len(daily_returns) == 0 or np.std(daily_returns) == 0 or not np.any(daily_returns):
         return {
             "绝对收益": 0,
             "年化": 0,
@@ -119,10 +125,10 @@ def daily_performance(daily_returns, **kwargs):
     none_zero_cover = len(daily_returns[daily_returns != 0]) / len(daily_returns)
 
     # 计算最大新高间隔
-    max_interval = Counter(np.maximum.accumulate(cum_returns).tolist()).most_common(1)[0][1]
+    max_interval = _max_run_length(np.maximum.accumulate(cum_returns))
 
     # 计算新高时间占比
-    high_pct = len([i for i, x in enumerate(dd) if x == 0]) / len(dd)
+    high_pct = np.count_nonzero(dd == 0) / len(dd)
 
     def __min_max(x, min_val, max_val, digits=4):
         if x < min_val:
@@ -182,6 +188,134 @@ def rolling_daily_performance(df: pd.DataFrame, ret_col, window=252, min_periods
     return dfr
 
 
+def _daily_performance_rows(x: np.ndarray, lengths: np.ndarray, yearly_days=252) -> pd.DataFrame:
+    """按行计算日收益指标，每行的有效数据在左侧，长度为 lengths，右侧用0填充
+
+    没有填充的行，结果与 daily_performance 逐个计算的结果完全一致
+    """
+    k, m = x.shape
+    lengths = np.asarray(lengths, dtype=np.int64)
+    mask = np.arange(m)[None, :] < lengths[:, None]
+    n = np.maximum(lengths, 1).astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total = np.sum(x, axis=1)
+        mean = total / n
+        std = np.sqrt(np.sum(((x - mean[:, None]) ** 2) * mask, axis=1) / n)
+        valid = (lengths > 0) & (std != 0) & np.any(x != 0, axis=1)
+
+        annual_returns = total / n * yearly_days
+        sharpe_ratio = mean / std * np.sqrt(yearly_days)
+        cum = np.cumsum(x, axis=1)
+        cum_max = np.maximum.accumulate(cum, axis=1)
+        dd = cum_max - cum
+        max_drawdown = np.max(dd, axis=1)
+        kama = np.where(max_drawdown != 0, annual_returns / max_drawdown, 10)
+        win_pct = np.count_nonzero((x >= 0) & mask, axis=1) / n
+        annual_volatility = std * np.sqrt(yearly_days)
+        none_zero_cover = np.count_nonzero((x != 0) & mask, axis=1) / n
+        high_pct = np.count_nonzero((dd == 0) & mask, axis=1) / n
+        dd_risk = max_drawdown / annual_volatility
+
+    # 最大新高间隔：累计收益最高值相同的最大连续个数
+    run_id = np.zeros((k, m), dtype=np.int64)
+    if m > 1:
+        run_id[:, 1:] = np.cumsum(cum_max[:, 1:] != cum_max[:, :-1], axis=1)
+    run_count = np.bincount((np.arange(k)[:, None] * m + run_id)[mask], minlength=k * m).reshape(k, m)
+    max_interval = run_count.max(axis=1)
+
+    # 盈亏平衡点，与 cal_break_even_point 一致
+    last = cum[np.arange(k), np.maximum(lengths - 1, 0)]
+    sorted_cum = np.cumsum(np.sort(np.where(mask, x, np.inf), axis=1), axis=1)
+    bep = np.where(last < 0, 1.0, (np.count_nonzero(sorted_cum < 0, axis=1) + 1) / n)
+
+    def __py_round(arr, digits=4):
+        # daily_performance 中这几项是 Python float，使用内置 round 保证舍入结果一致
+        return [round(v, digits) for v in arr.tolist()]
+
+    dfr = pd.DataFrame({
+        "绝对收益": np.round(total, 4),
+        "年化": np.round(annual_returns, 4),
+        "夏普": np.round(np.clip(sharpe_ratio, -5, 5), 2),
+        "最大回撤": np.round(max_drawdown, 4),
+        "卡玛": np.round(np.clip(kama, -10, 10), 2),
+        "日胜率": __py_round(win_pct, 4),
+        "年化波动率": np.round(annual_volatility, 4),
+        "非零覆盖": __py_round(none_zero_cover, 4),
+        "盈亏平衡点": np.round(bep, 4),
+        "新高间隔": max_interval,
+        "新高占比": __py_round(high_pct, 4),
+        "回撤风险": np.round(dd_risk, 4),
+    })
+    dfr[~valid] = 0
+    return dfr
+
+
+def daily_performance_matrix(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    """按列批量计算日收益数据的各项指标
+
+    每一列的结果与 daily_performance(df[col]) 一致，所有列一次性使用 NumPy 计算，适合大量策略、品种的日收益评估。
+
+    :param df: pd.DataFrame, 日收益数据，index 为日期，每列为一个策略/品种的日收益，缺失值按0处理
+    :param kwargs: 其他参数
+
+        - yearly_days: int, 252, 一年的交易日数
+
+    :return: pd.DataFrame, index 为 df 的列名，columns 为 daily_performance 的各项指标
+    """
+    x = np.ascontiguousarray(df.fillna(0).to_numpy(dtype=np.float64).T)
+    lengths = np.full(x.shape[0], x.shape[1], dtype=np.int64)
+    dfr = _daily_performance_rows(x, lengths, yearly_days=kwargs.get("yearly_days", 252))
+    dfr.index = df.columns
+    return dfr
+
+
+def rolling_daily_performance_fast(df: pd.DataFrame, ret_col, window=252, min_periods=100, **kwargs):
+    """计算滚动日收益，rolling_daily_performance 的向量化实现
+
+    所有滚动窗口一次性排列成矩阵计算，结果与 rolling_daily_performance 一致（末位小数可能存在舍入差异），不会修改传入的 df。
+
+    :param df: pd.DataFrame, 日收益数据，columns=['dt', ret_col]，或者 index 为 datetime64[ns] 类型
+    :param ret_col: str, 收益列名
+    :param window: int, 滚动窗口, 自然天数
+    :param min_periods: int, 最小样本数
+    :param kwargs: 其他参数
+
+        - yearly_days: int, 252, 一年的交易日数
+        - batch_size: int, 每次计算的窗口数量，默认 2000，用于控制内存占用
+    """
+    if not df.index.dtype == "datetime64[ns]":
+        df = df.set_index(pd.to_datetime(df["dt"]))
+    assert df.index.dtype == "datetime64[ns]", "index必须是datetime64[ns]类型, 请先使用 pd.to_datetime 进行转换"
+
+    ser = df[ret_col].fillna(0).sort_index(ascending=True)
+    values = ser.to_numpy(dtype=np.float64)
+    dts = ser.index
+    edts = dts[min_periods:]
+    if len(edts) == 0:
+        return pd.DataFrame()
+
+    sdts = edts - pd.Timedelta(days=window)
+    starts = dts.searchsorted(sdts, side="left")
+    ends = dts.searchsorted(edts, side="right")
+    lengths = ends - starts
+
+    res = []
+    batch_size = kwargs.get("batch_size", 2000)
+    for i in range(0, len(edts), batch_size):
+        _starts, _lengths = starts[i: i + batch_size], lengths[i: i + batch_size]
+        offsets = np.arange(_lengths.max())
+        idx = _starts[:, None] + offsets[None, :]
+        mask = offsets[None, :] < _lengths[:, None]
+        x = np.where(mask, values[np.minimum(idx, len(values) - 1)], 0.0)
+        res.append(_daily_performance_rows(x, _lengths, yearly_days=kwargs.get("yearly_days", 252)))
+
+    dfr = pd.concat(res, ignore_index=True)
+    dfr["sdt"] = sdts
+    dfr["edt"] = edts
+    return dfr
+
+
 @deprecated(version="1.0.0", reason="请使用 daily_performance；调整 yearly_days 参数 52 即可")
 def weekly_performance(weekly_returns):
     """采用单利计算周收益数据的各项指标
@@ -321,34 +455,47 @@ def net_value_stats(nv: pd.DataFrame, exclude_zero: bool = False, sub_cost=True)
     return res
 
 
-def evaluate_pairs(pairs: pd.DataFrame, trade_dir: str = "多空") -> dict:
-    """评估开平交易记录的表现
+def _seq_sum(arr: np.ndarray):
+    """按顺序逐个累加，与 Python 内置 sum 的结果完全一致（np.sum 使用分块累加，末位可能不同）"""
+    return np.cumsum(arr)[-1].item() if len(arr) > 0 else 0
 
-    :param pairs: 开平交易记录，数据样例如下：
 
-        ==========  ==========  ===================  ===================  ==========  ==========  ===========  ============  ==========  ==========
-        标的代码     交易方向     开仓时间              平仓时间              开仓价格    平仓价格     持仓K线数    事件序列        持仓天数     盈亏比例
-        ==========  ==========  ===================  ===================  ==========  ==========  ===========  ============  ==========  ==========
-        DLi9001     多头        2019-02-25 21:36:00  2019-02-25 21:51:00     1147.8      1150.72           16  开多 -> 平多           0       25.47
-        DLi9001     多头        2021-09-15 14:06:00  2021-09-15 14:09:00     3155.88     3153.61            4  开多 -> 平多           0       -7.22
-        DLi9001     多头        2019-08-29 21:01:00  2019-08-29 22:54:00     1445.86     1454.55          114  开多 -> 平多           0       60.09
-        DLi9001     多头        2021-10-11 21:46:00  2021-10-11 22:11:00     3631.77     3622.66           26  开多 -> 平多           0      -25.08
-        DLi9001     多头        2020-05-13 09:16:00  2020-05-13 09:26:00     1913.13     1917.64           11  开多 -> 平多           0       23.55
-        ==========  ==========  ===================  ===================  ==========  ==========  ===========  ============  ==========  ==========
+def _pairs_break_even_point(ret: np.ndarray, counts: np.ndarray = None) -> float:
+    """与 czsc.objects.cal_break_even_point 一致的向量化实现
 
-    :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
-    :return: 交易表现
+    :param ret: 每笔交易的盈亏比例
+    :param counts: 每笔交易的配对数量，结果与按数量展开成多笔交易一致；None 表示每笔交易数量为 1
     """
-    from czsc.objects import cal_break_even_point
+    if counts is None:
+        if len(ret) == 0 or _seq_sum(ret) < 0:
+            return 1.0
+        cum = np.cumsum(np.sort(ret))
+        hit = np.flatnonzero(cum >= 0)
+        return (hit[0] + 1 if len(hit) > 0 else len(ret)) / len(ret)
+
+    n = int(counts.sum())
+    if n == 0 or _seq_sum(ret * counts) < 0:
+        return 1.0
+    order = np.argsort(ret, kind="mergesort")
+    ret, counts = ret[order], counts[order]
+    cum = np.cumsum(ret * counts)
+    hit = np.flatnonzero(cum >= 0)
+    if len(hit) == 0:
+        return 1.0
+
+    # 在第 k 笔交易内部逐个单位累加，找到累计收益首次大于等于 0 的位置
+    k = hit[0]
+    start = cum[k] - ret[k] * counts[k]
+    j = 1 if start >= 0 or ret[k] <= 0 else min(int(counts[k]), max(1, int(np.ceil(-start / ret[k]))))
+    return (int(counts[:k].sum()) + j) / n
 
-    assert trade_dir in [
-        "多头",
-        "空头",
-        "多空",
-    ], "trade_dir 参数错误，可选值 ['多头', '空头', '多空']"
 
-    pairs = pairs.copy()
+def _evaluate_pairs_arrays(ret: np.ndarray, days: np.ndarray, bars: np.ndarray, trade_dir: str = "多空",
+                           counts: np.ndarray = None) -> dict:
+    """基于 盈亏比例、持仓天数、持仓K线数 数组评估交易表现，结果与 evaluate_pairs 一致
 
+    counts 为每笔交易的配对数量，次数、均值按数量加权，与按数量展开成多笔交易的结果一致；None 表示每笔交易数量为 1
+    """
     p = {
         "交易方向": trade_dir,
         "交易次数": 0,
@@ -367,34 +514,33 @@ def evaluate_pairs(pairs: pd.DataFrame, trade_dir: str = "多空") -> dict:
         "持仓天数": 0,
         "持仓K线数": 0,
     }
-
-    if len(pairs) == 0:
+    if counts is not None:
+        counts = np.asarray(counts, dtype=np.int64)
+    w = 1 if counts is None else counts
+    n = len(ret) if counts is None else int(counts.sum())
+    if n == 0:
         return p
 
-    if trade_dir in ["多头", "空头"]:
-        pairs = pairs[pairs["交易方向"] == trade_dir]
-        if len(pairs) == 0:
-            return p
-
-    pairs = pairs.to_dict(orient="records")
-    p["交易次数"] = len(pairs)
-    p["盈亏平衡点"] = round(cal_break_even_point([x["盈亏比例"] for x in pairs]), 4)
-    p["累计收益"] = round(sum([x["盈亏比例"] for x in pairs]), 2)
+    p["交易次数"] = n
+    p["盈亏平衡点"] = round(_pairs_break_even_point(ret, counts), 4)
+    p["累计收益"] = round(_seq_sum(ret * w), 2)
     p["单笔收益"] = round(p["累计收益"] / p["交易次数"], 2)
-    p["持仓天数"] = round(sum([x["持仓天数"] for x in pairs]) / len(pairs), 2)
-    p["持仓K线数"] = round(sum([x["持仓K线数"] for x in pairs]) / len(pairs), 2)
-
-    win_ = [x for x in pairs if x["盈亏比例"] >= 0]
-    if len(win_) > 0:
-        p["盈利次数"] = len(win_)
-        p["累计盈利"] = sum([x["盈亏比例"] for x in win_])
+    p["持仓天数"] = round(_seq_sum(days * w) / n, 2)
+    p["持仓K线数"] = round(_seq_sum(bars * w) / n, 2)
+
+    win_mask = ret >= 0
+    n_win = int((win_mask * w).sum())
+    if n_win > 0:
+        p["盈利次数"] = n_win
+        p["累计盈利"] = _seq_sum((ret * w)[win_mask])
         p["单笔盈利"] = round(p["累计盈利"] / p["盈利次数"], 4)
         p["交易胜率"] = round(p["盈利次数"] / p["交易次数"], 4)
 
-    loss_ = [x for x in pairs if x["盈亏比例"] < 0]
-    if len(loss_) > 0:
-        p["亏损次数"] = len(loss_)
-        p["累计亏损"] = sum([x["盈亏比例"] for x in loss_])
+    loss_mask = ret < 0
+    n_loss = int((loss_mask * w).sum())
+    if n_loss > 0:
+        p["亏损次数"] = n_loss
+        p["累计亏损"] = _seq_sum((ret * w)[loss_mask])
         p["单笔亏损"] = round(p["累计亏损"] / p["亏损次数"], 4)
 
         p["累计盈亏比"] = round(p["累计盈利"] / abs(p["累计亏损"]), 4)
@@ -403,6 +549,181 @@ def evaluate_pairs(pairs: pd.DataFrame, trade_dir: str = "多空") -> dict:
     return p
 
 
+def evaluate_pairs(pairs: pd.DataFrame, trade_dir: str = "多空") -> dict:
+    """评估开平交易记录的表现
+
+    :param pairs: 开平交易记录，数据样例如下：
+
+        ==========  ==========  ===================  ===================  ==========  ==========  ===========  ============  ==========  ==========
+        标的代码     交易方向     开仓时间              平仓时间              开仓价格    平仓价格     持仓K线数    事件序列        持仓天数     盈亏比例
+        ==========  ==========  ===================  ===================  ==========  ==========  ===========  ============  ==========  ==========
+        DLi9001     多头        2019-02-25 21:36:00  2019-02-25 21:51:00     1147.8      1150.72           16  开多 -> 平多           0       25.47
+        DLi9001     多头        2021-09-15 14:06:00  2021-09-15 14:09:00     3155.88     3153.61            4  开多 -> 平多           0       -7.22
+        DLi9001     多头        2019-08-29 21:01:00  2019-08-29 22:54:00     1445.86     1454.55          114  开多 -> 平多           0       60.09
+        DLi9001     多头        2021-10-11 21:46:00  2021-10-11 22:11:00     3631.77     3622.66           26  开多 -> 平多           0      -25.08
+        DLi9001     多头        2020-05-13 09:16:00  2020-05-13 09:26:00     1913.13     1917.64           11  开多 -> 平多           0       23.55
+        ==========  ==========  ===================  ===================  ==========  ==========  ===========  ============  ==========  ==========
+
+        包含 配对数量 列时（如 WeightBacktest 的开平交易记录），每条记录代表 配对数量 笔相同的交易，统计结果按数量加权
+
+    :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
+    :return: 交易表现
+    """
+    assert trade_dir in [
+        "多头",
+        "空头",
+        "多空",
+    ], "trade_dir 参数错误，可选值 ['多头', '空头', '多空']"
+
+    if len(pairs) > 0 and trade_dir in ["多头", "空头"]:
+        pairs = pairs[pairs["交易方向"] == trade_dir]
+
+    if len(pairs) == 0:
+        return _evaluate_pairs_arrays(np.array([]), np.array([]), np.array([]), trade_dir)
+
+    counts = pairs["配对数量"].to_numpy() if "配对数量" in pairs.columns else None
+    return _evaluate_pairs_arrays(pairs["盈亏比例"].to_numpy(), pairs["持仓天数"].to_numpy(),
+                                  pairs["持仓K线数"].to_numpy(), trade_dir, counts)
+
+
+def evaluate_pairs_batch(pairs: pd.DataFrame, by="策略标记", trade_dir: str = "多空") -> pd.DataFrame:
+    """按 by 列分组，批量评估多组开平交易记录的表现
+
+    每组的结果与 evaluate_pairs(组内交易记录, trade_dir) 完全一致；只排序和切分一次，适合参数优化中大量仓位的评估。
+
+    :param pairs: 开平交易记录，格式参见 evaluate_pairs，需要包含 by 列
+    :param by: 分组列名，或者分组列名列表
+    :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
+    :return: pd.DataFrame，每组一行，前几列为分组列（与结果同名时以分组值为准），其余列与 evaluate_pairs 的结果一致
+    """
+    assert trade_dir in ["多头", "空头", "多空"], "trade_dir 参数错误，可选值 ['多头', '空头', '多空']"
+    by = [by] if isinstance(by, str) else list(by)
+    if len(pairs) == 0:
+        return pd.DataFrame(columns=by + list(_evaluate_pairs_arrays(np.array([]), None, None, trade_dir).keys()))
+
+    codes, uniques = pd.MultiIndex.from_frame(pairs[by]).factorize()
+    order = np.argsort(codes, kind="mergesort")
+    codes = codes[order]
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(codes)]])
+
+    ret = pairs["盈亏比例"].to_numpy()[order]
+    days = pairs["持仓天数"].to_numpy()[order]
+    bars = pairs["持仓K线数"].to_numpy()[order]
+    counts = pairs["配对数量"].to_numpy()[order] if "配对数量" in pairs.columns else None
+    if trade_dir != "多空":
+        keep = pairs["交易方向"].to_numpy()[order] == trade_dir
+    else:
+        keep = np.ones(len(ret), dtype=bool)
+
+    rows = []
+    for code, i, j in zip(codes[starts], starts, ends):
+        m = keep[i:j]
+        cnt = counts[i:j][m] if counts is not None else None
+        row = _evaluate_pairs_arrays(ret[i:j][m], days[i:j][m], bars[i:j][m], trade_dir, cnt)
+        row.update(zip(by, uniques[code]))
+        rows.append(row)
+    dfr = pd.DataFrame(rows)
+    return dfr[by + [x for x in dfr.columns if x not in by]]
+
+
+def _evaluate_holds_arrays(dt, pos: np.ndarray, price: np.ndarray, trade_dir: str = "多空") -> dict:
+    """基于持仓时间、持仓方向、价格数组评估交易表现，结果与 Position.evaluate_holds 一致
+
+    :param dt: 持仓时间序列，pd.DatetimeIndex 或者可以被 pd.to_datetime 转换的序列
+    :param pos: 持仓方向，1 多头，-1 空头，0 空仓
+    :param price: 价格序列
+    :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
+    :return: 交易表现
+    """
+    pos = np.asarray(pos)
+    if trade_dir != "多空":
+        _OD = 1 if trade_dir == "多头" else -1
+        pos = np.where((pos != 0) & (pos != _OD), 0, pos)
+
+    p = {
+        "交易方向": trade_dir,
+        "开始时间": "",
+        "结束时间": "",
+        "覆盖率": 0,
+        "夏普": 0,
+        "卡玛": 0,
+        "最大回撤": 0,
+        "年化收益": 0,
+        "日胜率": 0,
+    }
+    n = len(pos)
+    if n == 0 or not pos.any():
+        return p
+
+    dt = pd.DatetimeIndex(pd.to_datetime(dt))
+    price = np.asarray(price, dtype=float)
+    n1b = np.full(n, np.nan)
+    n1b[:-1] = (price[1:] - price[:-1]) / price[:-1]
+    edge = pd.Series(n1b * pos)  # 持有下一根K线的边际收益
+
+    # 按日期聚合
+    dfv = edge.groupby(dt.normalize()).sum()
+    dfv = dfv.cumsum()
+
+    yearly_n = 252
+    yearly_ret = dfv.iloc[-1] * (yearly_n / len(dfv))
+    diff = dfv.diff()
+    sharp = diff.mean() / diff.std() * pow(yearly_n, 0.5) if diff.std() != 0 else 0
+    df0 = dfv.shift(1).ffill().fillna(0)
+    mdd = (1 - (df0 + 1) / (df0 + 1).cummax()).max()
+    calmar = yearly_ret / mdd if mdd != 0 else 1
+
+    p.update(
+        {
+            "开始时间": dt[0].strftime("%Y-%m-%d"),
+            "结束时间": dt[-1].strftime("%Y-%m-%d"),
+            "覆盖率": round(int((pos != 0).sum()) / n, 4),
+            "夏普": round(sharp, 4),
+            "卡玛": round(calmar, 4),
+            "最大回撤": round(mdd, 4),
+            "年化收益": round(yearly_ret, 4),
+            "日胜率": round(int((dfv > 0).sum()) / len(dfv), 4),
+        }
+    )
+    return p
+
+
+def evaluate_holds_batch(holds: pd.DataFrame, by="策略标记", trade_dir: str = "多空") -> pd.DataFrame:
+    """按 by 列分组，批量评估多组持仓记录的表现
+
+    每组的结果与对应 Position.evaluate_holds(trade_dir) 一致（不包含 交易标的、策略标记 两项）。
+
+    :param holds: 持仓记录，必需包含 by, dt, pos, price 列，组内按 dt 升序排列
+    :param by: 分组列名，或者分组列名列表
+    :param trade_dir: 交易方向，可选值 ['多头', '空头', '多空']
+    :return: pd.DataFrame，每组一行
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    if len(holds) == 0:
+        return pd.DataFrame(columns=by + list(_evaluate_holds_arrays([], [], [], trade_dir).keys()))
+
+    codes, uniques = pd.MultiIndex.from_frame(holds[by]).factorize()
+    order = np.argsort(codes, kind="mergesort")
+    codes = codes[order]
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(codes)]])
+
+    dt = pd.DatetimeIndex(pd.to_datetime(holds["dt"]))[order]
+    pos = holds["pos"].to_numpy()[order]
+    price = holds["price"].to_numpy()[order]
+
+    rows = []
+    for code, i, j in zip(codes[starts], starts, ends):
+        row = _evaluate_holds_arrays(dt[i:j], pos[i:j], price[i:j], trade_dir)
+        row.update(zip(by, uniques[code]))
+        rows.append(row)
+    dfr = pd.DataFrame(rows)
+    return dfr[by + [x for x in dfr.columns if x not in by]]
+
+
 def holds_performance(df, **kwargs):
     """组合持仓权重表现
 
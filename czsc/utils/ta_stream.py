@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/5 21:30
+describe: 流式技术指标，逐根K线增量更新，用于替代 update_xxx_cache 中每根K线的窗口重算
+
+计算逻辑与 ta-lib（MA/BBANDS/STOCH/RSI/CCI/ATR）、czsc.utils.ta.MACD 保持一致：从第一根K线开始逐根递推，
+输出与在同一段K线序列上一次性调用对应函数的结果相同（部分指标存在 1e-8 以内的浮点误差）。
+"""
+import numpy as np
+from typing import Callable, List, Tuple
+
+
+class StreamIndicator:
+    """流式指标基类
+
+    1. 每根K线只执行一次递推，状态中只保存标量，窗口数据从输入序列中读取；
+    2. 同一根K线（dt 相同）多次更新时，先回退到上一根K线处理完后的状态，再重新计算；
+    3. 输入和输出按列保存在 NumPy 数组中，通过 values 获取最近的数据视图，最多保留 2 * maxlen 个值；
+       maxlen 默认由 window 确定，只保留递推需要回看的数据，需要读取更多历史输出时显式指定。
+    """
+
+    inputs = ("close",)
+    outputs = ("value",)
+
+    def __init__(self, window: int, maxlen: int = 0):
+        """
+
+        :param window: 计算时需要回看的K线数量
+        :param maxlen: 最少保留的历史数据数量，不足 window + 2 时按 window + 2 保留
+        """
+        self.maxlen = max(int(maxlen), int(window) + 2)
+        self.dt = None  # 最后一次更新的K线时间
+        self.count = 0  # 已经处理的K线数量
+        self._state = self._init_state()
+        self._prev = self._state
+        self._tail = 0
+        self._buf = {k: np.full(self.maxlen * 2, np.nan) for k in self.inputs + self.outputs}
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}~{self.count}~{self.dt}>"
+
+    def _init_state(self) -> tuple:
+        raise NotImplementedError
+
+    def _step(self, state: tuple, i: int, n: int) -> Tuple[tuple, tuple]:
+        """执行一次递推
+
+        :param state: 上一根K线处理完后的状态
+        :param i: 当前K线在数组中的位置
+        :param n: 当前K线的序号，从 0 开始
+        :return: 新的状态，当前K线的输出
+        """
+        raise NotImplementedError
+
+    def update(self, bar) -> tuple:
+        """输入一根K线，返回当前K线的指标值；bar 只需要有 dt 和 inputs 中的属性"""
+        if self.dt is not None and bar.dt == self.dt:
+            self._state = self._prev
+        else:
+            if self._tail == len(self._buf[self.outputs[0]]):
+                # 空间不足时，只保留最近 maxlen 个值
+                for v in self._buf.values():
+                    v[: self.maxlen] = v[self._tail - self.maxlen : self._tail]
+                    v[self.maxlen :] = np.nan
+                self._tail = self.maxlen
+            self._prev = self._state
+            self._tail += 1
+            self.count += 1
+
+        self.dt = bar.dt
+        i = self._tail - 1
+        for k in self.inputs:
+            self._buf[k][i] = getattr(bar, k)
+        self._state, out = self._step(self._prev, i, self.count - 1)
+        for k, v in zip(self.outputs, out):
+            self._buf[k][i] = v
+        return out
+
+    def values(self, name: str) -> np.ndarray:
+        """最近的输入/输出序列，最后一个值对应最后一次更新的K线"""
+        return self._buf[name][: self._tail]
+
+    def value(self, name: str, i: int = -1) -> float:
+        return float(self._buf[name][self._tail + i])
+
+
+def _sma_step(total: float, x: float, old: float, n: int, timeperiod: int) -> Tuple[float, float]:
+    """ta-lib SMA 的递推：total 为最近 timeperiod - 1 个值的和，old 为移出窗口的值
+
+    :return: 新的 total，当前值的均线（不足 timeperiod 个值时为 nan）
+    """
+    t = total + x
+    if n + 1 < timeperiod:
+        return t, np.nan
+    return t - old, t / timeperiod
+
+
+class StreamSMA(StreamIndicator):
+    """简单移动平均，与 ta.MA(close, timeperiod, matype=SMA) 一致"""
+
+    outputs = ("ma",)
+
+    def __init__(self, timeperiod: int, maxlen: int = 0):
+        self.timeperiod = int(timeperiod)
+        super().__init__(window=self.timeperiod, maxlen=maxlen)
+
+    def _init_state(self):
+        return (0.0,)
+
+    def _step(self, state, i, n):
+        N = self.timeperiod
+        x = self._buf["close"][i]
+        old = self._buf["close"][i - N + 1] if n + 1 >= N else 0.0
+        total, ma = _sma_step(state[0], x, old, n, N)
+        return (total,), (ma,)
+
+
+class StreamEMA(StreamIndicator):
+    """指数移动平均，与 ta.MA(close, timeperiod, matype=EMA) 一致，前 timeperiod 个值的均值作为初始值"""
+
+    outputs = ("ma",)
+
+    def __init__(self, timeperiod: int, maxlen: int = 0):
+        self.timeperiod = int(timeperiod)
+        self.k = 2.0 / (self.timeperiod + 1)
+        super().__init__(window=1, maxlen=maxlen)
+
+    def _init_state(self):
+        return 0.0, np.nan
+
+    def _step(self, state, i, n):
+        N = self.timeperiod
+        x = self._buf["close"][i]
+        total, ema = state
+        if n + 1 < N:
+            return (total + x, np.nan), (np.nan,)
+        if n + 1 == N:
+            ema = (total + x) / N
+        else:
+            ema = ((x - ema) * self.k) + ema
+        return (total, ema), (ema,)
+
+
+class StreamMACD(StreamIndicator):
+    """MACD，与 czsc.utils.ta.MACD 一致：EMA 以第一个值作为初始值，结果保留4位小数"""
+
+    outputs = ("dif", "dea", "macd")
+
+    def __init__(self, fastperiod=12, slowperiod=26, signalperiod=9, maxlen: int = 0):
+        self.fastperiod = int(fastperiod)
+        self.slowperiod = int(slowperiod)
+        self.signalperiod = int(signalperiod)
+        super().__init__(window=1, maxlen=maxlen)
+
+    def _init_state(self):
+        return np.nan, np.nan, np.nan
+
+    def _step(self, state, i, n):
+        x = self._buf["close"][i]
+        fast, slow, dea = state
+        if n == 0:
+            fast = slow = x
+        else:
+            fast = (2 * x + fast * (self.fastperiod - 1)) / (self.fastperiod + 1)
+            slow = (2 * x + slow * (self.slowperiod - 1)) / (self.slowperiod + 1)
+
+        diff = np.round(fast, 4) - np.round(slow, 4)
+        if n == 0:
+            dea = diff
+        else:
+            dea = (2 * diff + dea * (self.signalperiod - 1)) / (self.signalperiod + 1)
+        dea_ = np.round(dea, 4)
+        return (fast, slow, dea), (np.round(diff, 4), dea_, np.round((diff - dea_) * 2, 4))
+
+
+class StreamBOLL(StreamIndicator):
+    """布林线的中轨和标准差，与 ta.BBANDS(close, timeperiod, matype=SMA) 一致
+
+    上轨 = mid + std * nbdev，下轨 = mid - std * nbdev，使用 bands 计算
+    """
+
+    outputs = ("mid", "std")
+
+    def __init__(self, timeperiod: int = 20, maxlen: int = 0):
+        self.timeperiod = int(timeperiod)
+        super().__init__(window=self.timeperiod, maxlen=maxlen)
+
+    def _init_state(self):
+        return 0.0, 0.0
+
+    def _step(self, state, i, n):
+        N = self.timeperiod
+        close = self._buf["close"]
+        x = close[i]
+        old = close[i - N + 1] if n + 1 >= N else 0.0
+        total, mid = _sma_step(state[0], x, old, n, N)
+
+        total2 = state[1] + x * x
+        if n + 1 < N:
+            return (total, total2), (np.nan, np.nan)
+
+        mean2 = total2 / N - mid * mid
+        std = np.sqrt(mean2) if mean2 >= 0.00000001 else 0.0
+        return (total, total2 - old * old), (mid, std)
+
+    @staticmethod
+    def bands(mid: float, std: float, nbdev: float) -> Tuple[float, float, float]:
+        """计算上轨、中轨、下轨"""
+        if nbdev == 1.0:
+            return mid + std, mid, mid - std
+        dev = std * nbdev
+        return mid + dev, mid, mid - dev
+
+
+class StreamKDJ(StreamIndicator):
+    """KDJ，与 ta.STOCH(high, low, close, fastk_period, slowk_period, slowd_period) 一致，J = 3K - 2D"""
+
+    inputs = ("high", "low", "close")
+    outputs = ("fastk", "slowk", "k", "d", "j")
+
+    def __init__(self, fastk_period=9, slowk_period=3, slowd_period=3, maxlen: int = 0):
+        self.fastk_period = int(fastk_period)
+        self.slowk_period = int(slowk_period)
+        self.slowd_period = int(slowd_period)
+        super().__init__(window=self.fastk_period + self.slowk_period + self.slowd_period, maxlen=maxlen)
+
+    def _init_state(self):
+        return 0.0, 0.0
+
+    def _step(self, state, i, n):
+        fk, sk, sd = self.fastk_period, self.slowk_period, self.slowd_period
+        nan5 = (np.nan,) * 5
+        if n + 1 < fk:
+            return state, nan5
+
+        hh = self._buf["high"][i - fk + 1 : i + 1].max()
+        ll = self._buf["low"][i - fk + 1 : i + 1].min()
+        diff = (hh - ll) / 100.0
+        fastk = (self._buf["close"][i] - ll) / diff if diff != 0.0 else 0.0
+
+        # 快速K线的 SMA 得到 slowk，slowk 的 SMA 得到 slowd
+        self._buf["fastk"][i] = fastk
+        n1 = n - fk + 1
+        old = self._buf["fastk"][i - sk + 1] if n1 + 1 >= sk else 0.0
+        total_k, slowk = _sma_step(state[0], fastk, old, n1, sk)
+        if n1 + 1 < sk:
+            return (total_k, state[1]), (fastk, slowk, np.nan, np.nan, np.nan)
+
+        self._buf["slowk"][i] = slowk
+        n2 = n1 - sk + 1
+        old = self._buf["slowk"][i - sd + 1] if n2 + 1 >= sd else 0.0
+        total_d, slowd = _sma_step(state[1], slowk, old, n2, sd)
+        if n2 + 1 < sd:
+            return (total_k, total_d), (fastk, slowk, np.nan, np.nan, np.nan)
+        return (total_k, total_d), (fastk, slowk, slowk, slowd, 3 * slowk - 2 * slowd)
+
+
+class StreamRSI(StreamIndicator):
+    """RSI，与 ta.RSI(close, timeperiod) 一致，使用 Wilder 平滑"""
+
+    outputs = ("rsi",)
+
+    def __init__(self, timeperiod: int = 14, maxlen: int = 0):
+        self.timeperiod = int(timeperiod)
+        super().__init__(window=1, maxlen=maxlen)
+
+    def _init_state(self):
+        return np.nan, 0.0, 0.0
+
+    def _step(self, state, i, n):
+        N = self.timeperiod
+        x = self._buf["close"][i]
+        prev, gain, loss = state
+        if n == 0:
+            return (x, gain, loss), (np.nan,)
+
+        change = x - prev
+        if n > N:
+            loss *= N - 1
+            gain *= N - 1
+        if change < 0:
+            loss -= change
+        else:
+            gain += change
+        if n < N:
+            return (x, gain, loss), (np.nan,)
+
+        loss /= N
+        gain /= N
+        total = gain + loss
+        rsi = 100.0 * (gain / total) if not -0.00000001 < total < 0.00000001 else 0.0
+        return (x, gain, loss), (rsi,)
+
+
+class StreamCCI(StreamIndicator):
+    """CCI，与 ta.CCI(high, low, close, timeperiod) 一致；平均绝对偏差无法递推，每根K线的计算量为 O(timeperiod)"""
+
+    inputs = ("high", "low", "close")
+    outputs = ("tp", "cci")
+
+    def __init__(self, timeperiod: int = 14, maxlen: int = 0):
+        self.timeperiod = int(timeperiod)
+        super().__init__(window=self.timeperiod, maxlen=maxlen)
+
+    def _init_state(self):
+        return ()
+
+    def _step(self, state, i, n):
+        N = self.timeperiod
+        tp = (self._buf["high"][i] + self._buf["low"][i] + self._buf["close"][i]) / 3.0
+        if n + 1 < N:
+            return state, (tp, np.nan)
+
+        # 按 ta-lib 环形缓冲区的顺序求和，保证浮点计算结果一致
+        self._buf["tp"][i] = tp
+        seq = self._buf["tp"][i - (n - np.arange(N)) % N].tolist()
+        avg = 0.0
+        for v in seq:
+            avg += v
+        avg /= N
+        md = 0.0
+        for v in seq:
+            md += abs(v - avg)
+
+        diff = tp - avg
+        cci = diff / (0.015 * (md / N)) if diff != 0.0 and md != 0.0 else 0.0
+        return state, (tp, cci)
+
+
+class StreamATR(StreamIndicator):
+    """ATR，与 ta.ATR(high, low, close, timeperiod) 一致，使用 Wilder 平滑"""
+
+    inputs = ("high", "low", "close")
+    outputs = ("tr", "atr")
+
+    def __init__(self, timeperiod: int = 14, maxlen: int = 0):
+        self.timeperiod = int(timeperiod)
+        super().__init__(window=2, maxlen=maxlen)
+
+    def _init_state(self):
+        return 0.0, np.nan
+
+    def _step(self, state, i, n):
+        N = self.timeperiod
+        if n == 0:
+            return state, (np.nan, np.nan)
+
+        high, low, pre_close = self._buf["high"][i], self._buf["low"][i], self._buf["close"][i - 1]
+        tr = max(high - low, abs(pre_close - high), abs(low - pre_close))
+        if N <= 1:
+            return state, (tr, tr)
+
+        total, atr = state
+        if n < N:
+            return (total + tr, atr), (tr, np.nan)
+        if n == N:
+            atr = (total + tr) / N
+        else:
+            atr = (atr * (N - 1) + tr) / N
+        return (total, atr), (tr, atr)
+
+
+def sync_ta_stream(c, key: str, creator: Callable[[], StreamIndicator]) -> Tuple[StreamIndicator, List]:
+    """获取 CZSC 对象上的流式指标，并用 c.bars_raw 中的新K线更新
+
+    流式指标保存在 c.cache["ta_streams"] 中，每个 CZSC 对象、每个 key 对应一个指标对象。
+    首次调用、或者指标与 bars_raw 无法对齐时，用 bars_raw 中的全部K线重新创建指标。
+
+    :param c: CZSC 对象
+    :param key: 指标的唯一标识，一般使用缓存的 cache_key
+    :param creator: 创建指标对象的函数
+    :return: 指标对象，本次更新（包括重新计算）的K线列表
+    """
+    streams = c.cache.setdefault("ta_streams", {})
+    stream = streams.get(key, None)
+    bars = c.bars_raw
+
+    if stream is not None and stream.dt is not None:
+        k = 0
+        while k < len(bars) and bars[-k - 1].dt > stream.dt:
+            k += 1
+        if k < len(bars) and bars[-k - 1].dt == stream.dt:
+            # 最后一次更新的K线可能尚未完成，需要重新计算
+            new_bars = bars[-k - 1 :]
+            for bar in new_bars:
+                stream.update(bar)
+            return stream, new_bars
+
+    stream = streams[key] = creator()
+    new_bars = list(bars)
+    for bar in new_bars:
+        stream.update(bar)
+    return stream, new_bars
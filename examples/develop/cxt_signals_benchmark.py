@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/23 11:20
+describe: cxt 系列信号函数性能测试，逐K线更新 CZSC 后调用全部 cxt_* 信号函数，统计每个函数的耗时
+"""
+import sys
+import time
+import inspect
+import hashlib
+import warnings
+sys.path.insert(0, '.')
+sys.path.insert(0, '..')
+sys.path.insert(0, '../..')
+from collections import defaultdict
+from czsc.analyze import CZSC
+from czsc.signals import cxt
+from test.test_analyze import read_daily, read_1min
+
+
+def get_cxt_functions():
+    """只有第一个参数为 CZSC 对象的 cxt 信号函数"""
+    funcs = []
+    for name, func in inspect.getmembers(cxt, inspect.isfunction):
+        if name.startswith("cxt_") and list(inspect.signature(func).parameters)[0] == "c":
+            funcs.append(func)
+    return funcs
+
+
+def run(bars, init_n=500):
+    funcs = get_cxt_functions()
+    c = CZSC(bars[:init_n])
+    costs = defaultdict(float)
+    digest = hashlib.md5()
+    for bar in bars[init_n:]:
+        c.update(bar)
+        for func in funcs:
+            start = time.perf_counter()
+            s = func(c)
+            costs[func.__name__] += time.perf_counter() - start
+            digest.update(str(s).encode())
+    return costs, digest.hexdigest()
+
+
+def bench_properties(bars, repeat=20):
+    """笔、分型、中枢衍生属性的重复访问耗时，模拟多个信号函数在同一根K线上读取相同的对象"""
+    from czsc.objects import ZS
+
+    c = CZSC(bars)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for bi in c.bi_list:
+            _ = (bi.high, bi.low, bi.power, bi.power_volume, bi.change, bi.length, bi.rsq, bi.angle)
+            _ = (bi.fx_b.power_str, bi.fx_b.power_volume, bi.fx_b.has_zs)
+    bi_cost = time.perf_counter() - start
+
+    zss = [ZS(c.bi_list[i: i + 9]) for i in range(len(c.bi_list) - 9)]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for zs in zss:
+            _ = (zs.zg, zs.zd, zs.gg, zs.dd, zs.zz, zs.is_valid)
+    zs_cost = time.perf_counter() - start
+    print(f"属性访问：{len(c.bi_list)} 笔 x {repeat} 次，耗时 {bi_cost:.3f} 秒；"
+          f"{len(zss)} 个中枢 x {repeat} 次，耗时 {zs_cost:.3f} 秒")
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    bench_properties(read_daily())
+    for name, bars in [("日线", read_daily()), ("1分钟", read_1min()[:30000])]:
+        costs, digest = run(bars)
+        print(f"{name}：{len(bars)} 根K线，{len(costs)} 个信号函数，总耗时 {sum(costs.values()):.2f} 秒，信号摘要 {digest}")
+        for func_name, cost in sorted(costs.items(), key=lambda x: -x[1])[:10]:
+            print(f"    {func_name}: {cost:.3f} 秒")
+
+
+if __name__ == '__main__':
+    main()
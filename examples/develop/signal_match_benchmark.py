@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/9 10:30
+describe: CzscTrader.on_sig 信号匹配性能测试，对比字符串信号值和预解析信号值两种匹配方式
+"""
+import sys
+import time
+sys.path.insert(0, '.')
+sys.path.insert(0, '..')
+sys.path.insert(0, '../..')
+from copy import deepcopy
+from czsc.objects import parse_signals
+from czsc.traders.base import CzscTrader, generate_czsc_signals
+from czsc.traders.sig_parse import get_signals_config
+from test.test_analyze import read_daily
+from test.test_vector_backtest import _create_positions
+
+
+def main(n_variants=50):
+    bars = read_daily()
+    positions = _create_positions(bars[0].symbol, "日线")
+    signals_config = get_signals_config(list({s for p in positions for s in p.unique_signals}))
+    sigs = generate_czsc_signals(bars, signals_config, sdt=bars[500].dt, init_n=500, df=True)
+    sigs.drop(columns=['freq', 'cache'], inplace=True)
+    records = sigs.to_dict('records')
+
+    variants = []
+    for i in range(n_variants):
+        for pos in positions:
+            pos = deepcopy(pos)
+            pos.name = f"{pos.name}#{i}"
+            pos.stop_loss += i * 10
+            variants.append(pos)
+
+    for name, rows in [("字符串信号值", records), ("预解析信号值", [parse_signals(x) for x in records])]:
+        trader = CzscTrader(positions=deepcopy(variants))
+        start = time.perf_counter()
+        for row in rows:
+            trader.on_sig(row)
+        cost = time.perf_counter() - start
+        print(f"{name}：{len(rows)} 行信号，{len(variants)} 个持仓策略，耗时 {cost:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
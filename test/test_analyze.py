@@ -85,3 +85,228 @@ def test_czsc_update():
     file_html = "x.html"
     chart.render(file_html)
     os.remove(file_html)
+
+
+def test_czsc_columnar():
+    from czsc.utils.bar_store import BarStore, bar_fields
+
+    bars = read_daily()
+    bars[98].cache['w'] = 0
+    store = BarStore.from_bars(bars[:100], capacity=16)
+    assert len(store) == 100 and store[-1].dt == bars[99].dt and store[0].close == bars[0].close
+    assert [x.id for x in store[-5:]] == [x.id for x in bars[95:100]]
+    # 视图对象没有 __dict__，dt 直接返回写入时的对象
+    view = store[0]
+    assert not hasattr(view, "__dict__") and view.dt is bars[0].dt
+    assert view == bars[0] and view == store[0] and view != store[1] and view.solid == bars[0].solid
+    assert bar_fields(view) == bars[0].__dict__
+    # 非空的 cache 字典直接引用，空字典在第一次访问时才创建
+    store[-2].cache['x'] = 1
+    assert store[-2].cache == {'w': 0, 'x': 1} and bars[98].cache == {'w': 0, 'x': 1}
+    store[-1].cache['x'] = 1
+    assert store[-1].cache == {'x': 1} and bars[99].cache == {}
+    store[-2].cache = {'y': 2}
+    assert store[-2].cache == {'y': 2}
+    store.drop_before(bars[50].dt)
+    assert len(store) == 50 and store[0].dt == bars[50].dt
+    assert store.close.tolist() == [x.close for x in bars[50:100]]
+
+    c1 = CZSC(bars)
+    c2 = CZSC(bars, columnar=True)
+    assert isinstance(c2.bars_raw, BarStore)
+    assert len(c1.bars_raw) == len(c2.bars_raw)
+    assert [x.dt for x in c1.bars_raw] == [x.dt for x in c2.bars_raw]
+    assert [(x.sdt, x.edt, x.high, x.low) for x in c1.bi_list] == [(x.sdt, x.edt, x.high, x.low) for x in c2.bi_list]
+    assert [x.dt for x in c1.bars_ubi] == [x.dt for x in c2.bars_ubi]
+
+    assert [[x.dt for x in k.raw_bars] for k in c1.bars_ubi] == [[x.dt for x in k.raw_bars] for k in c2.bars_ubi]
+
+    assert c2.to_echarts() is not None
+
+    # 无包含K线中的原始K线与 bars_raw 共享 cache
+    c2.bars_raw[-1].cache = {'z': 3}
+    assert c2.bars_ubi[-1].raw_bars[-1].cache == {'z': 3}
+
+    # 列式存储下 elements 只保存K线的位置，超过数量限制的不连续K线分段保存
+    from czsc.utils.bar_store import BarRange
+    views = store[:3] + [store[10]]
+    elements = BarRange.from_views(views)
+    assert len(elements) == 4 and elements == views and elements[-1].dt == bars[60].dt
+    assert [x.dt for x in elements[1:]] == [x.dt for x in views[1:]] and elements._more
+
+
+def test_czsc_legacy_pickle():
+    """加载没有 columnar、增量识别器等属性的历史序列化对象，之后可以继续更新"""
+    import pickle
+
+    bars = read_1min()[:6000]
+    c1 = CZSC(bars[:3000])
+    c2 = CZSC(bars[:3000])
+    _ = c2.zs_list
+    for key in ["columnar", "_ubi_tracker", "_ubi_ref", "_ubi_seen", "_zs_tracker"]:
+        delattr(c2, key)
+    c2 = pickle.loads(pickle.dumps(c2))
+    assert c2.columnar is False and len(c2._ubi_tracker) == len(c2.bars_ubi)
+
+    for bar in bars[3000:]:
+        c1.update(bar)
+        c2.update(bar)
+    assert _czsc_state(c1) == _czsc_state(c2)
+    assert [x.bis for x in c1.zs_list] == [x.bis for x in c2.zs_list]
+
+
+def _legacy_check_bi(bars, benchmark=None):
+    """重构前基于 check_fxs 全量扫描的 check_bi，用于增量算法的一致性测试"""
+    from czsc import envs
+    from czsc.analyze import check_fxs, BI
+    from czsc.enum import Mark
+
+    fxs = check_fxs(bars)
+    if len(fxs) < 2:
+        return None, bars
+
+    fx_a = fxs[0]
+    if fx_a.mark == Mark.D:
+        direction = Direction.Up
+        fx_b = max((x for x in fxs if x.mark == Mark.G and x.dt > fx_a.dt and x.fx > fx_a.fx),
+                   key=lambda fx: fx.high, default=None)
+    else:
+        direction = Direction.Down
+        fx_b = min((x for x in fxs if x.mark == Mark.D and x.dt > fx_a.dt and x.fx < fx_a.fx),
+                   key=lambda fx: fx.low, default=None)
+    if fx_b is None:
+        return None, bars
+
+    bars_a = [x for x in bars if fx_a.elements[0].dt <= x.dt <= fx_b.elements[2].dt]
+    bars_b = [x for x in bars if x.dt >= fx_b.elements[0].dt]
+    ab_include = (fx_a.high > fx_b.high and fx_a.low < fx_b.low) or (fx_a.high < fx_b.high and fx_a.low > fx_b.low)
+    power_enough = bool(benchmark and abs(fx_a.fx - fx_b.fx) > benchmark * envs.get_bi_change_th())
+    if (not ab_include) and (len(bars_a) >= envs.get_min_bi_len() or power_enough):
+        fxs_ = [x for x in fxs if fx_a.elements[0].dt <= x.dt <= fx_b.elements[2].dt]
+        return BI(symbol=fx_a.symbol, fx_a=fx_a, fx_b=fx_b, fxs=fxs_, direction=direction, bars=bars_a), bars_b
+    return None, bars
+
+
+def _legacy_update_bi(self):
+    from czsc import envs
+    from czsc.analyze import check_fxs
+    from czsc.enum import Mark
+
+    bars_ubi = self.bars_ubi
+    if len(bars_ubi) < 3:
+        return
+
+    if not self.bi_list:
+        fxs = check_fxs(bars_ubi)
+        if not fxs:
+            return
+        fx_a = fxs[0]
+        for fx in [x for x in fxs if x.mark == fx_a.mark]:
+            if (fx_a.mark == Mark.D and fx.low <= fx_a.low) or (fx_a.mark == Mark.G and fx.high >= fx_a.high):
+                fx_a = fx
+        bars_ubi = [x for x in bars_ubi if x.dt >= fx_a.elements[0].dt]
+        bi, self.bars_ubi = _legacy_check_bi(bars_ubi)
+        if bi:
+            self.bi_list.append(bi)
+        return
+
+    if envs.get_bi_change_th() > 0.5 and len(self.bi_list) >= 5:
+        price_seq = [x.power_price for x in self.bi_list[-5:]]
+        benchmark = min(self.bi_list[-1].power_price, sum(price_seq) / len(price_seq))
+    else:
+        benchmark = None
+
+    bi, self.bars_ubi = _legacy_check_bi(bars_ubi, benchmark)
+    if bi:
+        self.bi_list.append(bi)
+
+    last_bi = self.bi_list[-1]
+    bars_ubi = self.bars_ubi
+    if (last_bi.direction == Direction.Up and bars_ubi[-1].high > last_bi.high) \
+            or (last_bi.direction == Direction.Down and bars_ubi[-1].low < last_bi.low):
+        self.bars_ubi = last_bi.bars[:-2] + [x for x in bars_ubi if x.dt >= last_bi.bars[-2].dt]
+        self.bi_list.pop(-1)
+
+
+def _czsc_state(c):
+    """提取 CZSC 对象的笔、分型、无包含K线状态，用于一致性比较"""
+    bis = [(x.sdt, x.edt, x.direction, x.high, x.low, len(x.bars), [(f.dt, f.mark) for f in x.fxs],
+            x.fx_b.power_str, x.power_volume) for x in c.bi_list]
+    ubi = [(x.dt, x.high, x.low, len(x.elements)) for x in c.bars_ubi]
+    fxs = [(x.dt, x.mark, x.fx) for x in c.fx_list]
+    return bis, ubi, fxs, [x.dt for x in c.bars_raw]
+
+
+def _update_with_ticks(c, bars):
+    """模拟实盘：每根K线先以未完成状态更新两次，再以最终状态更新"""
+    for bar in bars:
+        for price in [bar.open, bar.close]:
+            c.update(RawBar(symbol=bar.symbol, id=bar.id, dt=bar.dt, freq=bar.freq, open=bar.open, close=price,
+                            high=max(bar.open, price), low=min(bar.open, price), vol=bar.vol, amount=bar.amount))
+        c.update(bar)
+    return c
+
+
+def test_czsc_incremental_bi(monkeypatch):
+    for bars in [read_daily(), read_1min()[:30000]]:
+        c1 = CZSC(bars, max_bi_num=100)
+        with monkeypatch.context() as m:
+            m.setattr(CZSC, "_CZSC__update_bi", _legacy_update_bi)
+            c2 = CZSC(bars, max_bi_num=100)
+        assert len(c1.bi_list) > 10
+        assert _czsc_state(c1) == _czsc_state(c2)
+
+    # K线时间延伸（同一 dt 多次更新）的情况
+    bars = read_1min()[:5000]
+    c1 = _update_with_ticks(CZSC(bars[:10]), bars[10:])
+    with monkeypatch.context() as m:
+        m.setattr(CZSC, "_CZSC__update_bi", _legacy_update_bi)
+        c2 = _update_with_ticks(CZSC(bars[:10]), bars[10:])
+    assert _czsc_state(c1) == _czsc_state(c2)
+
+
+def test_czsc_from_dataframe():
+    from czsc.utils.bar_generator import format_standard_kline
+
+    data = pd.read_csv(os.path.join(cur_path, "data/000001.SH_D.csv"), encoding="utf-8")
+    data['dt'] = pd.to_datetime(data['dt'])
+    data['amount'] = data['close'] * data['vol']
+    with zipfile.ZipFile(os.path.join(cur_path, 'data/000001.XSHG_1min.zip'), 'r') as z:
+        df1 = pd.read_csv(z.open('000001.XSHG_1min.csv'), encoding='utf-8').head(30000)
+    df1['dt'] = pd.to_datetime(df1['dt'])
+    df1['amount'] = df1['close'] * df1['vol']
+
+    for df, freq in [(data, "日线"), (df1, "1分钟")]:
+        bars = format_standard_kline(df, freq=freq)
+        for max_bi_num in [50, 1000]:
+            c1 = CZSC(bars, max_bi_num=max_bi_num)
+            c2 = CZSC.from_dataframe(df, freq=freq, max_bi_num=max_bi_num)
+            assert _czsc_state(c1) == _czsc_state(c2)
+            assert [x.id for x in c1.bars_raw] == [x.id for x in c2.bars_raw]
+            assert [[y.id for y in x.bars[-1].elements] for x in c1.bi_list] == \
+                   [[y.id for y in x.bars[-1].elements] for x in c2.bi_list]
+
+        # 批量创建后继续增量更新
+        n = len(bars) // 2
+        c1 = CZSC(bars)
+        c2 = CZSC.from_dataframe(df.head(n), freq=freq, columnar=True)
+        for bar in bars[n:]:
+            c2.update(bar)
+        assert _czsc_state(c1) == _czsc_state(c2)
+
+
+def test_czsc_zs_list():
+    from czsc.utils.sig import get_zs_seq
+
+    def __zs_state(zss):
+        return [([id(bi) for bi in x.bis], x.zg, x.zd, x.gg, x.dd, x.is_valid) for x in zss]
+
+    bars = read_1min()[:5000]
+    for max_bi_num in [10, 1000]:
+        c = CZSC(bars[:10], max_bi_num=max_bi_num)
+        for i, bar in enumerate(bars[10:]):
+            _update_with_ticks(c, [bar])
+            if i % 3 == 0:
+                assert __zs_state(c.zs_list) == __zs_state(get_zs_seq(c.bi_list))
+        assert len(c.zs_list) > 1
+        assert __zs_state(c.zs_list) == __zs_state(get_zs_seq(c.bi_list))
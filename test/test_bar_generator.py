@@ -3,7 +3,7 @@ import os
 import pandas as pd
 from tqdm import tqdm
 from czsc.objects import Freq
-from czsc.utils.bar_generator import BarGenerator, freq_end_time, resample_bars, check_freq_and_market, freq_market_times
+from czsc.utils.bar_generator import BarGenerator, MultiBarGenerator, freq_end_time, freq_end_times, resample_bars, check_freq_and_market, freq_market_times
 from test.test_analyze import read_1min, read_daily
 
 cur_path = os.path.split(os.path.realpath(__file__))[0]
@@ -299,6 +299,53 @@ def test_resample_bars():
     assert len(_f60_bars) == 3996
 
 
+
+def _legacy_resample_bars(df, target_freq, market):
+    """逐行调用 freq_end_time 的原始实现，用于一致性测试"""
+    df = df.copy()
+    df['freq_edt'] = df['dt'].apply(lambda x: freq_end_time(x, target_freq, market))
+    dfk1 = df.groupby('freq_edt').agg(
+        {'symbol': 'first', 'dt': 'last', 'open': 'first', 'close': 'last', 'high': 'max',
+         'low': 'min', 'vol': 'sum', 'amount': 'sum', 'freq_edt': 'last'})
+    dfk1.reset_index(drop=True, inplace=True)
+    dfk1['dt'] = dfk1['freq_edt']
+    return dfk1[['symbol', 'dt', 'open', 'close', 'high', 'low', 'vol', 'amount']]
+
+
+def test_freq_end_times():
+    for market in ['A股', '期货', '默认']:
+        times = freq_market_times[f"1分钟_{market}"]
+        dts = pd.Series(pd.to_datetime([f"2023-12-29 {x}" for x in times] + [f"2024-02-29 {x}" for x in times]))
+        dts = pd.concat([dts, dts - pd.Timedelta(seconds=30)], ignore_index=True)
+        for freq in Freq:
+            if freq == Freq.Tick:
+                continue
+            expected = [freq_end_time(x, freq, market) for x in dts]
+            assert freq_end_times(dts, freq, market).tolist() == expected, (market, freq)
+
+
+def test_resample_bars_parity():
+    df = pd.DataFrame(kline[:30000])
+    rows = []
+    for market in ['期货', '默认']:
+        times = freq_market_times[f"1分钟_{market}"]
+        days = pd.date_range("2023-12-20", "2024-01-10", freq="B")
+        dts = [pd.to_datetime(f"{d.date()} {t}") for d in days for t in times]
+        dfm = pd.DataFrame({'symbol': market, 'dt': dts, 'open': range(len(dts)), 'close': range(len(dts)),
+                            'high': range(len(dts)), 'low': range(len(dts)), 'vol': 1, 'amount': 1.0})
+        rows.append((dfm.sort_values('dt', ignore_index=True), market))
+
+    for dfx, market in [(df, 'A股')] + rows:
+        for freq in [Freq.F5, Freq.F15, Freq.F30, Freq.F60, Freq.F120, Freq.D, Freq.W, Freq.M, Freq.S, Freq.Y]:
+            _market = market if freq.value.endswith("分钟") else "默认"
+            expected = _legacy_resample_bars(dfx, freq, _market)
+            pd.testing.assert_frame_equal(resample_bars(dfx.copy(), freq, raw_bars=False), expected)
+
+            bars = resample_bars(dfx.copy(), freq, raw_bars=True, drop_unfinished=False)
+            assert [(x.id, x.dt, x.open, x.close, x.vol) for x in bars] == \
+                   [(i, x.dt, x.open, x.close, x.vol) for i, x in enumerate(expected.itertuples(), 1)]
+
+
 def test_bg_on_f1():
     """验证从1分钟开始生成各周期K线"""
     bg = BarGenerator(base_freq='1分钟', freqs=['周线', '日线', '30分钟', '5分钟'], max_count=2000)
@@ -339,6 +386,34 @@ def test_bg_on_d():
     assert bg.bars['月线'][-2].id > bg.bars['月线'][-3].id
 
 
+
+def test_multi_bar_generator():
+    from dataclasses import replace
+
+    freqs = ['日线', '60分钟', '30分钟', '5分钟', '周线']
+    symbols = ['A', 'B', 'C']
+    bgs = {x: BarGenerator(base_freq='1分钟', freqs=freqs, max_count=1000) for x in symbols}
+    mbg = MultiBarGenerator(base_freq='1分钟', freqs=freqs, max_count=1000)
+    for i, bar in enumerate(kline[:20000]):
+        batch = [replace(bar, symbol=x, close=bar.close + j, high=bar.high + j, cache={})
+                 for j, x in enumerate(symbols) if i % (j + 1) == 0]
+        for x in batch:
+            bgs[x.symbol].update(x)
+        assert mbg.update(batch) == [x.symbol for x in batch]
+
+    assert mbg.symbols == symbols and mbg.end_dt == kline[19999].dt
+    for symbol in symbols:
+        bg = mbg[symbol]
+        assert bg.symbol == symbol and bg.end_dt == bgs[symbol].end_dt
+        assert list(bg.bars.keys()) == list(bgs[symbol].bars.keys())
+        for freq, bars in bgs[symbol].bars.items():
+            assert len(bars) <= 1000
+            assert [x.__dict__ for x in bg.bars[freq]] == [x.__dict__ for x in bars], (symbol, freq)
+
+    # 重复输入被忽略
+    assert mbg.update([replace(kline[19999], symbol='A', cache={})]) == []
+
+
 def test_is_trading_time():
     from datetime import datetime
     from czsc.utils.bar_generator import is_trading_time
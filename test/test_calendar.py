@@ -34,3 +34,33 @@ def test_get_trading_dates():
     assert dates == pd.to_datetime(['2023-09-08', '2023-09-11', '2023-09-12']).tolist()
     dates = get_trading_dates('2023-09-08 12:00', '2023-09-12 15:00')
     assert dates == pd.to_datetime(['2023-09-08', '2023-09-11', '2023-09-12']).tolist()
+
+
+def test_calendar_lazy_load():
+    import subprocess
+    import sys
+    code = "import czsc; from czsc.utils import calendar as c; assert c._load_calendar.cache_info().currsize == 0"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_trading_dates_batch():
+    import numpy as np
+    from czsc.utils.calendar import calendar, get_trading_dates, is_trading_dates, next_trading_dates, prev_trading_dates
+
+    dates = pd.date_range('2015-01-01', '2024-06-30', freq='13h')
+    days = dates.normalize()
+    opens = set(calendar[calendar['is_open'] == 1]['cal_date'])
+    assert is_trading_dates(dates).tolist() == [x in opens for x in days]
+
+    sample = dates[::97]
+    assert next_trading_dates(sample, n=3).tolist() == [next_trading_date(x, n=3) for x in sample]
+    assert prev_trading_dates(sample, n=2).tolist() == [prev_trading_date(x, n=2) for x in sample]
+    assert is_trading_dates(sample).tolist() == [is_trading_date(x) for x in sample]
+    assert get_trading_dates('2015-01-01', '2024-06-30') == sorted(x for x in opens if x <= pd.Timestamp('2024-06-30')
+                                                                   and x >= pd.Timestamp('2015-01-01'))
+
+    # 超出交易日历范围
+    assert prev_trading_dates(['1990-01-01']).isna().all()
+    assert next_trading_dates(['2099-01-01']).isna().all()
+    assert not is_trading_dates(['2099-01-01'])[0]
+    assert np.array_equal(is_trading_dates(pd.to_datetime(['2023-09-08 10:00']).tz_localize('Asia/Shanghai')), [True])
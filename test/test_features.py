@@ -71,3 +71,116 @@ def test_normalize_corr():
     result = normalize_corr(df, fcol='factor', copy=True, mode='simple')
     corr2 = result['n1b'].corr(result['factor'])
     assert result.shape == df.shape and corr2 == -raw_corr
+
+
+def _create_feature_df(n=1200, seed=42):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.normal(0, 1, n))
+    x[300:360] = 5.0  # 常数区间
+    x[500:700] = np.round(x[500:700])  # 大量相同值
+    return pd.DataFrame({"dt": pd.date_range("2021-01-01", periods=n, freq="h"), "symbol": "AAA", "x": x})
+
+
+def test_rolling_transforms():
+    from sklearn.preprocessing import scale, minmax_scale, maxabs_scale, robust_scale
+    from czsc.features.utils import rolling_norm, rolling_qcut, rolling_scale, rolling_tanh, rolling_slope
+
+    df = _create_feature_df()
+    roll = df["x"].rolling(window=200, min_periods=50)
+
+    expected = roll.apply(lambda x: np.tanh(scale(x))[-1]).fillna(0)
+    np.testing.assert_allclose(rolling_tanh(df.copy(), "x", 200, 50)["x_tanh"], expected, atol=1e-9)
+
+    methods = {
+        "scale": lambda x: scale(x)[-1],
+        "minmax_scale": lambda x: minmax_scale(x, feature_range=(-1, 1))[-1],
+        "maxabs_scale": lambda x: maxabs_scale(x)[-1],
+        "robust_scale": lambda x: robust_scale(x)[-1],
+    }
+    for method, func in methods.items():
+        res = rolling_scale(df.copy(), "x", 200, 50, method=method)["x_scale"]
+        np.testing.assert_allclose(res, roll.apply(func).fillna(0), atol=1e-9)
+
+    norm = df["x"].rolling(200, min_periods=2).apply(lambda x: (x[-1] - x.mean()) / x.std(), raw=True)
+    np.testing.assert_allclose(rolling_norm(df.copy(), "x", 200)["x_norm"], norm.fillna(0), atol=1e-9)
+
+    for q in [5, 10]:
+        qcut = df["x"].rolling(200, min_periods=q).apply(
+            lambda x: pd.qcut(x, q=q, labels=False, duplicates="drop")[-1], raw=True
+        )
+        assert rolling_qcut(df.copy(), "x", 200, q=q)["x_qcut"].tolist() == qcut.fillna(-1).tolist()
+
+    # 线性回归斜率
+    from sklearn.linear_model import LinearRegression
+
+    def __lr_slope(x):
+        return LinearRegression().fit(np.arange(len(x)).reshape(-1, 1), x).coef_[0]
+
+    slope = df["x"].rolling(100, min_periods=10).apply(__lr_slope, raw=True).fillna(0)
+    np.testing.assert_allclose(rolling_slope(df.copy(), "x", 100, 10)["x_slope_linear"], slope, atol=1e-9)
+
+
+def test_feature_to_weight():
+    from sklearn.preprocessing import scale, maxabs_scale
+    from czsc.features.utils import feature_to_weight
+
+    df = _create_feature_df()
+    dfw = feature_to_weight(df.copy(), "x", positive=False, window=300, min_periods=50)
+
+    x = df["x"].clip(
+        lower=df["x"].rolling(300, 50).quantile(0.05), upper=df["x"].rolling(300, 50).quantile(0.95)
+    )
+    norm = x.rolling(300, 50).apply(lambda v: scale(v)[-1])
+    weight = -norm.rolling(300, 50).apply(lambda v: maxabs_scale(v)[-1]).fillna(0)
+    np.testing.assert_allclose(dfw["weight"], weight, atol=1e-9)
+    assert dfw["weight"].abs().max() <= 1
+
+
+def _custom_feature(df, **kwargs):
+    df["F#CUSTOM#A"] = df["close"].diff(kwargs.get("n", 1)).fillna(0)
+
+
+def test_compute_features():
+    from czsc import features
+    from czsc.features.pipeline import compute_features
+    from test.test_analyze import read_daily
+
+    bars = read_daily()[-1200:]
+    dfb = pd.DataFrame([{"dt": x.dt, "open": x.open, "close": x.close, "high": x.high, "low": x.low,
+                         "vol": x.vol} for x in bars])
+    rng = np.random.default_rng(1)
+    rows = []
+    for i, symbol in enumerate(["AAA", "BBB", "CCC"]):
+        dfs = dfb.iloc[i * 50:].copy()
+        dfs[["open", "close", "high", "low"]] *= 1 + rng.normal(0, 0.01, (len(dfs), 1))
+        dfs["symbol"] = symbol
+        rows.append(dfs)
+    df = pd.concat(rows).sample(frac=1, random_state=1)
+
+    specs = [f"RET00{i}" for i in range(1, 9)]
+    specs += [{"name": "RET004", "n": 10, "tag": "N10"}, {"name": "czsc.features.vpf.VPF002", "num": 6}]
+    specs += ["VPF001", "VPF003", {"name": "VPF004", "n": 9}, {"name": _custom_feature, "n": 3}]
+
+    # 逐品种调用原始特征函数作为基准
+    expected = []
+    for symbol, dfg in df.sort_values(["symbol", "dt"]).groupby("symbol"):
+        dfg = dfg.reset_index(drop=True)
+        for i in range(1, 9):
+            getattr(features, f"RET00{i}")(dfg)
+        features.RET004(dfg, n=10, tag="N10")
+        features.VPF002(dfg, num=6)
+        features.VPF001(dfg)
+        features.VPF003(dfg)
+        features.VPF004(dfg, n=9)
+        _custom_feature(dfg, n=3)
+        expected.append(dfg)
+    expected = pd.concat(expected, ignore_index=True)
+    fcols = [x for x in expected.columns if x.startswith("F#")]
+
+    for n_jobs in [1, 2]:
+        res = compute_features(df, specs, n_jobs=n_jobs, chunk_size=1)
+        assert res[["symbol", "dt"]].equals(expected[["symbol", "dt"]])
+        assert sorted(fcols) == sorted(x for x in res.columns if x.startswith("F#"))
+        assert all(res[x].dtype == np.float32 for x in fcols)
+        for col in fcols:
+            np.testing.assert_allclose(res[col], expected[col].astype(np.float32), rtol=1e-6, atol=1e-7)
@@ -43,6 +43,62 @@ def test_zs():
     zs = ZS(c.bi_list[-8:-3])
     assert not zs.is_valid
 
+    # 追加笔、替换最后一笔、重新赋值 bis 后，中枢属性与逐次计算的结果一致
+    def __check(zs_):
+        assert zs_.zg == min([x.high for x in zs_.bis[:3]]) and zs_.zd == max([x.low for x in zs_.bis[:3]])
+        assert zs_.gg == max([x.high for x in zs_.bis]) and zs_.dd == min([x.low for x in zs_.bis])
+
+    zs = ZS(bis=[c.bi_list[0]])
+    for bi in c.bi_list[1:12]:
+        zs.bis.append(bi)
+        __check(zs)
+    zs.bis[-1] = c.bi_list[-1]
+    __check(zs)
+    zs.bis = c.bi_list[-6:]
+    __check(zs)
+
+
+def test_derived_properties():
+    """笔、分型的衍生属性缓存后与直接计算的结果一致，序列化后可以正常恢复"""
+    import math
+    import pickle
+    from copy import deepcopy
+    from test.test_analyze import read_daily
+    from czsc.analyze import CZSC
+    from czsc.objects import ZS
+    from czsc.utils.corr import single_linear
+
+    c = CZSC(read_daily())
+    for bi in c.bi_list:
+        raw_bars = [y for x in bi.bars[1:-1] for y in x.raw_bars]
+        assert bi.raw_bars == raw_bars and bi.raw_bars is bi.raw_bars
+        assert bi.high == max(bi.fx_a.high, bi.fx_b.high) and bi.low == min(bi.fx_a.low, bi.fx_b.low)
+        assert bi.power == bi.power_price == round(abs(bi.fx_b.fx - bi.fx_a.fx), 2)
+        assert bi.power_volume == sum([x.vol for x in bi.bars[1:-1]])
+        assert bi.change == round((bi.fx_b.fx - bi.fx_a.fx) / bi.fx_a.fx, 4)
+        assert bi.rsq == round(single_linear([x.close for x in raw_bars])["r2"], 4)
+        assert bi.angle == round(math.asin(bi.power_price / bi.hypotenuse) * 180 / 3.14, 2)
+        for fx in [bi.fx_a, bi.fx_b]:
+            assert fx.power_volume == sum([x.vol for x in fx.elements])
+            assert fx.has_zs == (min([x.high for x in fx.elements]) >= max([x.low for x in fx.elements]))
+        assert "raw_bars" not in bi.cache and "close_linear_info" not in bi.cache
+
+    # 衍生属性不参与序列化，恢复后重新计算
+    bi = c.bi_list[-1]
+    state = bi.__getstate__()
+    assert "_summary" not in state
+    for obj in [pickle.loads(pickle.dumps(bi)), deepcopy(bi)]:
+        assert obj == bi and obj.raw_bars == bi.raw_bars and obj.rsq == bi.rsq and obj.fx_b.power_str == bi.fx_b.power_str
+
+    # 没有衍生属性的历史序列化对象
+    state.pop("sdt")
+    old = object.__new__(type(bi))
+    old.__setstate__(state)
+    assert old.high == bi.high and old.sdt == bi.sdt
+
+    zs = pickle.loads(pickle.dumps(ZS(c.bi_list[-5:])))
+    assert zs.zg == min([x.high for x in c.bi_list[-5:-2]])
+
 
 def test_cal_break_even_point():
     assert cal_break_even_point([]) == 1
@@ -76,6 +132,20 @@ def test_signal():
     except ValueError as e:
         assert str(e) == 'score 必须在0~100之间'
 
+    # 预解析的信号值
+    import pickle
+    from copy import deepcopy
+    from czsc.objects import parse_signal_value, parse_signals
+
+    s = Signal(signal='1分钟_任意_倒1形态_类一买_任意_基础型_3')
+    sigs = parse_signals({"1分钟_倒1形态": "类一买_七笔_基础型_3", "symbol": "000001.SH", "close": 10.0})
+    assert sigs == {"1分钟_倒1形态": ("类一买", "七笔", "基础型", 3), "symbol": "000001.SH", "close": 10.0}
+    assert parse_signal_value("类一买_七笔_基础型_3") is sigs["1分钟_倒1形态"]
+    assert s.is_match(sigs) and s.is_match({"1分钟_倒1形态": "类一买_九笔_基础型_5"})
+    assert not s.is_match({"1分钟_倒1形态": ("类一买", "七笔", "基础型", 2)})
+    for s1 in [deepcopy(s), pickle.loads(pickle.dumps(s))]:
+        assert s1 == s and s1.key == s.key and s1.is_match(sigs)
+
 
 def test_factor():
     freq = Freq.F15
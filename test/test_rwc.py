@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/16 15:20
+describe: 策略持仓权重管理测试，使用 fakeredis 模拟 redis 服务
+"""
+import time
+import pytest
+import numpy as np
+import pandas as pd
+
+fakeredis = pytest.importorskip("fakeredis")
+import redis    # noqa: E402
+from czsc.traders.rwc import RedisWeightsClient, get_strategy_weights, clear_strategy    # noqa: E402
+
+
+def _create_pool(server):
+    return redis.BlockingConnectionPool(connection_class=getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection, server=server, decode_responses=True)
+
+
+def _create_weights(symbols=("AAA", "BBB", "CCC"), n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    dts = pd.date_range("2024-01-02 09:30", periods=n, freq="1min")
+    rows = [pd.DataFrame({"symbol": symbol, "dt": dts, "weight": rng.choice([0, 0.5, -0.5, 1], n),
+                          "price": rng.random(n) + 10}) for symbol in symbols]
+    return pd.concat(rows, ignore_index=True)
+
+
+def test_rwc_index_reads():
+    server = fakeredis.FakeServer()
+    pool = _create_pool(server)
+    rwc = RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False, stream_maxlen=1000)
+    other = RedisWeightsClient("TEST2", connection_pool=pool, send_heartbeat=False)
+
+    dfw = _create_weights()
+    cnt = rwc.publish_dataframe(dfw)
+    other.publish_dataframe(_create_weights(symbols=("DDD",), seed=1))
+    assert cnt == len(dfw[dfw.groupby("symbol")["weight"].diff().fillna(1) != 0])
+    assert rwc.r.smembers(rwc.symbols_key) == {"AAA", "BBB", "CCC"}
+    assert rwc.get_symbols() == ["AAA", "BBB", "CCC"]
+
+    # 读取操作不使用 KEYS
+    def _no_keys(*args, **kwargs):
+        raise AssertionError("KEYS is not allowed")
+
+    rwc.r.keys = _no_keys
+    dfl1 = rwc.get_last_weights(ignore_zero=False)
+    dfl2 = rwc.get_last_weights(ignore_zero=False, lua=False)
+    pd.testing.assert_frame_equal(dfl1, dfl2)
+    assert dfl1["symbol"].tolist() == ["AAA", "BBB", "CCC"]
+    last = dfw.groupby("symbol").last()
+    assert dfl1["weight"].tolist() == last["weight"].tolist()
+
+    df = rwc.get_all_weights()
+    assert set(df["symbol"]) == {"AAA", "BBB", "CCC"} and len(df) > 100
+    dfm = df.merge(dfw, on=["dt", "symbol"], how="left", suffixes=("", "_raw"))
+    assert np.allclose(dfm["weight"], dfm["weight_raw"]) and df["update_time"].notna().all()
+
+    keys = rwc.get_weight_keys(["AAA"], sdt="2024-01-02 09:40", edt="2024-01-02 09:50")["AAA"]
+    assert all("20240102094000" <= k.split(":")[-1] <= "20240102095000" for k in keys)
+
+    # Stream 增量读取
+    dfs, last_id = rwc.read_stream(count=5)
+    assert len(dfs) == 5
+    dfs2, last_id = rwc.read_stream(last_id)
+    assert len(dfs) + len(dfs2) == cnt
+    rwc.publish("AAA", "2024-01-03 09:30", weight=0.123, price=1)
+    dfs3, _ = rwc.read_stream(last_id)
+    assert dfs3[["symbol", "weight"]].values.tolist() == [["AAA", 0.123]]
+    assert other.read_stream()[0].empty
+
+    # 没有品种索引的历史数据，自动重建索引
+    rwc.r.delete(rwc.symbols_key, rwc.symbols_ready_key)
+    assert RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False).get_symbols() == ["AAA", "BBB", "CCC"]
+
+    # 索引上线之前写入了部分品种，之后第一次发布新品种时，旧品种不能从索引中丢失
+    rwc.r.delete(rwc.symbols_key, rwc.symbols_ready_key)
+    writer = RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False)
+    assert writer.publish("EEE", "2024-01-03 09:30", weight=1) == 1
+    reader = RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False)
+    assert reader.get_symbols() == ["AAA", "BBB", "CCC", "EEE"]
+    assert reader.get_last_weights(ignore_zero=False)["symbol"].tolist() == ["BBB", "CCC", "AAA", "EEE"]
+
+    clear_strategy("TEST", connection_pool=pool, with_human=False)
+    assert not [k for k in rwc.r.scan_iter("Weights:*") if "TEST2" not in k]
+    assert get_strategy_weights("TEST2", connection_pool=pool)["symbol"].unique().tolist() == ["DDD"]
+
+
+def _legacy_expand_weights(df):
+    """全量 pivot / melt 的原始实现，用于一致性测试"""
+    df = df.sort_values(['dt', 'symbol']).reset_index(drop=True)
+    df1 = pd.pivot_table(df, index='dt', columns='symbol', values='weight').sort_index().ffill().fillna(0)
+    df1 = pd.melt(df1.reset_index(), id_vars='dt', value_vars=df1.columns, value_name='weight')
+    df1 = df1.merge(df[['dt', 'symbol', 'update_time']], on=['dt', 'symbol'], how='left')
+    df1 = df1.sort_values(['symbol', 'dt']).reset_index(drop=True)
+    for _, dfg in df1.groupby('symbol'):
+        df1.loc[dfg.index, 'update_time'] = dfg['update_time'].ffill().bfill()
+    return df1.sort_values(['dt', 'symbol']).reset_index(drop=True)
+
+
+def test_rwc_incremental_weights(tmp_path):
+    server = fakeredis.FakeServer()
+    pool = _create_pool(server)
+    rwc = RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False)
+
+    dfw = _create_weights(n=60)
+    dfw = dfw[~((dfw["symbol"] == "CCC") & (dfw["dt"] < "2024-01-02 09:50"))]
+    rwc.publish_dataframe(dfw[dfw["dt"] < "2024-01-02 10:10"])
+
+    cache_path = str(tmp_path / "weights")
+    df1 = rwc.get_all_weights(cache_path=cache_path)
+    parts = sorted(tmp_path.joinpath("weights").glob("*.parquet"))
+    assert len(parts) == 1
+    mtime = parts[0].stat().st_mtime_ns
+    raw = rwc._fetch_weights([k for v in rwc.get_weight_keys().values() for k in v])
+    pd.testing.assert_frame_equal(df1, _legacy_expand_weights(raw), check_dtype=False)
+
+    # 新增权重后，只同步新增的记录
+    rwc.publish_dataframe(dfw)
+    rwc.publish("DDD", "2024-01-02 10:00", weight=0.3)
+    fetched = []
+    _fetch = rwc._fetch_weights
+    rwc._fetch_weights = lambda keys: fetched.append(len(keys)) or _fetch(keys)
+
+    reader = RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False)
+    reader._fetch_weights = rwc._fetch_weights
+    df2 = reader.get_all_weights(sdt="2024-01-02 09:40", cache_path=cache_path)
+    df3 = rwc.get_all_weights(sdt="2024-01-02 09:40", incremental=False)
+    pd.testing.assert_frame_equal(df2, df3)
+    n_total = sum(len(v) for v in rwc.get_weight_keys().values())
+    assert fetched[0] == n_total - len(raw) and set(df2["symbol"]) == {"AAA", "BBB", "CCC", "DDD"}
+
+    # 新增记录写入新的分片，已有的分片不重写；增量合并的结果与全量读取排序后一致
+    parts = sorted(tmp_path.joinpath("weights").glob("*.parquet"))
+    assert len(parts) == 2 and parts[0].stat().st_mtime_ns == mtime
+    raw2 = rwc._fetch_weights([k for v in rwc.get_weight_keys().values() for k in v])
+    raw2 = raw2.sort_values(["symbol", "dt"], ignore_index=True)
+    pd.testing.assert_frame_equal(reader.sync_weights(cache_path=cache_path), raw2, check_dtype=False)
+    pd.testing.assert_frame_equal(RedisWeightsClient("TEST", connection_pool=pool, send_heartbeat=False)
+                                  .sync_weights(cache_path=cache_path), raw2, check_dtype=False)
+
+    # 没有新增记录时，不读取任何权重记录
+    df4 = reader.get_all_weights(sdt="2024-01-02 09:40", incremental=True)
+    pd.testing.assert_frame_equal(df2, df4)
+    assert fetched[-1] == 0 and len(fetched) == 5
+
+    # 全量同步时清空缓存目录
+    reader.sync_weights(cache_path=cache_path, refresh=True)
+    assert len(list(tmp_path.joinpath("weights").glob("*.parquet"))) == 1
+
+
+def test_rwc_publisher():
+    from czsc.traders.rwc import RedisWeightsPublisher
+
+    server = fakeredis.FakeServer()
+    rwc = RedisWeightsClient("TEST", connection_pool=_create_pool(server), send_heartbeat=False)
+
+    # redis 端检查最近一次发布时间和权重
+    assert rwc.publish("AAA", "2024-01-02 09:31", weight=0.5) == 1
+    assert rwc.publish("AAA", "2024-01-02 09:30", weight=1) == 0
+    assert rwc.publish("AAA", "2024-01-02 09:32", weight=0.5) == 0
+    assert rwc.publish("AAA", "2024-01-02 09:31", weight=1, overwrite=True) == 1
+
+    with RedisWeightsPublisher(rwc, flush_interval=60) as pub:
+        for i, symbol in enumerate(["AAA", "BBB", "CCC"]):
+            pub.put(symbol, "2024-01-02 09:33", weight=0.1 * i)
+            pub.put(symbol, "2024-01-02 09:33", weight=0.2 * i)
+        pub.put("AAA", "2024-01-02 09:34", weight=0.3)
+        assert pub.flush() == 4
+        assert pub.metrics["batches"] == 1 and pub.metrics["received"] == 7
+        pub.put("BBB", "2024-01-02 09:20", weight=0.3)
+        pub.put("CCC", "2024-01-02 09:35", weight=-1)
+    assert pub.metrics["published"] == 5 and pub.metrics["batches"] == 2 and pub.avg_latency_ms > 0
+
+    dfl = rwc.get_last_weights(ignore_zero=False)
+    assert dfl[["symbol", "weight"]].values.tolist() == [["BBB", 0.2], ["AAA", 0.3], ["CCC", -1.0]]
+
+    # 达到 max_batch 时后台线程立即发布
+    pub = RedisWeightsPublisher(rwc, flush_interval=60, max_batch=2)
+    pub.put("AAA", "2024-01-02 09:40", weight=0)
+    pub.put("BBB", "2024-01-02 09:40", weight=0)
+    for _ in range(100):
+        if pub.metrics["batches"]:
+            break
+        time.sleep(0.02)
+    assert pub.metrics["published"] == 2
+    pub.close()
+
+    # 发布失败的权重放回缓冲区，同一品种、同一时间保留失败之后放入的权重
+    pub = RedisWeightsPublisher(rwc, flush_interval=60)
+    publish_many = rwc.publish_many
+
+    def _fail_once(rows, overwrite=False):
+        rwc.publish_many = publish_many
+        pub.put("AAA", "2024-01-02 09:50", weight=-0.5)
+        raise ConnectionError("redis 连接中断")
+
+    rwc.publish_many = _fail_once
+    pub.put("AAA", "2024-01-02 09:50", weight=0.5)
+    pub.put("BBB", "2024-01-02 09:50", weight=0.5)
+    assert pub.flush() == 0 and pub.metrics["errors"] == 1 and len(pub._pending) == 2
+    assert pub.flush() == 2 and not pub._pending
+    pub.close()
+    dfl = rwc.get_last_weights(ignore_zero=False)
+    assert dfl.set_index("symbol")["weight"].to_dict() == {"AAA": -0.5, "BBB": 0.5, "CCC": -1.0}
+
+    # close 时发布失败：有限次重试，仍然失败则抛出异常，未发布的权重保留在缓冲区
+    def _fail(rows, overwrite=False):
+        raise ConnectionError("redis 连接中断")
+
+    pub = RedisWeightsPublisher(rwc, flush_interval=60, close_retries=3, retry_interval=0.01)
+    rwc.publish_many = _fail
+    pub.put("AAA", "2024-01-02 09:55", weight=0.1)
+    with pytest.raises(RuntimeError):
+        pub.close()
+    # 后台线程退出前发布一次，之后 close 中尝试 3 次
+    assert pub.metrics["errors"] == 1 + 3 and list(pub._pending) == [("AAA", pd.Timestamp("2024-01-02 09:55"))]
+
+    # close 时第一次发布失败，重试成功
+    pub = RedisWeightsPublisher(rwc, flush_interval=60, retry_interval=0.01)
+    pub.put("BBB", "2024-01-02 09:55", weight=0.1)
+
+    def _fail_once(rows, overwrite=False):
+        rwc.publish_many = publish_many
+        raise ConnectionError("redis 连接中断")
+
+    rwc.publish_many = _fail_once
+    pub.close()
+    assert pub.metrics["errors"] == 1 and pub.metrics["published"] == 1 and not pub._pending
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/15 21:10
+describe: 多品种并行信号计算引擎测试
+"""
+import pandas as pd
+from czsc.objects import RawBar
+from czsc.traders.base import generate_czsc_signals
+from czsc.traders.signal_engine import SignalEngine, generate_signals_frame
+from test.test_analyze import read_daily
+
+signals_config = [
+    {'name': 'czsc.signals.cxt_bi_base_V230228', 'freq': '日线', 'di': 1},
+    {'name': 'czsc.signals.tas_ma_base_V221101', 'freq': '日线', 'di': 1, 'ma_type': 'SMA', 'timeperiod': 5},
+    {'name': 'czsc.signals.tas_macd_base_V221028', 'freq': '周线', 'di': 1},
+]
+
+
+def read_bars(symbol, freq, sdt, edt, fq='前复权', **kwargs):
+    """测试用的K线读取函数，不同品种使用同一份日线数据"""
+    if symbol == "ERROR":
+        raise ValueError("模拟读取K线失败")
+    bars = read_daily()[:kwargs.get("n", 2000)]
+    return [RawBar(**dict(bar.__dict__, symbol=symbol)) for bar in bars]
+
+
+def test_generate_signals_frame():
+    bars = read_bars("000001.SH", "日线", None, None)
+    df1 = generate_czsc_signals(bars, signals_config, sdt=bars[500].dt, df=True).drop(columns=["cache", "freq"])
+    df2 = generate_signals_frame(bars, signals_config, sdt=bars[500].dt)
+    assert len(df1) > 1000
+    pd.testing.assert_frame_equal(df1, df2)
+    assert generate_signals_frame(bars[:400], signals_config).empty
+
+
+def test_signal_engine(tmp_path):
+    symbols = ["AAA", "BBB", "ERROR", "CCC", "AAA"]
+    kwargs = dict(sdt="20100101", bar_sdt="20000101", read_kwargs={"n": 1500})
+    expected = generate_signals_frame(read_bars("AAA", "日线", None, None, n=1500), signals_config, sdt="20100101")
+
+    engine = SignalEngine(n_jobs=1, chunk_size=2, show_progress=False)
+    stats = engine.run(symbols, read_bars, signals_config, **kwargs)
+    assert stats["symbol"].tolist() == ["AAA", "BBB", "ERROR", "CCC"]
+    assert stats["error"].notna().tolist() == [False, False, True, False]
+    assert engine.metrics["failed"] == 1 and engine.metrics["bars"] == 4500
+    pd.testing.assert_frame_equal(engine.read("AAA"), expected)
+
+    # 多进程计算，结果写入 parquet 文件
+    engine = SignalEngine(n_jobs=2, chunk_size=1, results_path=str(tmp_path), show_progress=False)
+    stats = engine.run(symbols, read_bars, signals_config, **kwargs)
+    assert stats["rows"].tolist() == [len(expected)] * 2 + [0] + [len(expected)]
+    assert not engine.results
+    dfs = engine.read("CCC")
+    assert (dfs["symbol"] == "CCC").all()
+    pd.testing.assert_frame_equal(dfs.drop(columns=["symbol"]), expected.drop(columns=["symbol"]))
+    assert engine.read("ERROR").empty
+
+
+def test_compact_signals(tmp_path):
+    from czsc.objects import Signal
+    from czsc.utils.sig import get_signal_columns, compact_signals
+    from czsc.traders.vector_backtest import SignalsMatrix
+
+    bars = read_bars("000001.SH", "日线", None, None, n=3000)
+    sigs = generate_signals_frame(bars, signals_config, sdt=bars[500].dt)
+    keys = get_signal_columns(sigs)
+    assert len(keys) == 3 and all(isinstance(sigs[k].dtype, pd.CategoricalDtype) for k in keys)
+
+    # 原始字符串格式的信号列
+    raw = sigs.astype({k: object for k in keys})
+    assert get_signal_columns(raw) == keys
+    pd.testing.assert_frame_equal(compact_signals(raw), sigs)
+    assert raw[keys[0]].dtype == object
+
+    assert sigs[keys].memory_usage(deep=True).sum() * 10 < raw[keys].memory_usage(deep=True).sum()
+    file = tmp_path / "sigs.parquet"
+    sigs.to_parquet(file)
+    pd.testing.assert_frame_equal(pd.read_parquet(file), sigs)
+
+    # 分类编码与字符串信号列的向量化匹配结果一致
+    sm1, sm2 = SignalsMatrix(raw), SignalsMatrix(sigs)
+    records = raw.to_dict("records")
+    for key in keys:
+        for value in raw[key].unique():
+            v1, v2, v3, score = value.split("_")
+            for signal in [Signal(f"{key}_{v1}_{v2}_{v3}_{score}"), Signal(f"{key}_{v1}_任意_任意_0")]:
+                mask = sm2.signal_mask(signal)
+                assert mask.tolist() == sm1.signal_mask(signal).tolist() == [signal.is_match(x) for x in records]
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/13 22:30
+describe: CzscTrader 快照测试
+"""
+import os
+import dill
+from czsc.traders.base import CzscTrader, BarGenerator
+from czsc.traders.sig_parse import get_signals_config
+from czsc.traders.snapshot import dump_snapshot, load_snapshot, load_trader, TraderSnapshot
+from test.test_analyze import read_1min, _czsc_state
+from test.test_vector_backtest import _create_positions
+
+
+def _trader_state(trader):
+    kas = {freq: _czsc_state(c) for freq, c in trader.kas.items()}
+    bars = {freq: [x.__dict__ for x in b] for freq, b in trader.bg.bars.items()}
+    positions = [(p.name, p.pos, p.operates, p.holds, p.last_event, p.end_dt) for p in trader.positions]
+    return kas, bars, positions, dict(trader.s), (trader.end_dt, trader.bid, trader.latest_price)
+
+
+def test_trader_snapshot(tmp_path):
+    bars = read_1min()[:10000]
+    positions = _create_positions(bars[0].symbol, "5分钟")
+    signals_config = get_signals_config(list({s for p in positions for s in p.unique_signals}))
+    signals_config.append({'name': 'czsc.signals.tas_macd_base_V221028', 'freq': '30分钟', 'di': 1})
+
+    bg = BarGenerator(base_freq='1分钟', freqs=['5分钟', '30分钟', '日线'], max_count=3000)
+    for bar in bars[:6000]:
+        bg.update(bar)
+    trader = CzscTrader(bg, positions=positions, signals_config=signals_config)
+    for bar in bars[6000:8000]:
+        trader.update(bar)
+
+    file = os.path.join(tmp_path, "trader.snap")
+    dump_snapshot(trader, file)
+    # 中枢识别器不写入快照
+    size = os.path.getsize(file)
+    assert all(len(c.zs_list) > 0 for c in trader.kas.values())
+    dump_snapshot(trader, file)
+    assert os.path.getsize(file) == size
+    snapshot = TraderSnapshot(file)
+    assert snapshot.symbol == trader.symbol and snapshot.end_dt == trader.end_dt
+    assert snapshot.positions == [{"name": p.name, "pos": p.pos, "end_dt": str(p.end_dt)} for p in trader.positions]
+    snapshot.close()
+
+    restored = load_snapshot(file)
+    assert isinstance(restored, CzscTrader) and restored is not trader
+    assert _trader_state(restored) == _trader_state(trader)
+    assert restored.kas['30分钟'].cache.keys() == trader.kas['30分钟'].cache.keys()
+    # BarGenerator 与 CZSC 之间共享原始K线对象
+    assert restored.bg.bars['5分钟'][-1] is restored.kas['5分钟'].bars_raw[-1]
+    c = restored.kas['5分钟']
+    assert not c._zs_tracker.bis and c.zs_list[0].bis[0] is c.bi_list[0]
+    zs_sdts = [[x.sdt for x in zs.bis] for zs in trader.kas['5分钟'].zs_list]
+    assert [[x.sdt for x in zs.bis] for zs in c.zs_list] == zs_sdts
+
+    # 恢复后继续更新，结果与原对象一致
+    for bar in bars[8000:]:
+        trader.update(bar)
+        restored.update(bar)
+    assert _trader_state(restored) == _trader_state(trader)
+    assert sum(len(p.operates) for p in trader.positions) > 0
+
+    # load_trader 兼容快照文件和 dill 序列化文件
+    file_dill = os.path.join(tmp_path, "trader.ct")
+    with open(file_dill, "wb") as f:
+        dill.dump(trader, f)
+    dump_snapshot(trader, file)
+    assert _trader_state(load_trader(file_dill)) == _trader_state(load_trader(file)) == _trader_state(trader)
+
+
+def test_columnar_trader_snapshot(tmp_path):
+    """columnar 模式的 CZSC 恢复后，无包含K线的 elements 仍然是 BarStore 中的视图"""
+    from czsc.analyze import CZSC
+    from czsc.utils.bar_store import BarStore, BarRange
+
+    bars = read_1min()[:8000]
+    positions = _create_positions(bars[0].symbol, "5分钟")
+    signals_config = get_signals_config(list({s for p in positions for s in p.unique_signals}))
+    bg = BarGenerator(base_freq='1分钟', freqs=['5分钟', '30分钟'], max_count=3000)
+    for bar in bars[:4000]:
+        bg.update(bar)
+    trader = CzscTrader(bg, positions=positions, signals_config=signals_config)
+    trader.kas = {freq: CZSC(b, columnar=True) for freq, b in bg.bars.items()}
+    for bar in bars[4000:6000]:
+        trader.update(bar)
+    trader.kas['5分钟'].bars_raw[-3].cache['x'] = 1
+
+    file = os.path.join(tmp_path, "trader.snap")
+    dump_snapshot(trader, file)
+    restored = load_snapshot(file)
+    assert _trader_state(restored) == _trader_state(trader)
+
+    c = restored.kas['5分钟']
+    assert isinstance(c.bars_raw, BarStore) and all(isinstance(x.elements, BarRange) for x in c.bars_ubi)
+    assert c.bars_ubi[-1].raw_bars[-1] == c.bars_raw[-1]
+    assert [x.cache for x in c.bars_raw[-3:]] == [{'x': 1}, {}, {}]
+    # 通过 bars_raw 写入的 cache 与无包含K线中的原始K线共享
+    c.bars_raw[-1].cache['y'] = 2
+    assert c.bars_ubi[-1].raw_bars[-1].cache == {'y': 2}
+
+    for bar in bars[6000:]:
+        trader.update(bar)
+        restored.update(bar)
+    assert _trader_state(restored)[:1] == _trader_state(trader)[:1]
+    assert _trader_state(restored)[2:] == _trader_state(trader)[2:]
+    assert all(isinstance(x.elements, BarRange) for x in c.bars_ubi)
+
+
+def test_load_legacy_trader(tmp_path):
+    """load_trader 读取旧版本 dill 序列化的交易对象，之后可以继续更新
+
+    data/trader_v0.ct.zip 由快照功能之前的版本生成：1分钟K线的前 3000 根初始化 BarGenerator，
+    再用 3000 ~ 4000 根K线更新 CzscTrader，使用 dill 序列化保存。
+    """
+    import zipfile
+
+    bars = read_1min()[:5000]
+    with zipfile.ZipFile(os.path.join(os.path.dirname(__file__), "data/trader_v0.ct.zip"), "r") as z:
+        z.extract("trader_v0.ct", tmp_path)
+    legacy = load_trader(os.path.join(tmp_path, "trader_v0.ct"))
+
+    positions = _create_positions(bars[0].symbol, "5分钟")
+    signals_config = get_signals_config(list({s for p in positions for s in p.unique_signals}))
+    signals_config.append({'name': 'czsc.signals.tas_macd_base_V221028', 'freq': '30分钟', 'di': 1})
+    bg = BarGenerator(base_freq='1分钟', freqs=['5分钟', '30分钟', '日线'], max_count=3000)
+    for bar in bars[:3000]:
+        bg.update(bar)
+    trader = CzscTrader(bg, positions=positions, signals_config=signals_config)
+    for bar in bars[3000:4000]:
+        trader.update(bar)
+    assert _trader_state(legacy) == _trader_state(trader)
+
+    for bar in bars[4000:]:
+        trader.on_bar(bar)
+        legacy.on_bar(bar)
+    assert _trader_state(legacy) == _trader_state(trader)
+    assert sum(len(p.operates) for p in legacy.positions) > 0
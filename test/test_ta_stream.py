@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/5 22:10
+describe: 流式技术指标测试
+"""
+import numpy as np
+import talib as ta
+from czsc.analyze import CZSC
+from czsc.utils.ta import MACD
+from czsc.utils import ta_stream
+from czsc.signals import tas
+from test.test_analyze import read_daily, _update_with_ticks
+
+
+def _run(stream, bars, name):
+    return np.array([stream.update(bar)[stream.outputs.index(name)] for bar in bars])
+
+
+def test_stream_indicators():
+    bars = read_daily()
+    high = np.array([x.high for x in bars])
+    low = np.array([x.low for x in bars])
+    close = np.array([x.close for x in bars])
+
+    assert np.array_equal(_run(ta_stream.StreamSMA(20), bars, "ma"), ta.MA(close, 20, matype=0), equal_nan=True)
+    assert np.array_equal(_run(ta_stream.StreamEMA(20), bars, "ma"), ta.MA(close, 20, matype=1), equal_nan=True)
+    dif, dea, macd = MACD(close)
+    assert np.array_equal(_run(ta_stream.StreamMACD(), bars, "dif"), dif)
+    assert np.array_equal(_run(ta_stream.StreamMACD(), bars, "macd"), macd)
+    assert np.allclose(_run(ta_stream.StreamBOLL(20), bars, "mid"), ta.BBANDS(close, 20)[1], equal_nan=True)
+    assert np.allclose(_run(ta_stream.StreamKDJ(9, 3, 3), bars, "d"), ta.STOCH(high, low, close, 9, 3, 0, 3, 0)[1],
+                       equal_nan=True)
+    assert np.allclose(_run(ta_stream.StreamRSI(9), bars, "rsi"), ta.RSI(close, 9), equal_nan=True)
+    assert np.allclose(_run(ta_stream.StreamCCI(14), bars, "cci"), ta.CCI(high, low, close, 14), equal_nan=True)
+    assert np.allclose(_run(ta_stream.StreamATR(14), bars, "atr"), ta.ATR(high, low, close, 14), equal_nan=True)
+
+    # 同一根K线多次更新，以及超过 maxlen 之后的数组整理
+    s1, s2 = ta_stream.StreamBOLL(20, maxlen=50), ta_stream.StreamBOLL(20)
+    for bar in bars:
+        s1.update(bar)
+    _update_with_ticks(type("C", (), {"update": lambda self, x: s2.update(x)})(), bars)
+    assert s1.count == s2.count == len(bars) and len(s1.values("mid")) <= 100
+    assert np.allclose(s1.values("std")[-20:], s2.values("std")[-20:])
+
+    # 默认只保留递推需要回看的数据
+    s3 = ta_stream.StreamSMA(5)
+    _run(s3, bars, "ma")
+    assert s3.maxlen == 7 and len(s3._buf["close"]) == 14 and len(s3.values("ma")) <= 14
+
+
+def test_update_cache_by_stream():
+    bars = read_daily()
+    c = CZSC(bars[:300])
+    funcs = [
+        (tas.update_ma_cache, {"ma_type": "SMA", "timeperiod": 5}),
+        (tas.update_ma_cache, {"ma_type": "EMA", "timeperiod": 10}),
+        (tas.update_macd_cache, {}),
+        (tas.update_boll_cache, {"timeperiod": 20}),
+        (tas.update_kdj_cache, {}),
+        (tas.update_rsi_cache, {"timeperiod": 6}),
+        (tas.update_cci_cache, {"timeperiod": 14}),
+        (tas.update_atr_cache, {"timeperiod": 14}),
+    ]
+    keys = [func(c, **kw) for func, kw in funcs]
+
+    class _Updater:
+        def update(self, bar):
+            c.update(bar)
+            for func, kw in funcs:
+                func(c, **kw)
+
+    _update_with_ticks(_Updater(), bars[300:1000])
+    assert len(c.cache["ta_streams"]) == len(funcs)
+    assert all(s.maxlen < 50 for s in c.cache["ta_streams"].values())
+
+    close = np.array([x.close for x in c.bars_raw])
+    high = np.array([x.high for x in c.bars_raw])
+    low = np.array([x.low for x in c.bars_raw])
+    expected = {
+        "SMA#5": ta.MA(close, 5, matype=0),
+        "EMA#10": ta.MA(close, 10, matype=1),
+        "MACD12#26#9": MACD(close)[2],
+        "BOLL20": ta.BBANDS(close, 20, 2, 2)[0],
+        "KDJ9#3#3": ta.STOCH(high, low, close, 9, 3, 0, 3, 0)[0],
+        "RSI6": ta.RSI(close, 6),
+        "CCI14": ta.CCI(high, low, close, 14),
+        "ATR14": ta.ATR(high, low, close, 14),
+    }
+    sub = {"MACD12#26#9": "macd", "BOLL20": "上轨2", "KDJ9#3#3": "k"}
+    for key in keys:
+        values = [x.cache[key] for x in c.bars_raw[-300:]]
+        values = np.array([x[sub[key]] if key in sub else x for x in values])
+        assert np.allclose(values, expected[key][-300:], atol=1e-3), key
@@ -114,6 +114,44 @@ def test_generate_czsc_signals():
     assert len(res) == len(rdf)
 
 
+def test_signals_plan():
+    from czsc.utils import import_by_name
+
+    bars = read_daily()
+    signals_config = [
+        {'name': 'czsc.signals.tas_ma_base_V221101', 'freq': '日线', 'di': 1, 'ma_type': 'SMA', 'timeperiod': 5},
+        {'name': 'czsc.signals.tas_ma_base_V221101', 'freq': '日线', 'timeperiod': 5, 'di': 1, 'ma_type': 'SMA'},
+        {'name': 'czsc.signals.cxt_zhong_shu_gong_zhen_V221221', 'freq1': '日线', 'freq2': '周线'},
+        {'name': 'czsc.signals.cxt_bi_status_V230101', 'freq': '周线', 'di': 1},
+    ]
+    bg = BarGenerator(base_freq='日线', freqs=['周线'])
+    for bar in bars[:1000]:
+        bg.update(bar)
+    cs = CzscSignals(bg, signals_config=signals_config, profile_signals=True)
+    plan = cs._signals_plan
+    assert len(plan) == 3 and plan[0][2] is cs.kas['日线'] and plan[1][2] is cs and plan[2][2] is cs.kas['周线']
+
+    # 执行计划与逐个执行配置的结果一致
+    for bar in bars[1000:1100]:
+        cs.update_signals(bar)
+        s = {}
+        for param in signals_config:
+            param = dict(param)
+            sig_func = import_by_name(param.pop('name'))
+            freq = param.pop('freq', None)
+            s.update(sig_func(cs.kas[freq] if freq in cs.kas else cs, **param))
+        assert {k: cs.s[k] for k in s} == s
+        assert list(cs.s.keys())[:len(s)] == list(s.keys())
+
+    dft = cs.get_signals_timing()
+    assert len(dft) == 3 and dft['count'].tolist() == [101] * 3
+
+    # 替换 signals_config 后自动重新编译
+    cs.signals_config = signals_config[:1]
+    cs.update_signals(bars[1100])
+    assert len(cs._signals_plan) == 1
+
+
 def test_czsc_trader():
     bars = read_daily()
 
@@ -319,3 +319,223 @@ def test_overlap():
 
     # 验证结果
     assert result["col_overlap"].tolist() == [1, 2, 1, 2, 1]
+
+
+def _legacy_evaluate_pairs(pairs, trade_dir="多空"):
+    """逐条记录计算的原始实现，用于一致性测试"""
+    from czsc.objects import cal_break_even_point
+
+    p = {"交易方向": trade_dir, "交易次数": 0, "累计收益": 0, "单笔收益": 0, "盈利次数": 0, "累计盈利": 0,
+         "单笔盈利": 0, "亏损次数": 0, "累计亏损": 0, "单笔亏损": 0, "交易胜率": 0, "累计盈亏比": 0,
+         "单笔盈亏比": 0, "盈亏平衡点": 1, "持仓天数": 0, "持仓K线数": 0}
+    if trade_dir in ["多头", "空头"] and len(pairs) > 0:
+        pairs = pairs[pairs["交易方向"] == trade_dir]
+    if len(pairs) == 0:
+        return p
+    pairs = pairs.to_dict(orient="records")
+    p["交易次数"] = len(pairs)
+    p["盈亏平衡点"] = round(cal_break_even_point([x["盈亏比例"] for x in pairs]), 4)
+    p["累计收益"] = round(sum([x["盈亏比例"] for x in pairs]), 2)
+    p["单笔收益"] = round(p["累计收益"] / p["交易次数"], 2)
+    p["持仓天数"] = round(sum([x["持仓天数"] for x in pairs]) / len(pairs), 2)
+    p["持仓K线数"] = round(sum([x["持仓K线数"] for x in pairs]) / len(pairs), 2)
+    win_ = [x for x in pairs if x["盈亏比例"] >= 0]
+    if len(win_) > 0:
+        p["盈利次数"] = len(win_)
+        p["累计盈利"] = sum([x["盈亏比例"] for x in win_])
+        p["单笔盈利"] = round(p["累计盈利"] / p["盈利次数"], 4)
+        p["交易胜率"] = round(p["盈利次数"] / p["交易次数"], 4)
+    loss_ = [x for x in pairs if x["盈亏比例"] < 0]
+    if len(loss_) > 0:
+        p["亏损次数"] = len(loss_)
+        p["累计亏损"] = sum([x["盈亏比例"] for x in loss_])
+        p["单笔亏损"] = round(p["累计亏损"] / p["亏损次数"], 4)
+        p["累计盈亏比"] = round(p["累计盈利"] / abs(p["累计亏损"]), 4)
+        p["单笔盈亏比"] = round(p["单笔盈利"] / abs(p["单笔亏损"]), 4)
+    return p
+
+
+def _legacy_evaluate_holds(holds, trade_dir="多空"):
+    """按字符串日期聚合的原始实现，用于一致性测试"""
+    from copy import deepcopy
+
+    holds = deepcopy(holds)
+    if trade_dir != "多空":
+        _OD = 1 if trade_dir == "多头" else -1
+        for hold in holds:
+            if hold["pos"] != 0 and hold["pos"] != _OD:
+                hold["pos"] = 0
+    p = {"交易方向": trade_dir, "开始时间": "", "结束时间": "", "覆盖率": 0, "夏普": 0, "卡玛": 0,
+         "最大回撤": 0, "年化收益": 0, "日胜率": 0}
+    if len(holds) == 0 or all(x["pos"] == 0 for x in holds):
+        return p
+    dfh = pd.DataFrame(holds)
+    dfh["n1b"] = (dfh["price"].shift(-1) - dfh["price"]) / dfh["price"]
+    dfh["trade_date"] = dfh["dt"].apply(lambda x: x.strftime("%Y-%m-%d"))
+    dfh["edge"] = dfh["n1b"] * dfh["pos"]
+    dfv = dfh.groupby("trade_date")["edge"].sum().cumsum()
+    yearly_ret = dfv.iloc[-1] * (252 / len(dfv))
+    sharp = dfv.diff().mean() / dfv.diff().std() * pow(252, 0.5) if dfv.diff().std() != 0 else 0
+    df0 = dfv.shift(1).ffill().fillna(0)
+    mdd = (1 - (df0 + 1) / (df0 + 1).cummax()).max()
+    calmar = yearly_ret / mdd if mdd != 0 else 1
+    p.update({"开始时间": dfh["dt"].iloc[0].strftime("%Y-%m-%d"), "结束时间": dfh["dt"].iloc[-1].strftime("%Y-%m-%d"),
+              "覆盖率": round(len(dfh[dfh["pos"] != 0]) / len(dfh), 4), "夏普": round(sharp, 4),
+              "卡玛": round(calmar, 4), "最大回撤": round(mdd, 4), "年化收益": round(yearly_ret, 4),
+              "日胜率": round(sum(dfv > 0) / len(dfv), 4)})
+    return p
+
+
+def test_evaluate_pairs():
+    from czsc.utils.stats import evaluate_pairs, evaluate_pairs_batch
+
+    rng = np.random.default_rng(42)
+    n = 5000
+    pairs = pd.DataFrame({
+        "策略标记": rng.choice([f"P{i}" for i in range(30)], n),
+        "交易方向": rng.choice(["多头", "空头"], n),
+        "持仓K线数": rng.integers(1, 300, n),
+        "持仓天数": rng.random(n) * 10,
+        "盈亏比例": np.round(rng.normal(1, 50, n), 2),
+    })
+    pairs.loc[pairs["策略标记"] == "P0", "盈亏比例"] = -1.5
+    pairs.loc[pairs["策略标记"] == "P1", "盈亏比例"] = np.abs(pairs.loc[pairs["策略标记"] == "P1", "盈亏比例"])
+
+    for trade_dir in ["多空", "多头", "空头"]:
+        assert evaluate_pairs(pairs, trade_dir) == _legacy_evaluate_pairs(pairs, trade_dir)
+        assert evaluate_pairs(pairs.iloc[:0], trade_dir) == _legacy_evaluate_pairs(pairs.iloc[:0], trade_dir)
+
+        dfr = evaluate_pairs_batch(pairs, by="策略标记", trade_dir=trade_dir)
+        assert len(dfr) == 30
+        for row in dfr.to_dict("records"):
+            expected = _legacy_evaluate_pairs(pairs[pairs["策略标记"] == row.pop("策略标记")], trade_dir)
+            assert row == expected
+
+    # 配对数量加权：与按数量展开后的结果一致，累计盈利、累计亏损只有浮点数求和顺序的误差
+    weighted = pairs.assign(配对数量=rng.integers(1, 20, n))
+    expanded = weighted.loc[weighted.index.repeat(weighted["配对数量"])].drop(columns="配对数量")
+    for name in ["P0", "P1", "P2", "P3"]:
+        for trade_dir in ["多空", "多头", "空头"]:
+            p1 = _legacy_evaluate_pairs(expanded[expanded["策略标记"] == name], trade_dir)
+            p2 = evaluate_pairs(weighted[weighted["策略标记"] == name], trade_dir)
+            assert {k: v for k, v in p1.items() if k not in ["累计盈利", "累计亏损"]} == \
+                   {k: v for k, v in p2.items() if k not in ["累计盈利", "累计亏损"]}
+            assert np.isclose(p1["累计盈利"], p2["累计盈利"]) and np.isclose(p1["累计亏损"], p2["累计亏损"])
+    dfr = evaluate_pairs_batch(weighted, by="策略标记")
+    for row in dfr.to_dict("records"):
+        assert row == evaluate_pairs(weighted[weighted["策略标记"] == row.pop("策略标记")])
+
+    dfr = evaluate_pairs_batch(pairs, by=["策略标记", "交易方向"])
+    assert len(dfr) == 60 and dfr.columns[:2].tolist() == ["策略标记", "交易方向"]
+    assert dfr.iloc[0].to_dict() == dict(_legacy_evaluate_pairs(
+        pairs[(pairs["策略标记"] == dfr["策略标记"][0]) & (pairs["交易方向"] == dfr["交易方向"][0])]),
+        策略标记=dfr["策略标记"][0], 交易方向=dfr["交易方向"][0])
+
+
+def test_evaluate_holds():
+    from czsc.objects import Position, Event, Operate, Factor, Signal
+    from czsc.utils.stats import evaluate_holds_batch
+
+    rng = np.random.default_rng(7)
+    dts = pd.date_range("2022-01-04 09:30", periods=3000, freq="30min")
+    event = Event(operate=Operate.LO, factors=[Factor(signals_all=[Signal("日线_D1_测试_看多_任意_任意_0")])])
+    rows = []
+    for i in range(5):
+        pos = Position(symbol="AAA", opens=[event], name=f"P{i}")
+        pos.holds = [{"dt": dt, "pos": int(p), "price": float(x)} for dt, p, x in
+                     zip(dts, rng.choice([-1, 0, 0, 1], len(dts)), 100 * np.cumprod(1 + rng.normal(0, 0.01, len(dts))))]
+        for trade_dir in ["多空", "多头", "空头"]:
+            expected = {"交易标的": "AAA", "策略标记": f"P{i}"}
+            expected.update(_legacy_evaluate_holds(pos.holds, trade_dir))
+            assert pos.evaluate_holds(trade_dir) == expected
+        rows.extend([dict(x, 策略标记=pos.name) for x in pos.holds])
+
+    pos.holds = [dict(x, pos=0) for x in pos.holds]
+    assert pos.evaluate_holds()["夏普"] == 0 and pos.evaluate_holds()["开始时间"] == ""
+
+    holds = pd.DataFrame(rows)
+    dfr = evaluate_holds_batch(holds, by="策略标记", trade_dir="多头")
+    for row in dfr.to_dict("records"):
+        name = row.pop("策略标记")
+        assert row == _legacy_evaluate_holds(holds[holds["策略标记"] == name].to_dict("records"), "多头")
+
+
+def test_daily_performance_matrix():
+    from czsc.utils.stats import daily_performance, daily_performance_matrix
+
+    rng = np.random.default_rng(3)
+    dts = pd.date_range("2018-01-01", periods=800, freq="D")
+    df = pd.DataFrame(rng.normal(0.0005, 0.01, (800, 20)), index=dts, columns=[f"S{i}" for i in range(20)])
+    df.iloc[:, 1] = 0
+    df.iloc[:, 2] = 0.001
+    df.iloc[:300, 3] = 0
+    df.iloc[::5, 4] = np.nan
+    df.iloc[:, 5] = -np.abs(df.iloc[:, 5])
+
+    dfr = daily_performance_matrix(df)
+    assert dfr.index.tolist() == df.columns.tolist()
+    for col in df.columns:
+        expected = daily_performance(df[col].fillna(0).to_list())
+        assert dfr.loc[col].to_dict() == expected, col
+
+
+def test_rolling_daily_performance_fast():
+    from czsc.utils.stats import rolling_daily_performance, rolling_daily_performance_fast
+
+    rng = np.random.default_rng(5)
+    dts = pd.bdate_range("2019-01-01", periods=600)
+    df = pd.DataFrame({"dt": dts, "ret": rng.normal(0.0003, 0.01, 600)})
+    df.loc[100:130, "ret"] = 0
+
+    dfr1 = rolling_daily_performance(df.copy(), "ret", window=180, min_periods=60)
+    dfr2 = rolling_daily_performance_fast(df, "ret", window=180, min_periods=60, batch_size=100)
+    assert "dt" in df.columns and len(dfr1) == len(dfr2) == 540
+    pd.testing.assert_frame_equal(dfr1, dfr2, check_dtype=False, atol=1e-4, rtol=0)
+
+
+def _create_sectional_df(n_dt=60, n_symbol=40, seed=7):
+    rng = np.random.default_rng(seed)
+    dts = np.repeat(pd.date_range("2023-01-01", periods=n_dt, freq="D"), n_symbol)
+    df = pd.DataFrame({"dt": dts, "symbol": np.tile([f"S{i:02d}" for i in range(n_symbol)], n_dt)})
+    df["n1b"] = rng.normal(0, 0.01, len(df))
+    df["F#A"] = df["n1b"] * 0.3 + rng.normal(0, 0.01, len(df))
+    df["F#B"] = rng.integers(-2, 3, len(df)).astype(float)  # 大量相同值，检验排名
+    df["F#C"] = rng.normal(0, 1, len(df))
+    df.loc[rng.random(len(df)) < 0.1, "F#C"] = np.nan
+    df.loc[rng.random(len(df)) < 0.05, "n1b"] = np.nan
+    df.loc[df["dt"] == df["dt"].iloc[-1], "F#A"] = 1.0  # 常数截面
+    df = df[~((df["dt"] == df["dt"].iloc[0]) & (df["symbol"] > "S02"))]  # 样本不足的截面
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def test_cross_sectional_stats():
+    from czsc.utils.corr import cross_sectional_stats, cross_sectional_ic
+    from czsc.features.utils import feature_returns, feature_sectional_corr
+    from sklearn.linear_model import LinearRegression
+
+    df = _create_sectional_df()
+    factors = ["F#A", "F#B", "F#C"]
+    for method in ["pearson", "spearman"]:
+        dfv = cross_sectional_stats(df, factors, "n1b", method=method)
+        for factor in factors:
+            expected = df.groupby("dt").apply(lambda x: x[factor].corr(x["n1b"], method=method))
+            np.testing.assert_allclose(dfv[factor].values, expected.values, rtol=1e-10, atol=1e-12)
+
+        dfc, res = cross_sectional_ic(df, x_col="F#C", y_col="n1b", method=method)
+        assert list(dfc.columns) == ["dt", "ic"] and res["IC均值"] != 0
+
+    for fit_intercept in [False, True]:
+        dft = feature_returns(df, "F#C", fit_intercept=fit_intercept)
+        for dt, dfg in df.groupby("dt"):
+            dfg = dfg.dropna(subset=["F#C", "n1b"])
+            ret = dft.loc[dft["dt"] == dt, "returns"].iloc[0]
+            if len(dfg) < 5:
+                assert ret == 0
+                continue
+            model = LinearRegression(fit_intercept=fit_intercept).fit(dfg[["F#C"]].values, dfg["n1b"].values)
+            assert np.isclose(ret, model.coef_[0], rtol=1e-10, atol=1e-14)
+
+    dft, res = feature_sectional_corr(df, "F#B", method="spearman")
+    assert dft["ic"].iloc[0] == 0 and res["IC标准差"] > 0
+    dft_k, _ = feature_sectional_corr(df, "F#B", method="kendall")
+    assert len(dft_k) == len(dft)
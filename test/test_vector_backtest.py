@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/8 17:30
+describe: 向量化回测与逐行回测的一致性测试
+"""
+from copy import deepcopy
+from czsc.objects import Signal, Factor, Event, Operate, Position
+from czsc.traders.base import CzscTrader, generate_czsc_signals
+from czsc.traders.sig_parse import get_signals_config
+from czsc.traders.vector_backtest import SignalsMatrix, vector_dummy
+from test.test_analyze import read_daily, read_1min
+
+
+def _create_positions(symbol, freq):
+    opens = [
+        Event(name='开多', operate=Operate.LO, factors=[
+            Factor(name="一买", signals_all=[Signal(f"{freq}_D1B_BUY1_一买_任意_任意_0")]),
+            Factor(name="二买", signals_all=[Signal(f"{freq}_D2B_BUY1_一买_任意_任意_0")],
+                   signals_not=[Signal(f"{freq}_D0停顿分型_BE辅助V230106_看空_强_任意_0")]),
+        ]),
+        Event(name='开空', operate=Operate.SO, factors=[
+            Factor(name="一卖", signals_all=[Signal(f"{freq}_D1B_BUY1_一卖_任意_任意_0")]),
+        ], signals_any=[Signal(f"{freq}_D0停顿分型_BE辅助V230106_看空_任意_任意_0"),
+                        Signal(f"{freq}_D2B_BUY1_一卖_任意_任意_0")]),
+    ]
+    exits = [
+        Event(name='平多', operate=Operate.LE, factors=[
+            Factor(name="停顿", signals_all=[Signal(f"{freq}_D0停顿分型_BE辅助V230106_看空_强_任意_0")]),
+        ]),
+        Event(name='平空', operate=Operate.SE, factors=[
+            Factor(name="停顿", signals_all=[Signal(f"{freq}_D0停顿分型_BE辅助V230106_看多_强_任意_0")]),
+        ]),
+    ]
+
+    positions = []
+    for i, (interval, timeout, stop_loss, T0) in enumerate([(0, 20, 100, False), (3600 * 24 * 5, 5, 50, False),
+                                                             (0, 1000, 1000, True), (600, 10, 30, True)]):
+        positions.append(Position(symbol=symbol, opens=opens, exits=exits if i % 2 else [], interval=interval,
+                                  timeout=timeout, stop_loss=stop_loss, T0=T0, name=f"测试{i}"))
+    return positions
+
+
+def test_vector_dummy():
+    for bars, freq in [(read_daily(), "日线"), (read_1min()[:12000], "1分钟")]:
+        positions = _create_positions(bars[0].symbol, freq)
+        signals_config = get_signals_config(list({s for p in positions for s in p.unique_signals}))
+        sigs = generate_czsc_signals(bars, signals_config, sdt=bars[500].dt, init_n=500, df=True)
+
+        trader = CzscTrader(positions=deepcopy(positions))
+        for sig in sigs.to_dict('records'):
+            trader.on_sig(sig)
+
+        sm = SignalsMatrix(sigs)
+        results = vector_dummy(sm, positions)
+        assert all(not p.operates for p in positions)
+        assert sum(len(p.operates) for p in trader.positions) > 20
+        for p1, p2 in zip(trader.positions, results):
+            assert p1.operates == p2.operates
+            assert p1.holds == p2.holds
+            assert p1.pairs == p2.pairs
+            assert (p1.pos, p1.end_dt, p1.last_lo_dt, p1.last_so_dt) == (p2.pos, p2.end_dt, p2.last_lo_dt, p2.last_so_dt)
+            assert p1.last_event == p2.last_event and p1.pos_changed == p2.pos_changed
+
+        # 信号矩阵中的匹配结果与 Signal.is_match 一致
+        records = sigs.to_dict('records')
+        signal = positions[0].opens[0].factors[0].signals_all[0]
+        assert sm.signal_mask(signal).tolist() == [signal.is_match(x) for x in records]
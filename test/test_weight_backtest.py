@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+author: zengbin93
+email: zeng_bin8888@163.com
+create_dt: 2024/6/10 21:15
+describe: 持仓权重回测测试
+"""
+import numpy as np
+import pandas as pd
+from czsc.traders.weight_backtest import WeightBacktest, match_volume_lots
+from czsc.utils.stats import evaluate_pairs
+
+
+def _create_dfw(symbols=("AAA", "BBB", "CCC"), n=3000, seed=42):
+    rng = np.random.default_rng(seed)
+    dts = pd.date_range("2022-01-04 09:31", periods=n, freq="30min")
+    rows = []
+    for symbol in symbols:
+        price = 100 * np.cumprod(1 + rng.normal(0, 0.002, n))
+        weight = np.clip(np.cumsum(rng.choice([0, 0, 0, 0.25, -0.25, 0.113, -0.07], n)), -1, 1)
+        weight[rng.random(n) < 0.02] = 0
+        rows.append(pd.DataFrame({"dt": dts, "symbol": symbol, "weight": weight, "price": price}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def _legacy_symbol_pairs(wb, symbol):
+    """按单位逐个开平仓配对的原始实现，用于一致性测试"""
+    dfs = wb.dfw[wb.dfw["symbol"] == symbol].copy()
+    dfs["volume"] = (dfs["weight"] * pow(10, wb.digits)).astype(int)
+    dfs["bar_id"] = list(range(1, len(dfs) + 1))
+    operates = []
+
+    def __add_operate(dt, bar_id, volume, price, operate):
+        for _ in range(abs(volume)):
+            operates.append({"bar_id": bar_id, "dt": dt, "price": price, "operate": operate})
+
+    rows = dfs.to_dict(orient="records")
+    if rows[0]["volume"] > 0:
+        __add_operate(rows[0]["dt"], rows[0]["bar_id"], rows[0]["volume"], rows[0]["price"], operate="开多")
+    elif rows[0]["volume"] < 0:
+        __add_operate(rows[0]["dt"], rows[0]["bar_id"], rows[0]["volume"], rows[0]["price"], operate="开空")
+
+    for row1, row2 in zip(rows[:-1], rows[1:]):
+        dt, bar_id, price = row2["dt"], row2["bar_id"], row2["price"]
+        if row1["volume"] >= 0 and row2["volume"] >= 0:
+            if row2["volume"] > row1["volume"]:
+                __add_operate(dt, bar_id, row2["volume"] - row1["volume"], price, operate="开多")
+            elif row2["volume"] < row1["volume"]:
+                __add_operate(dt, bar_id, row1["volume"] - row2["volume"], price, operate="平多")
+        elif row1["volume"] <= 0 and row2["volume"] <= 0:
+            if row2["volume"] > row1["volume"]:
+                __add_operate(dt, bar_id, row1["volume"] - row2["volume"], price, operate="平空")
+            elif row2["volume"] < row1["volume"]:
+                __add_operate(dt, bar_id, row2["volume"] - row1["volume"], price, operate="开空")
+        elif row1["volume"] >= 0 >= row2["volume"]:
+            __add_operate(dt, bar_id, row1["volume"], price, operate="平多")
+            __add_operate(dt, bar_id, row2["volume"], price, operate="开空")
+        elif row1["volume"] <= 0 <= row2["volume"]:
+            __add_operate(dt, bar_id, row1["volume"], price, operate="平空")
+            __add_operate(dt, bar_id, row2["volume"], price, operate="开多")
+
+    pairs, opens = [], []
+    for op in operates:
+        if op["operate"] in ["开多", "开空"]:
+            opens.append(op)
+            continue
+        open_op = opens.pop()
+        if open_op["operate"] == "开多":
+            p_ret, p_dir = round((op["price"] - open_op["price"]) / open_op["price"] * 10000, 2), "多头"
+        else:
+            p_ret, p_dir = round((open_op["price"] - op["price"]) / open_op["price"] * 10000, 2), "空头"
+        pairs.append({
+            "标的代码": symbol,
+            "交易方向": p_dir,
+            "开仓时间": open_op["dt"],
+            "平仓时间": op["dt"],
+            "开仓价格": open_op["price"],
+            "平仓价格": op["price"],
+            "持仓K线数": op["bar_id"] - open_op["bar_id"] + 1,
+            "事件序列": f"{open_op['operate']} -> {op['operate']}",
+            "持仓天数": (op["dt"] - open_op["dt"]).days,
+            "盈亏比例": p_ret,
+        })
+    return pd.DataFrame(pairs)
+
+
+def test_match_volume_lots():
+    open_ids, close_ids, lots = match_volume_lots([3, 5, 2, 2, -4, 0, 1])
+    assert list(zip(open_ids.tolist(), close_ids.tolist(), lots.tolist())) == [(1, 2, 2), (0, 2, 1), (0, 4, 2), (4, 5, 4)]
+    assert len(match_volume_lots([])[2]) == 0
+
+
+def test_weight_backtest_pairs():
+    dfw = _create_dfw()
+    for digits in [1, 2, 3]:
+        wb = WeightBacktest(dfw, digits=digits, fee_rate=0.0002, n_jobs=1)
+        for symbol in wb.symbols:
+            df1 = _legacy_symbol_pairs(wb, symbol)
+            df2 = wb.get_symbol_pairs(symbol)
+            assert len(df1) > 100 and len(df2) < len(df1) and df2["配对数量"].sum() == len(df1)
+            # 按配对数量展开后与逐单位配对的结果一致
+            df3 = df2.loc[df2.index.repeat(df2["配对数量"])].drop(columns="配对数量").reset_index(drop=True)
+            pd.testing.assert_frame_equal(df1, df3, check_dtype=False)
+
+            # 按配对数量加权的评估结果与展开后一致，累计盈利、累计亏损只有浮点数求和顺序的误差
+            for trade_dir in ["多空", "多头", "空头"]:
+                p1, p2 = evaluate_pairs(df1, trade_dir), evaluate_pairs(df2, trade_dir)
+                assert p1.keys() == p2.keys()
+                for k in p1:
+                    if k in ["累计盈利", "累计亏损"]:
+                        assert np.isclose(p1[k], p2[k], rtol=1e-9)
+                    else:
+                        assert p1[k] == p2[k], (k, p1[k], p2[k])
+
+    # 没有任何持仓的品种
+    dfw0 = dfw.copy()
+    dfw0["weight"] = 0
+    wb = WeightBacktest(dfw0, digits=2, n_jobs=1)
+    assert wb.get_symbol_pairs("AAA").empty
+
+
+def test_weight_backtest_engine():
+    dfw = _create_dfw(symbols=[f"S{i:03d}" for i in range(20)], n=2000)
+    dfw = dfw.sample(frac=1, random_state=1).sort_values("dt", kind="mergesort", ignore_index=True)
+    wb1 = WeightBacktest(dfw, digits=2, n_jobs=1, engine="symbol")
+    for engine, n_jobs in [("vector", 1), ("vector", 2)]:
+        wb2 = WeightBacktest(dfw, digits=2, n_jobs=n_jobs, engine=engine)
+        assert wb1.stats == wb2.stats
+        pd.testing.assert_frame_equal(wb1.daily_return, wb2.daily_return)
+        for symbol in wb1.symbols:
+            pd.testing.assert_frame_equal(wb1.results[symbol]["daily"], wb2.results[symbol]["daily"])
+            pd.testing.assert_frame_equal(wb1.results[symbol]["pairs"], wb2.results[symbol]["pairs"])